@@ -1,5 +1,7 @@
-from django.contrib import admin
-from .models import IceBooking, TimeSlot
+from django import forms
+from django.contrib import admin, messages
+from . import approvals
+from .models import IceBooking, SlotOccupancy, TimeSlot
 
 @admin.register(TimeSlot)
 class TimeSlotAdmin(admin.ModelAdmin):
@@ -8,8 +10,23 @@ class TimeSlotAdmin(admin.ModelAdmin):
     list_editable = ['price', 'is_active']
     ordering = ['time_start']
 
+class IceBookingAdminForm(forms.ModelForm):
+    class Meta:
+        model = IceBooking
+        fields = '__all__'
+    
+    def clean(self):
+        data = super().clean()
+        if data.get('status') == 'approved' and data.get('date') and data.get('time_start') and data.get('time_end'):
+            preview = IceBooking(pk=self.instance.pk, date=data['date'], time_start=data['time_start'], time_end=data['time_end'])
+            conflict = approvals.find_conflict(preview)
+            if conflict is not None:
+                raise forms.ValidationError(f"Время занято: {approvals.describe_conflict(conflict)}")
+        return data
+
 @admin.register(IceBooking)
 class IceBookingAdmin(admin.ModelAdmin):
+    form = IceBookingAdminForm
     list_display = ['name', 'phone', 'date', 'time_start', 'time_end', 'status', 'created_at']
     list_filter = ['status', 'date']
     search_fields = ['name', 'phone']
@@ -17,11 +34,28 @@ class IceBookingAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
     
     def approve_bookings(self, request, queryset):
-        queryset.update(status='approved')
-        self.message_user(request, f"{queryset.count()} заявок одобрено")
+        approved, conflicts = approvals.approve_bookings(queryset)
+        self.message_user(request, f"{len(approved)} заявок одобрено")
+        if conflicts:
+            details = ', '.join(
+                f"#{pk} ({approvals.describe_conflict(conflict)})" for pk, conflict in conflicts.items()
+            )
+            self.message_user(request, f"Не одобрены из-за пересечения по времени: {details}", messages.WARNING)
     approve_bookings.short_description = "Одобрить выбранные заявки"
     
     def reject_bookings(self, request, queryset):
-        queryset.update(status='rejected')
-        self.message_user(request, f"{queryset.count()} заявок отклонено")
+        rejected = approvals.reject_bookings(queryset)
+        self.message_user(request, f"{len(rejected)} заявок отклонено")
     reject_bookings.short_description = "Отклонить выбранные заявки"
+
+@admin.register(SlotOccupancy)
+class SlotOccupancyAdmin(admin.ModelAdmin):
+    list_display = ['date', 'time_start', 'time_end', 'price', 'is_available', 'blocker_type', 'booked_by']
+    list_filter = ['is_available', 'blocker_type']
+    date_hierarchy = 'date'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,186 @@
+"""Одобрение заявок на аренду льда без пересечений.
+
+Одобренное бронирование не должно пересекаться с расписанием секций,
+событиями и другими одобренными бронированиями. Проверка идет по
+Occupancy со всеми источниками и сообщает, что именно занимает время.
+Пересечение бронирований между собой на PostgreSQL дополнительно
+гарантирует ограничение icebooking_no_overlap (EXCLUDE USING gist по
+tsrange) - на случай параллельного одобрения.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+
+from core.notifications import notify
+from .availability import booking_dates, mark_dirty
+from .models import IceBooking, SlotOccupancy
+from .occupancy import Occupancy, span
+
+BLOCKER_LABELS = dict(SlotOccupancy.BLOCKER_CHOICES)
+
+
+class BookingConflict(Exception):
+    """Время заявок занято; conflicts - {id заявки: {'type', 'id'} занявшего или None}"""
+
+    def __init__(self, conflicts):
+        super().__init__(conflicts)
+        self.conflicts = conflicts
+
+
+STATUS_MESSAGES = {
+    'approved': 'одобрена',
+    'rejected': 'отклонена',
+}
+
+
+def _interval(booking):
+    return span(booking.date, booking.time_start, booking.time_end)
+
+
+def _notification(booking, status):
+    return {
+        'email': booking.user.email if booking.user_id else None,
+        'subject': f'Заявка на аренду льда {STATUS_MESSAGES[status]}',
+        'message': (
+            f'{booking.name}, ваша заявка на аренду льда {booking.date:%d.%m.%Y} '
+            f'{booking.time_start:%H:%M}-{booking.time_end:%H:%M} {STATUS_MESSAGES[status]}.'
+        ),
+    }
+
+
+def _conflict(blocker):
+    return {'type': blocker.source, 'id': blocker.owner.pk}
+
+
+def describe_conflict(conflict):
+    """Текст для сообщений: 'Событие #3'; None - заявка, одобренная параллельно"""
+    if conflict is None:
+        return 'Одобренная параллельно заявка'
+    return f"{BLOCKER_LABELS[conflict['type']]} #{conflict['id']}"
+
+
+def find_conflict(booking):
+    """Что занимает время booking: {'type', 'id'} или None"""
+    occupancy = Occupancy.for_range(booking.date, booking.date + timedelta(days=1), exclude_booking=booking.pk)
+    blocker = occupancy.blocker(*_interval(booking))
+    return _conflict(blocker) if blocker else None
+
+
+def approve_bookings(bookings):
+    """Одобряет заявки из QuerySet bookings, пропуская пересекающиеся.
+
+    Заявки проверяются в порядке начала: против расписания, событий и уже
+    одобренных заявок, затем против одобренных раньше в этой же пачке.
+    Возвращает (список id одобренных, {id не одобренной: {'type', 'id'}
+    занявшего время или None}).
+    """
+    with transaction.atomic():
+        candidates = list(
+            bookings.exclude(status='approved').select_related('user')
+            .select_for_update(of=('self',)).order_by('date', 'time_start', 'id')
+        )
+        if not candidates:
+            return [], {}
+        occupancy = Occupancy.for_range(candidates[0].date, candidates[-1].date + timedelta(days=1))
+
+        approved, conflicts = [], {}
+        # Одобренная в пачке заявка, которая заканчивается позже всех
+        latest, latest_end = None, None
+        for booking in candidates:
+            start, end = _interval(booking)
+            blocker = occupancy.blocker(start, end)
+            if blocker is not None:
+                conflicts[booking.pk] = _conflict(blocker)
+                continue
+            if latest is not None and start < latest_end:
+                conflicts[booking.pk] = {'type': 'booking', 'id': latest.pk}
+                continue
+            approved.append(booking)
+            if latest is None or end > latest_end:
+                latest, latest_end = booking, end
+
+        if approved:
+            try:
+                with transaction.atomic():
+                    IceBooking.objects.filter(pk__in=[booking.pk for booking in approved]).update(status='approved')
+            except IntegrityError:
+                # Пересекающуюся заявку одобрили параллельно: ограничение БД
+                # отклонило всю пачку, одобряем по одной
+                approved = _approve_each(approved, conflicts)
+
+        dates = []
+        for booking in approved:
+            dates += booking_dates(booking.date, booking.time_start, booking.time_end)
+        # update() не отправляет сигналы: дни для SlotOccupancy помечаем явно
+        mark_dirty(dates=dates)
+        notify(_notification(booking, 'approved') for booking in approved)
+    return [booking.pk for booking in approved], conflicts
+
+
+def reject_bookings(bookings):
+    """Отклоняет заявки из QuerySet bookings одним UPDATE; возвращает id отклоненных"""
+    with transaction.atomic():
+        rejected = list(bookings.exclude(status='rejected').select_related('user').select_for_update(of=('self',)))
+        IceBooking.objects.filter(pk__in=[booking.pk for booking in rejected]).update(status='rejected')
+        dates = []
+        for booking in rejected:
+            # Освобождается время только у ранее одобренных
+            if booking.status == 'approved':
+                dates += booking_dates(booking.date, booking.time_start, booking.time_end)
+        mark_dirty(dates=dates)
+        notify(_notification(booking, 'rejected') for booking in rejected)
+    return [booking.pk for booking in rejected]
+
+
+def decide_bookings(approve_ids, reject_ids):
+    """Применяет решения по пачке заявок одной транзакцией.
+
+    Сначала отклонения (они освобождают время), затем одобрения с
+    проверкой пересечений в памяти. Возвращает результат по каждому id:
+    {'id', 'status': 'approved' | 'rejected' | 'conflict' | 'not_found', 'conflicts_with'?}.
+    """
+    with transaction.atomic():
+        existing = set(IceBooking.objects.filter(pk__in=approve_ids + reject_ids).values_list('pk', flat=True))
+        reject_bookings(IceBooking.objects.filter(pk__in=reject_ids))
+        _, conflicts = approve_bookings(IceBooking.objects.filter(pk__in=approve_ids))
+
+    results = []
+    for pk in reject_ids:
+        results.append({'id': pk, 'status': 'rejected' if pk in existing else 'not_found'})
+    for pk in approve_ids:
+        if pk not in existing:
+            results.append({'id': pk, 'status': 'not_found'})
+        elif pk in conflicts:
+            results.append({'id': pk, 'status': 'conflict', 'conflicts_with': conflicts[pk]})
+        else:
+            results.append({'id': pk, 'status': 'approved'})
+    return results
+
+
+def _approve_each(bookings, conflicts):
+    approved = []
+    for booking in bookings:
+        try:
+            with transaction.atomic():
+                IceBooking.objects.filter(pk=booking.pk).update(status='approved')
+        except IntegrityError:
+            conflicts[booking.pk] = find_conflict(booking)
+        else:
+            approved.append(booking)
+    return approved
+
+
+def save_approved(booking, save):
+    """Сохраняет одобренную заявку через save(), если она ни с чем не пересекается.
+
+    booking - заявка с новыми значениями полей (еще не сохраненными).
+    """
+    with transaction.atomic():
+        conflict = find_conflict(booking)
+        if conflict is not None:
+            raise BookingConflict({booking.pk: conflict})
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            raise BookingConflict({booking.pk: None})
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class BookingsConfig(AppConfig):
     name = 'bookings'
+
+    def ready(self):
+        from core.cache import invalidate_on_change
+        from . import signals  # noqa: F401
+        from .models import TimeSlot
+
+        # Доступность ('availability') сбрасывается при пересчете SlotOccupancy
+        invalidate_on_change(TimeSlot, 'timeslots')
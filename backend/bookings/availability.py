@@ -0,0 +1,187 @@
+"""Материализованная доступность слотов (SlotOccupancy).
+
+Публичные запросы доступности читают готовые строки дата x слот одним
+диапазонным запросом. Недостающие дни досчитываются при чтении через
+Occupancy и сохраняются, только если попадают в окно хранения
+(STORED_DAYS дней от сегодня): остальные даты считаются без записи,
+чтобы публичный запрос не заполнял таблицу произвольными датами. Изменения расписания, событий, бронирований и слотов
+помечают затронутые дни (mark_dirty), которые пересчитываются один раз
+после коммита транзакции.
+"""
+import threading
+from datetime import date as Date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import bump
+from .models import SlotOccupancy, TimeSlot
+from .occupancy import EVENT_DURATION, Occupancy, span
+
+SLOT_FIELDS = ['price', 'is_available', 'blocker_type', 'blocker_id', 'booked_by']
+# Сколько дней вперед от сегодня доступность хранится в SlotOccupancy
+STORED_DAYS = 365
+
+_pending = threading.local()
+
+
+def default_slots():
+    """Дефолтные слоты если в базе пусто"""
+    return [TimeSlot(time_start=time(hour, 0), time_end=time(hour + 1, 0), price=4000) for hour in range(8, 22)]
+
+
+def slots_by_weekday():
+    """Активные слоты для каждого дня недели; общие слоты попадают в каждый день"""
+    by_weekday = {day: [] for day in range(7)}
+    for slot in TimeSlot.objects.filter(is_active=True).order_by('time_start'):
+        for day in ([slot.day_of_week] if slot.day_of_week is not None else range(7)):
+            by_weekday[day].append(slot)
+    defaults = default_slots()
+    return {day: slots or defaults for day, slots in by_weekday.items()}
+
+
+def compute_days(dates):
+    """Несохраненные SlotOccupancy для дат: по одному запросу на источник"""
+    dates = sorted(set(dates))
+    if not dates:
+        return []
+    by_weekday = slots_by_weekday()
+    occupancy = Occupancy.for_range(dates[0], dates[-1])
+    rows = []
+    for date in dates:
+        seen = set()
+        for slot in by_weekday[date.weekday()]:
+            key = (slot.time_start, slot.time_end)
+            if key in seen:
+                continue
+            seen.add(key)
+            blocker = occupancy.blocker(*span(date, slot.time_start, slot.time_end))
+            rows.append(SlotOccupancy(
+                date=date,
+                time_start=slot.time_start,
+                time_end=slot.time_end,
+                price=slot.price,
+                is_available=blocker is None,
+                blocker_type=blocker.source if blocker else '',
+                blocker_id=blocker.owner.pk if blocker else None,
+                # Имя арендатора показываем только для бронирований
+                booked_by=blocker.owner.name if blocker and blocker.source == 'booking' else '',
+            ))
+    return rows
+
+
+def rebuild_dates(dates):
+    """Пересчитывает строки для дат, удаляя слоты, которых больше нет"""
+    dates = sorted(set(dates))
+    rows = compute_days(dates)
+    with transaction.atomic():
+        SlotOccupancy.objects.filter(date__in=dates).delete()
+        # Параллельное ленивое заполнение могло успеть вставить те же слоты
+        SlotOccupancy.objects.bulk_create(
+            rows, batch_size=1000, update_conflicts=True,
+            unique_fields=['date', 'time_start', 'time_end'], update_fields=SLOT_FIELDS,
+        )
+    return len(rows)
+
+
+def rebuild_range(start, end):
+    count = rebuild_dates(start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    bump('availability')
+    return count
+
+
+def parse_date(value):
+    """Дата из строки YYYY-MM-DD; ValueError, если формат неверен или дата вне поддерживаемых"""
+    result = datetime.strptime(value, '%Y-%m-%d').date()
+    # Занятость дня учитывает соседние сутки
+    if not Date.min < result < Date.max:
+        raise ValueError(value)
+    return result
+
+
+def stored_window():
+    """Первый и последний день, доступность которых сохраняется в SlotOccupancy"""
+    today = timezone.localdate()
+    return today, today + timedelta(days=STORED_DAYS)
+
+
+def read_range(start, end):
+    """Строки SlotOccupancy за start..end.
+
+    Недостающие дни окна хранения считаются и сохраняются, дни вне окна
+    только считаются.
+    """
+    first, last = stored_window()
+    dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    stored = [date for date in dates if first <= date <= last]
+    rows = []
+    if stored:
+        queryset = SlotOccupancy.objects.filter(
+            date__gte=stored[0], date__lte=stored[-1]
+        ).order_by('date', 'time_start', 'time_end')
+        rows = list(queryset)
+        present = {row.date for row in rows}
+        missing = [date for date in stored if date not in present]
+        if missing:
+            rebuild_dates(missing)
+            rows = list(queryset.all())
+    if len(stored) < len(dates):
+        rows += compute_days(date for date in dates if not first <= date <= last)
+        rows.sort(key=lambda row: (row.date, row.time_start, row.time_end))
+    return rows
+
+
+def refresh(dates=(), weekdays=()):
+    """Пересчитывает уже материализованные дни.
+
+    Прошедшие дни не пересчитываются, а удаляются: при чтении
+    они будут посчитаны заново.
+    """
+    materialized = SlotOccupancy.objects.order_by().values_list('date', flat=True).distinct()
+    targets = set(materialized.filter(date__in=set(dates))) if dates else set()
+    if weekdays:
+        targets.update(materialized.filter(date__iso_week_day__in=[day + 1 for day in weekdays]))
+    today = timezone.localdate()
+    past = [date for date in targets if date < today]
+    if past:
+        SlotOccupancy.objects.filter(date__in=past).delete()
+    count = rebuild_dates(date for date in targets if date >= today)
+    bump('availability')
+    return count
+
+
+def _flush():
+    state = _pending.__dict__.pop('state', None)
+    if state is not None:
+        refresh(state['dates'], state['weekdays'])
+
+
+def mark_dirty(dates=(), weekdays=()):
+    """Помечает дни для пересчета после коммита текущей транзакции.
+
+    Изменения в одной транзакции копятся и пересчитываются одним проходом.
+    """
+    state = getattr(_pending, 'state', None)
+    if state is None:
+        state = _pending.state = {'dates': set(), 'weekdays': set()}
+    state['dates'].update(dates)
+    state['weekdays'].update(weekdays)
+    # После отката накопленное досчитается со следующим коммитом
+    transaction.on_commit(_flush)
+
+
+def interval_dates(start, end):
+    """Даты, которые задевает интервал [start, end)"""
+    dates = [start.date()]
+    while datetime.combine(dates[-1] + timedelta(days=1), time.min) < end:
+        dates.append(dates[-1] + timedelta(days=1))
+    return dates
+
+
+def event_dates(event_date):
+    start = timezone.make_naive(event_date) if timezone.is_aware(event_date) else event_date
+    return interval_dates(start, start + EVENT_DURATION)
+
+
+def booking_dates(date, time_start, time_end):
+    return interval_dates(*span(date, time_start, time_end))
@@ -0,0 +1,34 @@
+"""Импорт временных слотов аренды льда из файла (core.imports)"""
+from core.cache import bump
+from core.imports import Importer
+from .availability import mark_dirty
+from .models import TimeSlot
+
+
+class TimeSlotImporter(Importer):
+    """Слоты по ключу (начало, конец, день недели); обновляются цена и активность"""
+    model = TimeSlot
+    fields = ('time_start', 'time_end', 'price', 'day_of_week', 'is_active')
+    key = ('time_start', 'time_end', 'day_of_week')
+    update_fields = ('price', 'is_active')
+
+    def __init__(self, **defaults):
+        super().__init__(**defaults)
+        self.weekdays = set()
+
+    def check(self, values):
+        errors = {}
+        if values['time_start'] >= values['time_end']:
+            errors['time_end'] = 'Конец слота должен быть позже начала'
+        if values['price'] < 0:
+            errors['price'] = 'Цена не может быть отрицательной'
+        return errors
+
+    def touch(self, rows):
+        self.weekdays.update(row['day_of_week'] for row in rows)
+
+    def finish(self):
+        # Сигналы TimeSlot не срабатывают при массовой загрузке
+        if self.weekdays:
+            mark_dirty(weekdays=range(7) if None in self.weekdays else self.weekdays)
+            bump('timeslots')
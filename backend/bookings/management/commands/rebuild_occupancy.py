@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.availability import rebuild_range
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает доступность слотов (SlotOccupancy) за диапазон дат'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Первая дата YYYY-MM-DD (по умолчанию сегодня)')
+        parser.add_argument('--end', help='Последняя дата YYYY-MM-DD (по умолчанию start + 92 дня)')
+
+    def handle(self, *args, **options):
+        try:
+            start = self._parse(options['start']) or timezone.localdate()
+            end = self._parse(options['end']) or start + timedelta(days=92)
+        except ValueError:
+            raise CommandError('Даты должны быть в формате YYYY-MM-DD')
+        if end < start:
+            raise CommandError('end не может быть раньше start')
+        count = rebuild_range(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано слотов: {count} ({start} - {end})'))
+
+    def _parse(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_alter_timeslot_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time_start', models.TimeField()),
+                ('time_end', models.TimeField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_available', models.BooleanField(default=True)),
+                ('blocker_type', models.CharField(blank=True, choices=[('schedule', 'Расписание секций'), ('event', 'Событие'), ('booking', 'Бронирование')], max_length=20)),
+                ('blocker_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('booked_by', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'ordering': ['date', 'time_start'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'time_start', 'time_end'), name='slot_occupancy_unique_slot')],
+            },
+        ),
+    ]
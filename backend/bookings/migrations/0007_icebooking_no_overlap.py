@@ -0,0 +1,95 @@
+import logging
+from datetime import datetime, timedelta
+
+import django.db.models.expressions
+
+from django.db import migrations, models
+
+import bookings.models
+
+logger = logging.getLogger('bookings.migrations')
+
+
+# Как IceBooking.Meta.constraints; создается только на PostgreSQL (add_constraint)
+NO_OVERLAP = bookings.models.PostgresExclusionConstraint(
+    condition=models.Q(('status', 'approved')),
+    expressions=[(
+        bookings.models.TsRange(
+            django.db.models.expressions.ExpressionWrapper(
+                models.F('date') + models.F('time_start'), output_field=models.DateTimeField()
+            ),
+            models.Case(
+                models.When(
+                    time_end__gt=models.F('time_start'),
+                    then=django.db.models.expressions.ExpressionWrapper(
+                        models.F('date') + models.F('time_end'), output_field=models.DateTimeField()
+                    ),
+                ),
+                default=django.db.models.expressions.ExpressionWrapper(
+                    models.F('date') + models.Value(1) + models.F('time_end'),
+                    output_field=models.DateTimeField(),
+                ),
+            ),
+            models.Value('[)'),
+        ),
+        '&&',
+    )],
+    name='icebooking_no_overlap',
+)
+
+
+def release_overlaps(apps, schema_editor):
+    """Возвращает в ожидание одобренные заявки, пересекающиеся с более ранними.
+
+    Из пересекающихся остается одобренной начавшаяся раньше (при равном
+    начале - созданная раньше), иначе ограничение не создастся. Id
+    возвращенных заявок пишутся в лог bookings.migrations.
+    """
+    IceBooking = apps.get_model('bookings', 'IceBooking')
+    bookings = (
+        IceBooking.objects.using(schema_editor.connection.alias).filter(status='approved')
+        .order_by('date', 'time_start', 'id').values_list('id', 'date', 'time_start', 'time_end')
+    )
+    released, latest_end = [], None
+    for pk, date, time_start, time_end in bookings.iterator():
+        start = datetime.combine(date, time_start)
+        end = datetime.combine(date, time_end)
+        if end <= start:
+            end += timedelta(days=1)
+        if latest_end is not None and start < latest_end:
+            released.append(pk)
+            continue
+        latest_end = max(latest_end, end) if latest_end else end
+    if released:
+        IceBooking.objects.using(schema_editor.connection.alias).filter(pk__in=released).update(status='pending')
+        logger.warning(
+            'Пересекающиеся одобренные заявки возвращены в ожидание (%d): %s',
+            len(released), ', '.join(map(str, released)),
+        )
+
+
+def add_constraint(apps, schema_editor):
+    # EXCLUDE USING gist есть только в PostgreSQL; на других БД пересечения
+    # проверяет только bookings/approvals.py
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_constraint(apps.get_model('bookings', 'IceBooking'), NO_OVERLAP)
+
+
+def remove_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_constraint(apps.get_model('bookings', 'IceBooking'), NO_OVERLAP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_slot_occupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_overlaps, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddConstraint(model_name='icebooking', constraint=NO_OVERLAP)],
+            database_operations=[migrations.RunPython(add_constraint, remove_constraint)],
+        ),
+    ]
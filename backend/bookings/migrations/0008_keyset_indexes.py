@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_icebooking_no_overlap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='icebooking',
+            index=models.Index(fields=['created_at', 'id'], name='icebooking_created_id_idx'),
+        ),
+    ]
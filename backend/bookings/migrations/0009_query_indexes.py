@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='icebooking',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='icebooking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icebooking',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='icebooking_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icebooking',
+            index=models.Index(fields=['date', 'time_start'], name='icebooking_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='icebooking',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['date', 'time_start'], name='icebooking_approved_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:15
+
+from django.db import migrations, models
+
+
+def delete_duplicate_slots(apps, schema_editor):
+    """Оставляет один слот на (начало, конец, день); раньше слоты на все дни могли повторяться"""
+    TimeSlot = apps.get_model('bookings', 'TimeSlot')
+    slots = TimeSlot.objects.using(schema_editor.connection.alias)
+    seen, duplicates = set(), []
+    for pk, *key in slots.order_by('id').values_list('id', 'time_start', 'time_end', 'day_of_week'):
+        if tuple(key) in seen:
+            duplicates.append(pk)
+        seen.add(tuple(key))
+    slots.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_slots, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='timeslot',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='timeslot',
+            constraint=models.UniqueConstraint(fields=('time_start', 'time_end', 'day_of_week'), name='timeslot_unique_slot', nulls_distinct=False),
+        ),
+    ]
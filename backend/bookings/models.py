@@ -1,5 +1,7 @@
-from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db import DEFAULT_DB_ALIAS, connections, models
 
 User = get_user_model()
 
@@ -23,12 +25,52 @@ class TimeSlot(models.Model):
     
     class Meta:
         ordering = ['day_of_week', 'time_start']
-        unique_together = ['time_start', 'time_end', 'day_of_week']
+        constraints = [
+            # Слот на все дни (day_of_week NULL) тоже уникален; ключ импорта (bookings/imports.py)
+            models.UniqueConstraint(
+                fields=['time_start', 'time_end', 'day_of_week'], nulls_distinct=False, name='timeslot_unique_slot'
+            ),
+        ]
     
     def __str__(self):
         day = dict(self.DAYS_OF_WEEK).get(self.day_of_week, 'Все дни') if self.day_of_week is not None else 'Все дни'
         return f"{day}: {self.time_start} - {self.time_end} ({self.price}₽)"
 
+class TsRange(models.Func):
+    """tsrange(начало, конец, '[)') - интервал без часового пояса"""
+    function = 'TSRANGE'
+    output_field = DateTimeRangeField()
+
+
+def _at(time_field, next_day=False):
+    """date + время (timestamp); next_day - на следующие сутки"""
+    date = models.F('date') + models.Value(1) if next_day else models.F('date')
+    return models.ExpressionWrapper(date + models.F(time_field), output_field=models.DateTimeField())
+
+
+# Время бронирования; конец не позже начала - следующие сутки (как bookings.occupancy.span)
+BOOKING_PERIOD = TsRange(
+    _at('time_start'),
+    models.Case(
+        models.When(time_end__gt=models.F('time_start'), then=_at('time_end')),
+        default=_at('time_end', next_day=True),
+    ),
+    models.Value('[)'),
+)
+
+
+class PostgresExclusionConstraint(ExclusionConstraint):
+    """EXCLUDE-ограничение, которое есть только в PostgreSQL.
+
+    Создается миграцией лишь на PostgreSQL; на других БД проверка при
+    full_clean (формы админки) пропускается.
+    """
+
+    def validate(self, model, instance, exclude=None, using=DEFAULT_DB_ALIAS):
+        if connections[using].vendor == 'postgresql':
+            super().validate(model, instance, exclude=exclude, using=using)
+
+
 class IceBooking(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Ожидает'),
@@ -49,6 +91,56 @@ class IceBooking(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Пагинация по ключу (core/pagination.py)
+            models.Index(fields=['created_at', 'id'], name='icebooking_created_id_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='icebooking_user_created_idx'),
+            models.Index(
+                fields=['created_at', 'id'], condition=models.Q(status='pending'), name='icebooking_pending_idx'
+            ),
+            # Выгрузка по диапазону дат
+            models.Index(fields=['date', 'time_start'], name='icebooking_date_idx'),
+            # Занятость льда (bookings/occupancy.py) учитывает только одобренные
+            models.Index(
+                fields=['date', 'time_start'], condition=models.Q(status='approved'), name='icebooking_approved_idx'
+            ),
+        ]
+        constraints = [
+            # Одобренные бронирования не пересекаются (проверка заранее - bookings.approvals);
+            # на PostgreSQL, на других БД - только проверка в приложении
+            PostgresExclusionConstraint(
+                name='icebooking_no_overlap',
+                expressions=[(BOOKING_PERIOD, RangeOperators.OVERLAPS)],
+                condition=models.Q(status='approved'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.date} {self.time_start}"
+
+class SlotOccupancy(models.Model):
+    """Предрасчитанная доступность слота на дату (см. bookings/availability.py)"""
+    BLOCKER_CHOICES = [
+        ('schedule', 'Расписание секций'),
+        ('event', 'Событие'),
+        ('booking', 'Бронирование'),
+    ]
+    
+    date = models.DateField()
+    time_start = models.TimeField()
+    time_end = models.TimeField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    is_available = models.BooleanField(default=True)
+    blocker_type = models.CharField(max_length=20, choices=BLOCKER_CHOICES, blank=True)
+    blocker_id = models.PositiveIntegerField(null=True, blank=True)
+    booked_by = models.CharField(max_length=100, blank=True)
+    
+    class Meta:
+        ordering = ['date', 'time_start']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time_start', 'time_end'], name='slot_occupancy_unique_slot'),
+        ]
+    
+    def __str__(self):
+        state = 'свободно' if self.is_available else self.get_blocker_type_display()
+        return f"{self.date} {self.time_start} - {self.time_end}: {state}"
@@ -0,0 +1,151 @@
+"""Занятость льда за день.
+
+Все занятые интервалы дня (расписание секций, события, одобренные
+бронирования) один раз сортируются и сливаются в непересекающиеся
+отрезки, после чего проверка любого слота - двоичный поиск:
+O((S + B) log B) вместо перебора всех пар слот x интервал.
+
+Интервалы хранятся как наивные локальные datetime, поэтому событие
+в 23:00 корректно занимает и начало следующего дня.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from events.models import Event
+from sections.models import Schedule
+from .models import IceBooking
+
+# Событие занимает лед на 2 часа от начала
+EVENT_DURATION = timedelta(hours=2)
+
+# Источники в порядке приоритета: о слоте сообщается первый занявший его
+SOURCES = ('schedule', 'event', 'booking')
+
+Blocker = namedtuple('Blocker', ['source', 'start', 'end', 'owner'])
+
+
+def span(date, time_start, time_end):
+    """Интервал (начало, конец) для времени дня; конец не позже начала - следующие сутки"""
+    start = datetime.combine(date, time_start)
+    end = datetime.combine(date, time_end)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+class IntervalSet:
+    """Слитые отрезки одного источника с исходными интервалами внутри"""
+
+    def __init__(self):
+        self._items = []
+        self._starts = None
+
+    def add(self, start, end, owner=None):
+        if end > start:
+            self._items.append((start, end, owner))
+            self._starts = None
+
+    def _build(self):
+        self._items.sort(key=lambda item: (item[0], item[1]))
+        self._starts, self._ends, self._members = [], [], []
+        for start, end, owner in self._items:
+            if self._ends and start < self._ends[-1]:
+                self._ends[-1] = max(self._ends[-1], end)
+                self._members[-1].append((start, end, owner))
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+                self._members.append([(start, end, owner)])
+
+    def find(self, start, end):
+        """Первый интервал, пересекающийся с [start, end), или None"""
+        if self._starts is None:
+            self._build()
+        # Первый слитый отрезок, закончившийся после начала запроса
+        index = bisect_right(self._ends, start)
+        if index == len(self._ends) or self._starts[index] >= end:
+            return None
+        for item in self._members[index]:
+            if item[0] < end and item[1] > start:
+                return item
+        return None
+
+    def __iter__(self):
+        if self._starts is None:
+            self._build()
+        return iter(zip(self._starts, self._ends))
+
+
+class Occupancy:
+    """Занятость льда: отдельный IntervalSet на каждый источник"""
+
+    def __init__(self):
+        self.layers = {source: IntervalSet() for source in SOURCES}
+
+    def add(self, source, start, end, owner=None):
+        self.layers[source].add(start, end, owner)
+
+    def blocker(self, start, end, sources=SOURCES):
+        """Кто занимает [start, end): Blocker с наиболее приоритетным источником или None"""
+        for source in sources:
+            item = self.layers[source].find(start, end)
+            if item is not None:
+                return Blocker(source, *item)
+        return None
+
+    def is_free(self, start, end):
+        return self.blocker(start, end) is None
+
+    def add_schedules(self, date, schedules):
+        for schedule in schedules:
+            self.add('schedule', *span(date, schedule.time_start, schedule.time_end), owner=schedule)
+
+    def add_events(self, events):
+        for event in events:
+            start = timezone.make_naive(event.date) if timezone.is_aware(event.date) else event.date
+            self.add('event', start, start + EVENT_DURATION, owner=event)
+
+    def add_bookings(self, bookings):
+        for booking in bookings:
+            self.add('booking', *span(booking.date, booking.time_start, booking.time_end), owner=booking)
+
+    @classmethod
+    def for_date(cls, date, exclude_booking=None, sources=SOURCES):
+        """Занятость на дату: по одному запросу на источник независимо от числа слотов"""
+        return cls.for_range(date, date, exclude_booking=exclude_booking, sources=sources)
+
+    @classmethod
+    def for_range(cls, start_date, end_date, exclude_booking=None, sources=SOURCES):
+        """Занятость на даты start_date..end_date включительно"""
+        occupancy = cls()
+        days = (end_date - start_date).days + 1
+
+        if 'schedule' in sources:
+            schedules = list(Schedule.objects.filter(day_of_week__in={
+                (start_date + timedelta(days=offset)).weekday() for offset in range(min(days, 7))
+            }))
+            # Расписание еженедельное: разворачиваем его на каждый день диапазона
+            for offset in range(days):
+                date = start_date + timedelta(days=offset)
+                occupancy.add_schedules(date, (s for s in schedules if s.day_of_week == date.weekday()))
+
+        if 'event' in sources:
+            # Событие накануне вечером может захватить начало первого дня
+            range_start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()) - EVENT_DURATION)
+            range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+            occupancy.add_events(
+                Event.objects.filter(date__gte=range_start, date__lt=range_end).only('id', 'title', 'date')
+            )
+
+        if 'booking' in sources:
+            # Бронирование накануне может заканчиваться после полуночи
+            bookings = IceBooking.objects.filter(
+                status='approved', date__gte=start_date - timedelta(days=1), date__lte=end_date,
+            ).only('id', 'name', 'date', 'time_start', 'time_end')
+            if exclude_booking is not None:
+                bookings = bookings.exclude(pk=exclude_booking)
+            occupancy.add_bookings(bookings)
+        return occupancy
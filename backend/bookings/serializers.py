@@ -1,8 +1,7 @@
 from rest_framework import serializers
 from .models import IceBooking, TimeSlot
-from sections.models import Schedule
-from events.models import Event
-from datetime import datetime, timedelta
+from .occupancy import Occupancy, span
+from datetime import datetime
 from core.validators import validate_phone, validate_name, validate_message
 
 class TimeSlotSerializer(serializers.ModelSerializer):
@@ -18,6 +17,12 @@ class TimeSlotSerializer(serializers.ModelSerializer):
         days = ['Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье']
         return days[obj.day_of_week]
 
+BLOCKER_MESSAGES = {
+    'schedule': "Время занято расписанием секций",
+    'event': "Время занято событием",
+    'booking': "Время уже забронировано",
+}
+
 class IceBookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = IceBooking
@@ -59,17 +64,10 @@ class IceBookingSerializer(serializers.ModelSerializer):
         if duration >= 3:
             raise serializers.ValidationError("Для аренды более 3 часов требуется согласование")
         
-        day_of_week = date.weekday()
-        schedules = Schedule.objects.filter(day_of_week=day_of_week)
-        for schedule in schedules:
-            if not (time_end <= schedule.time_start or time_start >= schedule.time_end):
-                raise serializers.ValidationError("Время занято расписанием секций")
-        
-        events = Event.objects.filter(date__date=date)
-        for event in events:
-            event_time = event.date.time()
-            if not (time_end <= event_time or time_start >= event_time):
-                raise serializers.ValidationError("Время занято событием")
+        occupancy = Occupancy.for_date(date, exclude_booking=self.instance.pk if self.instance else None)
+        blocker = occupancy.blocker(*span(date, time_start, time_end))
+        if blocker is not None:
+            raise serializers.ValidationError(BLOCKER_MESSAGES[blocker.source])
         
         data['duration_hours'] = duration
         return data
@@ -0,0 +1,85 @@
+"""Пересчет SlotOccupancy при изменении источников занятости"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from events.models import Event
+from sections.models import Schedule
+from .availability import booking_dates, event_dates, mark_dirty
+from .models import IceBooking, TimeSlot
+
+
+def _remember(sender, instance, fields):
+    """Сохраняет прежние значения полей до save (один запрос по pk)"""
+    instance._occupancy_old = None
+    if instance.pk:
+        instance._occupancy_old = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=Schedule)
+def schedule_pre_save(sender, instance, **kwargs):
+    _remember(sender, instance, ['day_of_week', 'time_start', 'time_end'])
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def schedule_changed(sender, instance, **kwargs):
+    weekdays = {instance.day_of_week}
+    old = getattr(instance, '_occupancy_old', None)
+    if old:
+        weekdays.add(old['day_of_week'])
+    # Занятие до полуночи и позже захватывает следующий день
+    mark_dirty(weekdays=weekdays | {(day + 1) % 7 for day in weekdays})
+
+
+@receiver(pre_save, sender=Event)
+def event_pre_save(sender, instance, **kwargs):
+    _remember(sender, instance, ['date'])
+
+
+@receiver(post_save, sender=Event)
+def event_changed(sender, instance, **kwargs):
+    old = getattr(instance, '_occupancy_old', None)
+    if old and old['date'] == instance.date:
+        return
+    dates = event_dates(instance.date)
+    if old:
+        dates += event_dates(old['date'])
+    mark_dirty(dates=dates)
+
+
+@receiver(post_delete, sender=Event)
+def event_deleted(sender, instance, **kwargs):
+    # Удаленное событие освобождает свое время, даже если дату не меняли
+    mark_dirty(dates=event_dates(instance.date))
+
+
+@receiver(pre_save, sender=IceBooking)
+def booking_pre_save(sender, instance, **kwargs):
+    _remember(sender, instance, ['status', 'date', 'time_start', 'time_end'])
+
+
+@receiver(post_save, sender=IceBooking)
+@receiver(post_delete, sender=IceBooking)
+def booking_changed(sender, instance, **kwargs):
+    # Занятость дают только одобренные бронирования
+    old = getattr(instance, '_occupancy_old', None)
+    dates = []
+    if instance.status == 'approved':
+        dates += booking_dates(instance.date, instance.time_start, instance.time_end)
+    if old and old['status'] == 'approved':
+        dates += booking_dates(old['date'], old['time_start'], old['time_end'])
+    if dates:
+        mark_dirty(dates=dates)
+
+
+@receiver(pre_save, sender=TimeSlot)
+def timeslot_pre_save(sender, instance, **kwargs):
+    _remember(sender, instance, ['day_of_week'])
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def timeslot_changed(sender, instance, **kwargs):
+    old = getattr(instance, '_occupancy_old', None)
+    days = {instance.day_of_week, old['day_of_week'] if old else instance.day_of_week}
+    mark_dirty(weekdays=range(7) if None in days else days)
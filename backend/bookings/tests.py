@@ -1,3 +1,364 @@
-from django.test import TestCase
+import unittest
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from events.models import Event
+from sections.models import Group, Schedule, Section
+from .availability import STORED_DAYS
+from .occupancy import IntervalSet, Occupancy, span
+from .models import IceBooking, SlotOccupancy
+
+User = get_user_model()
+
+
+class BookingListPaginationTest(TestCase):
+    """Список заявок листается курсором по (created_at, id) без COUNT и OFFSET"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        IceBooking.objects.bulk_create([
+            IceBooking(name=f'Заявка {i}', phone='1', date=date(2026, 1, 1),
+                       time_start=time(10), time_end=time(11), duration_hours=1)
+            for i in range(25)
+        ])
+        # Одинаковое время создания: порядок внутри держит id
+        IceBooking.objects.update(created_at=timezone.now())
+
+    def test_pages_cover_all_rows_once(self):
+        ids, url = [], '/api/bookings/bookings/?page_size=10'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [booking['id'] for booking in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, sorted(IceBooking.objects.values_list('id', flat=True), reverse=True))
+
+    def test_previous_returns_preceding_page(self):
+        first = self.client.get('/api/bookings/bookings/?page_size=10').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/bookings/bookings/?cursor=broken').status_code, 404)
+
+
+class AvailabilityTest(TestCase):
+    """Доступность сохраняется только в окне хранения, неверная дата - 400"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.day = timezone.localdate() + timedelta(days=3)
+
+    def slots(self, day):
+        response = self.client.get(f'/api/bookings/bookings/available_slots/?date={day:%Y-%m-%d}')
+        self.assertEqual(response.status_code, 200)
+        return {slot['time_start']: slot['is_available'] for slot in response.data}
+
+    def test_invalid_dates(self):
+        for value in ('bad', '2026-02-30', '9999-12-31', '0001-01-01'):
+            response = self.client.get(f'/api/bookings/bookings/available_slots/?date={value}')
+            self.assertEqual(response.status_code, 400, value)
+        response = self.client.get('/api/bookings/bookings/available_calendar/?start=2026-01-01&end=9999-12-31')
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_window_is_stored(self):
+        self.assertTrue(self.slots(self.day))
+        far = timezone.localdate() + timedelta(days=STORED_DAYS + 1)
+        self.assertTrue(self.slots(far))
+        self.assertTrue(self.slots(timezone.localdate() - timedelta(days=1)))
+        self.assertEqual(list(SlotOccupancy.objects.order_by().values_list('date', flat=True).distinct()), [self.day])
+
+    def test_deleted_event_frees_slot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Event.objects.create(
+                title='Матч', description='Описание', event_type='hockey',
+                date=timezone.make_aware(datetime.combine(self.day, time(10))), price_min=500, price_max=1500,
+            )
+        self.assertFalse(self.slots(self.day)['10:00:00'])
+
+        # Сохранение без смены даты, затем удаление того же экземпляра
+        event.title = 'Перенесено'
+        event.save()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            event.delete()
+        self.assertTrue(self.slots(self.day)['10:00:00'])
+
+
+class CalendarTest(TestCase):
+    """Календарь доступности: число чтений не зависит от длины диапазона"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.start = timezone.localdate() + timedelta(days=1)
+
+    def calendar(self, days):
+        cache.clear()
+        end = self.start + timedelta(days=days - 1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/bookings/bookings/available_calendar/?start={self.start}&end={end}')
+        self.assertEqual(response.status_code, 200)
+        # Запись сохраняемых дней идет пачками по 1000 строк, чтение - по запросу на источник
+        return response.data, sum(query['sql'].startswith('SELECT') for query in context)
+
+    def test_query_count_does_not_depend_on_range(self):
+        week, week_queries = self.calendar(7)
+        self.assertEqual(len(week['days']), 7)
+        SlotOccupancy.objects.all().delete()
+        month, month_queries = self.calendar(28)
+        self.assertEqual(len(month['days']), 28)
+        self.assertEqual(week_queries, month_queries)
+        # Дни уже сохранены: один запрос к SlotOccupancy
+        self.assertEqual(self.calendar(28)[1], 1)
+
+    def test_event_blocks_its_slot(self):
+        day = self.start + timedelta(days=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(
+                title='Матч', description='Описание', event_type='hockey',
+                date=timezone.make_aware(datetime.combine(day, time(10))), price_min=500, price_max=1500,
+            )
+        data, _ = self.calendar(4)
+        slot = next(index for index, (start, _, _) in enumerate(data['slots']) if start == '10:00')
+        for calendar_day in data['days']:
+            available = dict(zip(calendar_day['slots'], calendar_day['available']))
+            self.assertEqual(available[slot], '0' if calendar_day['date'] == day.isoformat() else '1')
+
+
+class IntervalSetTest(SimpleTestCase):
+    """Слияние отрезков и двоичный поиск по их границам"""
+
+    def at(self, hour, minute=0):
+        return datetime(2026, 1, 1) + timedelta(hours=hour, minutes=minute)
+
+    def intervals(self, *pairs):
+        intervals = IntervalSet()
+        for owner, (start, end) in enumerate(pairs):
+            intervals.add(self.at(start), self.at(end), owner)
+        return intervals
+
+    def test_overlapping_are_merged(self):
+        intervals = self.intervals((11, 13), (10, 12), (12, 12.5))
+        self.assertEqual(list(intervals), [(self.at(10), self.at(13))])
+
+    def test_adjacent_stay_apart(self):
+        intervals = self.intervals((10, 11), (11, 12))
+        self.assertEqual(list(intervals), [(self.at(10), self.at(11)), (self.at(11), self.at(12))])
+        self.assertEqual(intervals.find(self.at(11), self.at(11, 30))[2], 1)
+
+    def test_empty_interval_is_ignored(self):
+        self.assertEqual(list(self.intervals((10, 10), (12, 11))), [])
+
+    def test_boundaries(self):
+        intervals = self.intervals((10, 12), (14, 15))
+        # Касание границ не пересечение
+        self.assertIsNone(intervals.find(self.at(9), self.at(10)))
+        self.assertIsNone(intervals.find(self.at(12), self.at(14)))
+        self.assertIsNone(intervals.find(self.at(15), self.at(16)))
+        self.assertEqual(intervals.find(self.at(9), self.at(10, 1))[2], 0)
+        self.assertEqual(intervals.find(self.at(11, 59), self.at(12))[2], 0)
+        self.assertEqual(intervals.find(self.at(13), self.at(14, 1))[2], 1)
+        self.assertEqual(intervals.find(self.at(8), self.at(20))[2], 0)
+
+    def test_reports_overlapping_member_of_merged_run(self):
+        intervals = self.intervals((10, 12), (11, 13))
+        # Отрезок слит в 10-13, но после 12 лед занимает только второй интервал
+        self.assertEqual(intervals.find(self.at(12), self.at(12, 30))[2], 1)
+        self.assertEqual(intervals.find(self.at(10), self.at(10, 30))[2], 0)
+
+    def test_add_after_find_rebuilds(self):
+        intervals = self.intervals((10, 11))
+        self.assertIsNone(intervals.find(self.at(12), self.at(13)))
+        intervals.add(self.at(12), self.at(13), 'new')
+        self.assertEqual(intervals.find(self.at(12), self.at(13))[2], 'new')
+
+
+class OccupancyTest(TestCase):
+    """Приоритет источников, переход через полночь и исключение самой заявки"""
+
+    def setUp(self):
+        self.day = timezone.localdate() + timedelta(days=5)
+
+    def booking(self, time_start, time_end, day=None):
+        return IceBooking.objects.create(
+            name='Заявка', phone='1', date=day or self.day, time_start=time_start, time_end=time_end,
+            duration_hours=1, status='approved',
+        )
+
+    def test_span_crosses_midnight(self):
+        start, end = span(self.day, time(23), time(1))
+        self.assertEqual(end - start, timedelta(hours=2))
+        self.assertEqual(end.date(), self.day + timedelta(days=1))
+
+    def test_priority(self):
+        start, end = span(self.day, time(10), time(11))
+        occupancy = Occupancy()
+        occupancy.add('booking', start, end, 'booking')
+        occupancy.add('event', start, end, 'event')
+        self.assertEqual(occupancy.blocker(start, end).source, 'event')
+        occupancy.add('schedule', start, end, 'schedule')
+        self.assertEqual(occupancy.blocker(start, end), ('schedule', start, end, 'schedule'))
+        self.assertEqual(occupancy.blocker(start, end, sources=('booking',)).owner, 'booking')
+
+    def test_priority_from_database(self):
+        section = Section.objects.create(name='Хоккей', section_type='hockey', description='Описание', price=1000)
+        schedule = Schedule.objects.create(
+            group=Group.objects.create(section=section, name='Группа'),
+            day_of_week=self.day.weekday(), time_start=time(10), time_end=time(11),
+        )
+        event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.make_aware(datetime.combine(self.day, time(10, 30))), price_min=500, price_max=1500,
+        )
+        self.booking(time(11), time(12))
+        occupancy = Occupancy.for_date(self.day)
+        self.assertEqual(occupancy.blocker(*span(self.day, time(10), time(11))).owner, schedule)
+        # После расписания в 11:00 слот держит событие, а не заявка
+        self.assertEqual(occupancy.blocker(*span(self.day, time(11), time(12))).owner, event)
+        self.assertEqual(occupancy.blocker(*span(self.day, time(12), time(13))).owner, event)
+        self.assertIsNone(occupancy.blocker(*span(self.day, time(13), time(14))))
+
+    def test_booking_crosses_midnight(self):
+        booking = self.booking(time(23), time(1))
+        next_day = self.day + timedelta(days=1)
+        occupancy = Occupancy.for_date(next_day)
+        self.assertEqual(occupancy.blocker(*span(next_day, time(0), time(1))).owner, booking)
+        self.assertTrue(occupancy.is_free(*span(next_day, time(1), time(2))))
+        self.assertEqual(Occupancy.for_date(self.day).blocker(*span(self.day, time(22), time(0))).owner, booking)
+
+    def test_exclude_booking(self):
+        booking = self.booking(time(10), time(11))
+        other = self.booking(time(10, 30), time(11, 30))
+        slot = span(self.day, time(10), time(11))
+        self.assertEqual(Occupancy.for_date(self.day).blocker(*slot).owner, booking)
+        # Повторная проверка заявки не находит ее саму, но видит соседнюю
+        occupancy = Occupancy.for_date(self.day, exclude_booking=booking.pk)
+        self.assertEqual(occupancy.blocker(*slot).owner, other)
+        occupancy = Occupancy.for_date(self.day, exclude_booking=other.pk)
+        self.assertTrue(occupancy.is_free(*span(self.day, time(11), time(12))))
+
+
+class DecideBookingsTest(TestCase):
+    """Пачка одобрений проверяется против расписания, событий и одобренных заявок"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        self.day = timezone.localdate() + timedelta(days=3)
+        section = Section.objects.create(name='Хоккей', section_type='hockey', description='Описание', price=1000)
+        self.schedule = Schedule.objects.create(
+            group=Group.objects.create(section=section, name='Группа'),
+            day_of_week=self.day.weekday(), time_start=time(10), time_end=time(11),
+        )
+        self.event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.make_aware(datetime.combine(self.day, time(14))), price_min=500, price_max=1500,
+        )
+        self.approved = self.booking(16, 'approved')
+
+    def booking(self, hour, status='pending'):
+        start = datetime.combine(self.day, time(hour)) + timedelta(minutes=30 if status == 'pending' else 0)
+        return IceBooking.objects.create(
+            name='Клиент', phone='1', date=self.day, time_start=start.time(),
+            time_end=(start + timedelta(hours=1)).time(), duration_hours=1, status=status,
+        )
+
+    def decide(self, approve, reject=()):
+        response = self.client.post(
+            '/api/bookings/bookings/decide/', {'approve': list(approve), 'reject': list(reject)}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return {result['id']: result for result in response.data['results']}
+
+    def test_conflicts_with_every_source(self):
+        on_schedule, on_event, on_booking, later = (self.booking(hour) for hour in (10, 14, 16, 18))
+        # 18:00-19:00 свободно и начинается раньше later (18:30-19:30) из той же пачки
+        earlier = IceBooking.objects.create(
+            name='Клиент', phone='1', date=self.day, time_start=time(18), time_end=time(19), duration_hours=1,
+        )
+        results = self.decide([on_schedule.pk, on_event.pk, on_booking.pk, later.pk, earlier.pk, 0])
+
+        self.assertEqual(results[on_schedule.pk]['conflicts_with'], {'type': 'schedule', 'id': self.schedule.pk})
+        self.assertEqual(results[on_event.pk]['conflicts_with'], {'type': 'event', 'id': self.event.pk})
+        self.assertEqual(results[on_booking.pk]['conflicts_with'], {'type': 'booking', 'id': self.approved.pk})
+        self.assertEqual(results[earlier.pk]['status'], 'approved')
+        self.assertEqual(results[later.pk]['conflicts_with'], {'type': 'booking', 'id': earlier.pk})
+        self.assertEqual(results[0]['status'], 'not_found')
+        approved = set(IceBooking.objects.filter(status='approved').values_list('pk', flat=True))
+        self.assertEqual(approved, {self.approved.pk, earlier.pk})
+
+    def test_rejection_frees_time_for_approval(self):
+        pending = self.booking(16)
+        results = self.decide([pending.pk], [self.approved.pk])
+        self.assertEqual(results[self.approved.pk]['status'], 'rejected')
+        self.assertEqual(results[pending.pk]['status'], 'approved')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Ограничение icebooking_no_overlap есть только в PostgreSQL')
+class NoOverlapConstraintTest(TestCase):
+    """БД отклоняет пересекающиеся одобренные заявки, даже если проверка в приложении их пропустила"""
+
+    def setUp(self):
+        cache.clear()
+        self.day = timezone.localdate() + timedelta(days=3)
+        self.approved = self.booking(time(10), time(11), 'approved')
+
+    def booking(self, start, end, status='pending', day=None):
+        return IceBooking.objects.create(
+            name='Клиент', phone='1', date=day or self.day, time_start=start, time_end=end,
+            duration_hours=1, status=status,
+        )
+
+    def test_database_rejects_overlap(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.booking(time(10, 30), time(11, 30), 'approved')
+        pending = self.booking(time(10, 30), time(11, 30))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            IceBooking.objects.filter(pk=pending.pk).update(status='approved')
+        # Смежные интервалы не пересекаются: [10:00, 11:00) и [11:00, 12:00)
+        self.booking(time(11), time(12), 'approved')
+
+    def test_overnight_booking(self):
+        self.booking(time(23), time(1), 'approved')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.booking(time(0, 30), time(1, 30), 'approved', day=self.day + timedelta(days=1))
+
+    def test_decide_reports_constraint_collision(self):
+        pending = self.booking(time(10, 30), time(11, 30))
+        real_for_range = Occupancy.for_range
+        calls = []
+
+        def for_range(*args, **kwargs):
+            # Проверка пачки не видит одобренную заявку, как при параллельном одобрении
+            calls.append(args)
+            return Occupancy() if len(calls) == 1 else real_for_range(*args, **kwargs)
+
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        with mock.patch.object(Occupancy, 'for_range', for_range):
+            response = client.post('/api/bookings/bookings/decide/', {'approve': [pending.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': pending.pk, 'status': 'conflict', 'conflicts_with': {'type': 'booking', 'id': self.approved.pk}},
+        ])
+        self.assertEqual(IceBooking.objects.get(pk=pending.pk).status, 'pending')
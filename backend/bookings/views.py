@@ -2,144 +2,192 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
-from datetime import datetime, timedelta, time
-from django.db import models
+from copy import copy
+from django.core.exceptions import ValidationError
+from .approvals import BookingConflict, decide_bookings, save_approved
+from .availability import parse_date, read_range
+from core.cache import cache_response
+from core.exports import filter_export, stream_export
+from core.pagination import KeysetPagination
+from core.validators import validate_decisions
+from core.views import import_response
 from .models import IceBooking, TimeSlot
 from .serializers import IceBookingSerializer, AvailableSlotSerializer, TimeSlotSerializer
-from sections.models import Schedule
-from events.models import Event
 
 class TimeSlotViewSet(viewsets.ModelViewSet):
     queryset = TimeSlot.objects.all()
     serializer_class = TimeSlotSerializer
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'import_file']:
             return [IsAdminUser()]
         # Разрешить всем видеть временные слоты (публичный доступ)
         return [AllowAny()]
+    
+    @cache_response('timeslots')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response('timeslots')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """Импорт слотов из CSV/JSON/NDJSON в фоне с обновлением цены по времени и дню"""
+        return import_response(request, 'bookings.imports.TimeSlotImporter')
 
 class IceBookingViewSet(viewsets.ModelViewSet):
     serializer_class = IceBookingSerializer
+    pagination_class = KeysetPagination
+    # Максимальный диапазон available_calendar
+    MAX_CALENDAR_DAYS = 92
     
     def get_permissions(self):
-        if self.action in ['create', 'available_slots']:
+        if self.action in ['create', 'available_slots', 'available_calendar']:
             # Разрешить всем создавать бронирования и смотреть доступные слоты (публичный доступ)
             return [AllowAny()]
+        if self.action in ['decide', 'export']:
+            return [IsAdminUser()]
         return [IsAuthenticated()]
     
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.is_staff:
-            return IceBooking.objects.all()
-        if self.request.user.is_authenticated:
-            return IceBooking.objects.filter(user=self.request.user)
-        return IceBooking.objects.none()
+            queryset = IceBooking.objects.all()
+        elif self.request.user.is_authenticated:
+            queryset = IceBooking.objects.filter(user=self.request.user)
+        else:
+            return IceBooking.objects.none()
+        statuses = self.request.query_params.get('status')
+        if self.action == 'list' and statuses:
+            # Очередь ?status=pending читается по частичному индексу icebooking_pending_idx
+            queryset = queryset.filter(status__in=statuses.split(','))
+        return queryset
     
     def perform_create(self, serializer):
         user = self.request.user if self.request.user.is_authenticated else None
         serializer.save(user=user, status='pending')
     
+    def perform_update(self, serializer):
+        booking = serializer.instance
+        if serializer.validated_data.get('status', booking.status) != 'approved':
+            return super().perform_update(serializer)
+        # Одобренная заявка не должна пересекаться с другими одобренными
+        preview = copy(booking)
+        for field, value in serializer.validated_data.items():
+            setattr(preview, field, value)
+        save_approved(preview, serializer.save)
+    
     def update(self, request, *args, **kwargs):
         if not request.user.is_staff:
             return Response({'error': 'Только администратор может изменять статус'}, status=status.HTTP_403_FORBIDDEN)
-        return super().update(request, *args, **kwargs)
+        try:
+            return super().update(request, *args, **kwargs)
+        except BookingConflict as e:
+            return Response({
+                'error': 'Время занято расписанием, событием или одобренным бронированием',
+                'conflicts': [{'booking': pk, 'conflicts_with': conflict} for pk, conflict in e.conflicts.items()]
+            }, status=status.HTTP_409_CONFLICT)
     
     def partial_update(self, request, *args, **kwargs):
         if not request.user.is_staff:
             return Response({'error': 'Только администратор может изменять статус'}, status=status.HTTP_403_FORBIDDEN)
         return super().partial_update(request, *args, **kwargs)
     
+    @action(detail=False, methods=['post'])
+    def decide(self, request):
+        """Одобрение и отклонение пачки заявок: {"approve": [id], "reject": [id]}"""
+        try:
+            approve, reject = validate_decisions(request.data)
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': decide_bookings(approve, reject)})
+    
+    # Колонки выгрузки: (заголовок, поле)
+    EXPORT_COLUMNS = [
+        ('id', 'id'), ('created_at', 'created_at'), ('date', 'date'),
+        ('time_start', 'time_start'), ('time_end', 'time_end'), ('duration_hours', 'duration_hours'),
+        ('name', 'name'), ('phone', 'phone'), ('message', 'message'),
+        ('status', 'status'), ('user_email', 'user__email'),
+    ]
+    
     @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка: ?output=csv|ndjson&date_from=&date_to= (по дате аренды)&status="""
+        try:
+            queryset = filter_export(
+                IceBooking.objects.order_by('date', 'time_start', 'id'),
+                request.query_params, 'date', IceBooking.STATUS_CHOICES,
+            )
+            return stream_export(queryset, self.EXPORT_COLUMNS, request.query_params.get('output', 'csv'), 'bookings')
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['get'])
+    @cache_response('availability')
     def available_slots(self, request):
         date_str = request.query_params.get('date')
         if not date_str:
             return Response({'error': 'Требуется параметр date'}, status=status.HTTP_400_BAD_REQUEST)
         
-        date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        day_of_week = date.weekday()
-        
-        # Получаем слоты для конкретного дня недели или общие слоты
-        time_slots = TimeSlot.objects.filter(
-            is_active=True
-        ).filter(
-            models.Q(day_of_week=day_of_week) | models.Q(day_of_week__isnull=True)
-        ).order_by('time_start')
+        try:
+            date = parse_date(date_str)
+        except ValueError:
+            return Response({'error': 'Дата должна быть в формате YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        # Готовые строки SlotOccupancy: один диапазонный запрос
+        available = [
+            {
+                'date': row.date,
+                'time_start': row.time_start,
+                'time_end': row.time_end,
+                'price': row.price,
+                'is_available': row.is_available,
+                'booked_by': row.booked_by or None
+            }
+            for row in read_range(date, date)
+        ]
         
-        if not time_slots.exists():
-            # Если слотов нет, используем дефолтные
-            time_slots = self._get_default_slots()
-        
-        occupied_slots = []
-        
-        # Занятые слоты из расписания секций
-        schedules = Schedule.objects.filter(day_of_week=day_of_week)
-        for schedule in schedules:
-            occupied_slots.append((schedule.time_start, schedule.time_end))
-        
-        # Занятые слоты из событий
-        events = Event.objects.filter(date__date=date)
-        for event in events:
-            event_time = event.date.time()
-            occupied_slots.append((event_time, (datetime.combine(date, event_time) + timedelta(hours=2)).time()))
+        serializer = AvailableSlotSerializer(available, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    @cache_response('availability')
+    def available_calendar(self, request):
+        """Доступность слотов на диапазон дат (start..end включительно).
         
-        # Занятые слоты из одобренных бронирований
-        bookings = IceBooking.objects.filter(date=date, status='approved')
+        Строки читаются из SlotOccupancy одним запросом на весь диапазон.
+        Ответ: таблица слотов и для каждого дня индексы его слотов
+        и строка доступности ('1' - свободен) в том же порядке.
+        """
+        try:
+            start = parse_date(request.query_params['start'])
+            end = parse_date(request.query_params['end'])
+        except KeyError:
+            return Response({'error': 'Требуются параметры start и end'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({'error': 'Даты должны быть в формате YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        days = (end - start).days + 1
+        if days < 1:
+            return Response({'error': 'end не может быть раньше start'}, status=status.HTTP_400_BAD_REQUEST)
+        if days > self.MAX_CALENDAR_DAYS:
+            return Response(
+                {'error': f'Диапазон не более {self.MAX_CALENDAR_DAYS} дней'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        available = []
+        slots, slot_index = [], {}
+        grid = {}
         
-        for slot in time_slots:
-            slot_start_dt = datetime.combine(date, slot.time_start)
-            slot_end_dt = datetime.combine(date, slot.time_end)
-            is_free = True
-            booked_by = None
-            
-            # Проверяем пересечение с расписанием секций
-            for schedule in schedules:
-                sched_start_dt = datetime.combine(date, schedule.time_start)
-                sched_end_dt = datetime.combine(date, schedule.time_end)
-                if not (slot_end_dt <= sched_start_dt or slot_start_dt >= sched_end_dt):
-                    is_free = False
-                    break
-            
-            # Проверяем пересечение с событиями
-            if is_free:
-                for event in events:
-                    event_time = event.date.time()
-                    event_start_dt = datetime.combine(date, event_time)
-                    event_end_dt = event_start_dt + timedelta(hours=2)
-                    if not (slot_end_dt <= event_start_dt or slot_start_dt >= event_end_dt):
-                        is_free = False
-                        break
-            
-            # Проверяем пересечение с бронированиями
-            if is_free:
-                for booking in bookings:
-                    booking_start_dt = datetime.combine(date, booking.time_start)
-                    booking_end_dt = datetime.combine(date, booking.time_end)
-                    if not (slot_end_dt <= booking_start_dt or slot_start_dt >= booking_end_dt):
-                        is_free = False
-                        booked_by = booking.name
-                        break
-            
-            available.append({
-                'date': date,
-                'time_start': slot.time_start,
-                'time_end': slot.time_end,
-                'price': slot.price,
-                'is_available': is_free,
-                'booked_by': booked_by
-            })
+        for row in read_range(start, end):
+            key = (row.time_start, row.time_end, row.price)
+            index = slot_index.get(key)
+            if index is None:
+                index = slot_index[key] = len(slots)
+                slots.append([row.time_start.strftime('%H:%M'), row.time_end.strftime('%H:%M'), f'{row.price:.2f}'])
+            day = grid.setdefault(row.date, {'date': row.date.isoformat(), 'slots': [], 'available': []})
+            day['slots'].append(index)
+            day['available'].append('1' if row.is_available else '0')
+        for day in grid.values():
+            day['available'] = ''.join(day['available'])
         
-        serializer = AvailableSlotSerializer(available, many=True)
-        return Response(serializer.data)
-    
-    def _get_default_slots(self):
-        """Дефолтные слоты если в базе пусто"""
-        default_slots = []
-        for hour in range(8, 22):
-            default_slots.append(TimeSlot(
-                time_start=time(hour, 0),
-                time_end=time(hour + 1, 0),
-                price=4000
-            ))
-        return default_slots
+        return Response({'start': start.isoformat(), 'end': end.isoformat(), 'slots': slots, 'days': list(grid.values())})
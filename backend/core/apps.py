@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        # Время сериализации в Server-Timing: подмена BaseSerializer.data на
+        # весь процесс, поэтому только вместе с PerformanceMiddleware
+        if settings.PERFORMANCE_SERIALIZER_TIMING and 'core.performance.PerformanceMiddleware' in settings.MIDDLEWARE:
+            from .performance import instrument_serializers
+            instrument_serializers()
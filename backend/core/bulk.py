@@ -0,0 +1,42 @@
+"""Быстрая массовая вставка строк в обход ORM."""
+import csv
+import io
+
+from django.db import connections
+
+
+def insert_rows(model, fields, rows, using='default', batch_size=5000, table=None):
+    """Вставляет кортежи значений полей fields в таблицу модели (или в table с теми же колонками).
+
+    На PostgreSQL используется COPY FROM STDIN, на остальных БД -
+    executemany пачками. Значения должны быть уже приведены к типам БД,
+    сигналы и save() не вызываются. Возвращает количество строк.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = qn(table or model._meta.db_table)
+    columns = ', '.join(qn(model._meta.get_field(name).column) for name in fields)
+
+    count = 0
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(r'\N' if value is None else value for value in row)
+                count += 1
+            buffer.seek(0)
+            cursor.cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        else:
+            sql = f'INSERT INTO {table} ({columns}) VALUES ({", ".join(["%s"] * len(fields))})'
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    cursor.executemany(sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+    return count
@@ -0,0 +1,115 @@
+"""Кэш ответов публичных эндпоинтов.
+
+Ключ ответа включает поколения пространств имен ('events', 'sections', ...).
+Запись в модель увеличивает поколение своих пространств (bump), и все
+закэшированные ответы, зависящие от них, перестают находиться без обхода
+ключей. ETag строится из тех же поколений, поэтому If-None-Match
+проверяется одним чтением из кэша, без обращения к БД.
+"""
+import hashlib
+import logging
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'arenaice'
+
+
+def _generation_key(namespace):
+    return f'{KEY_PREFIX}:gen:{namespace}'
+
+
+def get_generations(namespaces):
+    """Текущие поколения пространств имен (одно чтение из кэша)"""
+    keys = [_generation_key(namespace) for namespace in namespaces]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        # Вытесненный счетчик начинается с текущего времени, а не с нуля,
+        # чтобы не совпасть со старыми ключами; add не перетрет чужое значение
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        values.update(cache.get_many(missing))
+    return [values.get(key, 0) for key in keys]
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        key = _generation_key(namespace)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), None)
+        except Exception:
+            logger.exception('Не удалось сбросить кэш %s', namespace)
+
+
+def bump(*namespaces):
+    """Сбрасывает кэш пространств имен после коммита текущей транзакции"""
+    transaction.on_commit(partial(_bump, namespaces))
+
+
+def invalidate_on_change(model, *namespaces):
+    """Сбрасывает пространства имен при save/delete экземпляров модели"""
+    def handler(sender, **kwargs):
+        bump(*namespaces)
+
+    uid = f'cache:{model._meta.label}:{":".join(namespaces)}'
+    post_save.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+
+
+def cache_response(*namespaces, timeout=None):
+    """Кэширует response.data метода ViewSet с учетом поколений namespaces.
+
+    Ответы различаются по хосту и пути (ссылки пагинации абсолютные),
+    параметрам запроса и признаку is_staff
+    (администраторы видят неактивные объекты). Кэшируются только 200.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            try:
+                generations = get_generations(namespaces)
+            except Exception:
+                logger.exception('Кэш ответов недоступен')
+                return view_method(self, request, *args, **kwargs)
+
+            is_staff = request.user.is_authenticated and request.user.is_staff
+            query = sorted(request.query_params.lists())
+            digest = hashlib.sha1(
+                f'{request.get_host()}{request.path}|{query}|{int(is_staff)}|{generations}'.encode()
+            ).hexdigest()
+            etag = f'"{digest}"'
+            key = f'{KEY_PREFIX}:response:{digest}'
+
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                data = cache.get(key)
+                if data is not None:
+                    response = Response(data)
+                else:
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    cache.set(key, response.data, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+
+            response['ETag'] = etag
+            # Браузер хранит ответ, но перепроверяет его по ETag
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,27 @@
+"""Celery-приложение проекта.
+
+Настройки берутся из django.conf.settings с префиксом CELERY_, задачи -
+из tasks.py приложений. Воркер и планировщик:
+
+    celery -A core worker -l info
+    celery -A core beat -l info
+"""
+import os
+
+from celery import Celery
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+app = Celery('core')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+
+@receiver(setting_changed)
+def reset_result_backend(setting, **kwargs):
+    """override_settings в тестах: бэкенд результатов создается заново по новым настройкам"""
+    if setting.startswith('CELERY_'):
+        app._backend_cache = None
+        app._local.__dict__.pop('backend', None)
@@ -0,0 +1,365 @@
+"""Массовый импорт строк из CSV, JSON и NDJSON.
+
+Строки обрабатываются пачками по CHUNK_SIZE. Каждая пачка проверяется
+проходами по колонкам: приведение типов полем модели, существование
+ссылок одним запросом на колонку, проверки строки и повтор ключа в файле.
+Строки с ошибками пропускаются и попадают в отчет, остальные загружаются:
+
+* PostgreSQL - COPY во временную таблицу и слияние с основной одним
+  INSERT ... ON CONFLICT по уникальному ограничению ключа (без блокировки
+  таблицы: параллельные импорты сходятся на самом ограничении);
+* другие БД - bulk_create(update_conflicts=True) пачками, если ключ
+  закреплен уникальным ограничением, иначе слияние по ключам пачки.
+
+JSON читается потоково по элементам списка, файл целиком в память не загружается.
+Сигналы моделей не вызываются: побочные эффекты делает Importer.finish().
+"""
+import csv
+import io
+import json
+import re
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+
+from .bulk import insert_rows
+
+CHUNK_SIZE = 10000
+BATCH_SIZE = 1000
+# Сколько символов JSON читается за раз
+JSON_READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+INPUTS = ('csv', 'json', 'ndjson')
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'да'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'нет'}
+WHITESPACE = re.compile(r'\s*')
+
+
+class ImportFormatError(Exception):
+    """Файл нельзя прочитать как CSV/JSON/NDJSON"""
+
+
+def detect_input(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in INPUTS else default
+
+
+def read_rows(file, input_format):
+    """Словари строк из бинарного файла; не-объект JSON дает строку с ошибкой"""
+    if input_format not in INPUTS:
+        raise ImportFormatError(f'Формат должен быть одним из: {", ".join(INPUTS)}')
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    if input_format == 'csv':
+        return csv.DictReader(text)
+    if input_format == 'json':
+        return _json_rows(text)
+    return _ndjson_rows(text)
+
+
+def _json_rows(text):
+    """Элементы JSON-списка по одному; в памяти - только текущий элемент и блок чтения"""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        try:
+            chunk = text.read(JSON_READ_SIZE)
+        except UnicodeDecodeError as e:
+            raise ImportFormatError(f'Неверный JSON: {e}')
+        buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+
+    # Что ожидается дальше: '[', элемент (или ']' сразу после '['), ',' или ']', конец файла
+    state = 'start'
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            if eof:
+                if state != 'done':
+                    raise ImportFormatError('Неверный JSON: файл оборвался')
+                return
+            read_more()
+            continue
+
+        if state == 'start':
+            if buffer[position] != '[':
+                raise ImportFormatError('JSON должен быть списком объектов')
+            position += 1
+            state = 'first'
+        elif state in ('first', 'item'):
+            if state == 'first' and buffer[position] == ']':
+                position += 1
+                state = 'done'
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError as e:
+                if eof:
+                    raise ImportFormatError(f'Неверный JSON: {e}')
+                end = None
+            # Элемент мог оборваться на границе блока (в том числе число): дочитываем
+            if end is None or (end == len(buffer) and not eof):
+                read_more()
+                continue
+            position = end
+            state = 'separator'
+            yield value
+        elif state == 'separator':
+            char = buffer[position]
+            position += 1
+            if char == ']':
+                state = 'done'
+            elif char == ',':
+                state = 'item'
+            else:
+                raise ImportFormatError('Неверный JSON: ожидалась запятая между элементами')
+        else:
+            raise ImportFormatError('Неверный JSON: данные после списка')
+
+
+def _ndjson_rows(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+class Importer:
+    """Загрузка строк в model с обновлением по ключу.
+
+    fields - поля модели в файле, key - поля ключа, update_fields -
+    обновляемые при совпадении ключа, constants - значения полей, которых
+    нет в файле. defaults (аргументы конструктора) подставляются в пустые
+    колонки, например id схемы для всего файла.
+    """
+    model = None
+    fields = ()
+    key = ()
+    update_fields = ()
+    constants = {}
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self.known = {}
+
+    # Проверка
+
+    def parse(self, field, value):
+        if isinstance(field, models.ForeignKey):
+            return field.target_field.to_python(value)
+        if isinstance(field, models.BooleanField) and isinstance(value, str):
+            lowered = value.strip().lower()
+            if lowered in TRUE_VALUES | FALSE_VALUES:
+                return lowered in TRUE_VALUES
+        return field.clean(value, None)
+
+    def check(self, values):
+        """Проверки строки целиком: {поле: ошибка}"""
+        return {}
+
+    def clean(self, chunk, seen):
+        """Разбирает пачку сырых строк: (значения без ошибок, [(номер, ошибки)])"""
+        parsed = [{} for _ in chunk]
+        errors = [{} if isinstance(raw, dict) else {'row': 'Строка должна быть объектом'} for _, raw in chunk]
+
+        for name in self.fields:
+            field = self.model._meta.get_field(name)
+            optional = name in self.defaults or field.null or field.has_default()
+            fallback = self.defaults.get(name, field.get_default() if field.has_default() else None)
+            for values, problems, (_, raw) in zip(parsed, errors, chunk):
+                if problems.get('row'):
+                    continue
+                value = raw.get(name)
+                if value is None or value == '':
+                    if not optional:
+                        problems[name] = 'Обязательное поле'
+                        continue
+                    value = fallback
+                    if value is None:
+                        values[name] = None
+                        continue
+                try:
+                    values[name] = self.parse(field, value)
+                except ValidationError as e:
+                    problems[name] = '; '.join(e.messages)
+
+        for name in self.fields:
+            field = self.model._meta.get_field(name)
+            if isinstance(field, models.ForeignKey):
+                self._check_references(name, field.related_model, parsed, errors)
+
+        for values, problems in zip(parsed, errors):
+            if not problems:
+                problems.update(self.check(values))
+            if not problems:
+                key = tuple(values[name] for name in self.key)
+                if key in seen:
+                    problems['row'] = 'Повтор ключа ' + ', '.join(self.key) + ' в файле'
+                else:
+                    seen.add(key)
+
+        valid = [values for values, problems in zip(parsed, errors) if not problems]
+        failed = [(number, problems) for (number, _), problems in zip(chunk, errors) if problems]
+        return valid, failed
+
+    def _check_references(self, name, related_model, parsed, errors):
+        # Существующие id запоминаются на весь импорт: один запрос на новые id пачки
+        known = self.known.setdefault(name, set())
+        ids = {
+            values[name] for values, problems in zip(parsed, errors)
+            if name not in problems and values.get(name) is not None
+        }
+        missing = ids - known
+        if missing:
+            known.update(related_model.objects.filter(pk__in=missing).values_list('pk', flat=True))
+        for values, problems in zip(parsed, errors):
+            if name not in problems and values.get(name) is not None and values[name] not in known:
+                problems[name] = f'{related_model._meta.verbose_name} {values[name]} не найден'
+
+    # Загрузка
+
+    def touch(self, rows):
+        """Запоминает затронутые строки для finish()"""
+
+    def finish(self):
+        """Побочные эффекты после загрузки (вызывается внутри транзакции)"""
+
+    def run(self, rows):
+        """Импортирует итерируемое строк-словарей; возвращает отчет"""
+        report = {'total': 0, 'imported': 0, 'error_count': 0, 'errors': []}
+        seen = set()
+        numbered = enumerate(rows, start=1)
+        loader_class = CopyLoader if connection.vendor == 'postgresql' else BulkLoader
+        with transaction.atomic():
+            loader = loader_class(self)
+            while True:
+                chunk = list(islice(numbered, CHUNK_SIZE))
+                if not chunk:
+                    break
+                valid, failed = self.clean(chunk, seen)
+                report['total'] += len(chunk)
+                report['error_count'] += len(failed)
+                room = MAX_REPORTED_ERRORS - len(report['errors'])
+                report['errors'] += [{'row': number, 'errors': problems} for number, problems in failed[:room]]
+                if valid:
+                    loader.load(valid)
+                    self.touch(valid)
+                    report['imported'] += len(valid)
+            loader.close()
+            self.finish()
+        return report
+
+
+class CopyLoader:
+    """COPY во временную таблицу и слияние с основной (PostgreSQL)"""
+
+    def __init__(self, importer):
+        self.importer = importer
+        self.model = importer.model
+        self.names = list(importer.fields) + list(importer.constants)
+        qn = connection.ops.quote_name
+        self.table = qn(self.model._meta.db_table)
+        self.staging_table = f'import_{self.model._meta.db_table}'
+        self.staging = qn(self.staging_table)
+        self.columns = [qn(self.model._meta.get_field(name).column) for name in self.names]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {self.staging} ON COMMIT DROP AS '
+                f'SELECT {", ".join(self.columns)} FROM {self.table} WITH NO DATA'
+            )
+
+    def load(self, rows):
+        constants = list(self.importer.constants.values())
+        insert_rows(
+            self.model, self.names,
+            ([row[name] for name in self.importer.fields] + constants for row in rows),
+            table=self.staging_table,
+        )
+
+    def close(self):
+        """Слияние по уникальному ограничению ключа (Importer.key).
+
+        Ключи в файле уже без повторов (Importer.clean), поэтому каждая
+        строка таблицы обновляется не больше одного раза. Ключ с
+        NULL-полем требует ограничения NULLS NOT DISTINCT.
+        """
+        qn = connection.ops.quote_name
+        meta = self.model._meta
+        key = ', '.join(qn(meta.get_field(name).column) for name in self.importer.key)
+        if self.importer.update_fields:
+            action = 'DO UPDATE SET ' + ', '.join(
+                f'{column} = EXCLUDED.{column}'
+                for column in (qn(meta.get_field(name).column) for name in self.importer.update_fields)
+            )
+        else:
+            action = 'DO NOTHING'
+        columns = ', '.join(self.columns)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.table} ({columns}) SELECT {columns} FROM {self.staging} '
+                f'ON CONFLICT ({key}) {action}'
+            )
+            # Повторный импорт той же модели в этой транзакции создаст таблицу заново
+            cursor.execute(f'DROP TABLE {self.staging}')
+
+
+class BulkLoader:
+    """Пачки bulk_create/bulk_update через ORM (SQLite и другие БД)"""
+
+    def __init__(self, importer):
+        self.importer = importer
+        self.model = importer.model
+        self.upsert = self._has_unique_key()
+
+    def _has_unique_key(self):
+        meta = self.model._meta
+        key = set(self.importer.key)
+        unique = [set(fields) for fields in meta.unique_together]
+        unique += [set(constraint.fields) for constraint in meta.total_unique_constraints]
+        # В уникальном индексе NULL не совпадает с NULL: такой ключ сливаем вручную
+        return key in unique and not any(meta.get_field(name).null for name in key)
+
+    def _instances(self, rows):
+        meta = self.model._meta
+        constants = self.importer.constants
+        return [
+            self.model(**{meta.get_field(name).attname: value for name, value in row.items()}, **constants)
+            for row in rows
+        ]
+
+    def load(self, rows):
+        importer = self.importer
+        if self.upsert:
+            self.model.objects.bulk_create(
+                self._instances(rows), batch_size=BATCH_SIZE, update_conflicts=bool(importer.update_fields),
+                ignore_conflicts=not importer.update_fields,
+                unique_fields=importer.key if importer.update_fields else None,
+                update_fields=importer.update_fields or None,
+            )
+            return
+
+        attnames = [self.model._meta.get_field(name).attname for name in importer.key]
+        first = attnames[0]
+        existing = {
+            tuple(values[1:]): values[0]
+            for values in self.model.objects.filter(**{f'{first}__in': {row[importer.key[0]] for row in rows}})
+            .values_list('pk', *attnames)
+        }
+        created, updated = [], []
+        for instance in self._instances(rows):
+            pk = existing.get(tuple(getattr(instance, attname) for attname in attnames))
+            if pk is None:
+                created.append(instance)
+            else:
+                instance.pk = pk
+                updated.append(instance)
+        self.model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        if updated and importer.update_fields:
+            self.model.objects.bulk_update(updated, importer.update_fields, batch_size=BATCH_SIZE)
+
+    def close(self):
+        pass
@@ -0,0 +1,29 @@
+"""Фоновая отправка уведомлений пользователям.
+
+notify() ставит письма в очередь Celery (core.tasks.send_notification)
+после коммита транзакции, так что ответ API не ждет SMTP. Если брокер
+недоступен, ошибка только логируется.
+"""
+import logging
+from functools import partial
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _enqueue(notifications):
+    from .tasks import send_notification
+
+    for notification in notifications:
+        try:
+            send_notification.delay(notification)
+        except Exception:
+            logger.exception('Не удалось поставить уведомление на %s в очередь', notification['email'])
+
+
+def notify(notifications):
+    """Ставит уведомления в фоновую очередь; без email получателя уведомление пропускается"""
+    notifications = [notification for notification in notifications if notification.get('email')]
+    if notifications:
+        transaction.on_commit(partial(_enqueue, notifications))
@@ -0,0 +1,141 @@
+"""Пагинация по ключу (keyset) для больших списков.
+
+Курсор хранит значение поля сортировки и id последней строки страницы,
+следующая страница выбирается условием
+
+    field <= value AND (field < value OR id < last_id)
+    ORDER BY field DESC, id DESC LIMIT n
+
+Первое условие задает начало диапазона в составном индексе (field, id),
+поэтому глубокие страницы стоят столько же, сколько первая: нет ни
+COUNT(*), ни OFFSET.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Страницы по (created_at, id), новые первыми; ответ {next, previous, results}"""
+    ordering = '-created_at'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        """(значение поля, id, назад) или None для первой страницы"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return str(value), int(pk), bool(reverse)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.field)
+        value = value.isoformat() if hasattr(value, 'isoformat') else force_str(value)
+        encoded = base64.urlsafe_b64encode(json.dumps([value, row.pk, reverse]).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.field = self.ordering.lstrip('-')
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[2]
+
+        # Страница "назад" читается в обратном порядке и разворачивается
+        descending = self.ordering.startswith('-') != reverse
+        sign = '-' if descending else ''
+        queryset = queryset.order_by(f'{sign}{self.field}', f'{sign}pk')
+        if cursor is not None:
+            value, pk, _ = cursor
+            op = 'lt' if descending else 'gt'
+            try:
+                queryset = queryset.filter(**{f'{self.field}__{op}e': value}).filter(
+                    Q(**{f'{self.field}__{op}': value}) | Q(**{f'pk__{op}': pk})
+                )
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param, 'required': False, 'in': 'query',
+                'description': 'Курсор страницы из next/previous', 'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param, 'required': False, 'in': 'query',
+                'description': f'Размер страницы (не более {self.max_page_size})', 'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class JoinedAtPagination(KeysetPagination):
+    """Страницы по (joined_at, id) для участников групп"""
+    ordering = '-joined_at'
+
+
+class WaitlistPagination(KeysetPagination):
+    """Лист ожидания в порядке очереди: по (created_at, id), старые первыми"""
+    ordering = 'created_at'
@@ -0,0 +1,237 @@
+"""Замеры времени запросов к API.
+
+PerformanceMiddleware для доли PERFORMANCE_SAMPLE_RATE запросов считает
+число и время SQL-запросов (connection.execute_wrapper), время
+сериализации DRF и общее время, отдает их в заголовке Server-Timing и
+добавляет в статистику представления. Время сериализации считается,
+только если CoreConfig.ready() подключил instrument_serializers
+(PERFORMANCE_SERIALIZER_TIMING). Статистика хранится в кэше
+гистограммой по окнам PERFORMANCE_STATS_WINDOW: несколько INCR на
+замеренный запрос, общая для всех процессов. Процентили считаются по
+границам корзин (GET /api/performance/).
+
+Медленные запросы (дольше PERFORMANCE_SLOW_REQUEST_MS) пишутся в лог
+всегда, с самыми долгими SQL - если запрос попал в выборку. Тело
+потокового ответа формируется после middleware и в замер не входит.
+"""
+import hashlib
+import heapq
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .cache import KEY_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин гистограммы, мс; последняя корзина - все, что дольше
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PERCENTILES = (50, 90, 99)
+TOP_QUERIES = 5
+SQL_LOG_LENGTH = 500
+
+_current = ContextVar('performance_sample', default=None)
+
+
+class Sample:
+    """Замер одного запроса; вызывается как обертка выполнения SQL"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        # Самые долгие запросы: куча из (время, номер, sql)
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            # Параметры не сохраняются: в логах не должно быть данных пользователей
+            item = (duration, self.queries, sql)
+            if len(self.slowest) < TOP_QUERIES:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+    def top_queries(self):
+        return [(duration, sql) for duration, _, sql in sorted(self.slowest, reverse=True)]
+
+
+def _timed_data(original):
+    def data(self):
+        sample = _current.get()
+        # Вложенные сериализаторы входят во время внешнего
+        if sample is None or sample.serializing:
+            return original(self)
+        sample.serializing = True
+        start = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            sample.serialize_time += time.perf_counter() - start
+            sample.serializing = False
+
+    data.performance_timed = True
+    return property(data)
+
+
+def instrument_serializers():
+    """Считает время BaseSerializer.data (Serializer и ListSerializer вызывают его через super)"""
+    if not getattr(BaseSerializer.data.fget, 'performance_timed', False):
+        BaseSerializer.data = _timed_data(BaseSerializer.data.fget)
+
+
+def _view_name(request):
+    match = request.resolver_match
+    return f'{request.method} {match.view_name if match else "unresolved"}'
+
+
+def _window():
+    return int(time.time() // settings.PERFORMANCE_STATS_WINDOW)
+
+
+def _key(window, view, field):
+    digest = hashlib.md5(view.encode()).hexdigest()
+    return f'{KEY_PREFIX}:perf:{window}:{digest}:{field}'
+
+
+def _views_key(window):
+    return f'{KEY_PREFIX}:perf:{window}:views'
+
+
+def _incr(key, delta):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Окно хранится два периода: текущий и предыдущий
+        if cache.add(key, delta, settings.PERFORMANCE_STATS_WINDOW * 2):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _bucket(duration_ms):
+    for index, bound in enumerate(BUCKETS):
+        if duration_ms <= bound:
+            return index
+    return len(BUCKETS)
+
+
+def record(view, total_ms, queries, db_ms):
+    """Добавляет замер в статистику представления за текущее окно"""
+    window = _window()
+    try:
+        count = _incr(_key(window, view, f'b{_bucket(total_ms)}'), 1)
+        _incr(_key(window, view, 'queries'), queries)
+        _incr(_key(window, view, 'db_ms'), round(db_ms))
+        # Список представлений окна: чтение-запись без блокировки, поэтому
+        # представление переписывается заново время от времени
+        if count == 1 or count % 100 == 0:
+            views = cache.get(_views_key(window)) or []
+            if view not in views:
+                cache.set(_views_key(window), views + [view], settings.PERFORMANCE_STATS_WINDOW * 2)
+    except Exception:
+        logger.exception('Не удалось записать статистику %s', view)
+
+
+def _percentile(counts, total, percent):
+    """Верхняя граница корзины, в которую попадает процентиль; None - дольше последней границы"""
+    threshold = total * percent / 100
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= threshold:
+            return BUCKETS[index] if index < len(BUCKETS) else None
+    return None
+
+
+def view_stats(previous=False):
+    """Статистика представлений за текущее (или предыдущее) окно, самые медленные первыми"""
+    window = _window() - (1 if previous else 0)
+    views = cache.get(_views_key(window)) or []
+    fields = [f'b{index}' for index in range(len(BUCKETS) + 1)] + ['queries', 'db_ms']
+    values = cache.get_many([_key(window, view, field) for view in views for field in fields])
+
+    stats = []
+    for view in views:
+        data = {field: values.get(_key(window, view, field), 0) for field in fields}
+        counts = [data[f'b{index}'] for index in range(len(BUCKETS) + 1)]
+        total = sum(counts)
+        if not total:
+            continue
+        row = {'view': view, 'count': total}
+        for percent in PERCENTILES:
+            row[f'p{percent}_ms'] = _percentile(counts, total, percent)
+        row['avg_queries'] = round(data['queries'] / total, 1)
+        row['avg_db_ms'] = round(data['db_ms'] / total, 1)
+        stats.append(row)
+    # None (дольше последней границы) считается самым медленным
+    stats.sort(key=lambda row: float('inf') if row['p99_ms'] is None else row['p99_ms'], reverse=True)
+    return {
+        'window_start': window * settings.PERFORMANCE_STATS_WINDOW,
+        'window_seconds': settings.PERFORMANCE_STATS_WINDOW,
+        'buckets_ms': list(BUCKETS),
+        'views': stats,
+    }
+
+
+class PerformanceMiddleware:
+    """Server-Timing, лог медленных запросов и статистика по представлениям"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.PERFORMANCE_SAMPLE_RATE
+        start = time.perf_counter()
+        if not sampled:
+            response = self.get_response(request)
+            total_ms = (time.perf_counter() - start) * 1000
+            if total_ms >= settings.PERFORMANCE_SLOW_REQUEST_MS:
+                self.log_slow(request, response, total_ms)
+            return response
+
+        sample = Sample()
+        token = _current.set(sample)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = sample.db_time * 1000
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{sample.queries} queries"',
+            f'serialize;dur={sample.serialize_time * 1000:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+        record(_view_name(request), total_ms, sample.queries, db_ms)
+        if total_ms >= settings.PERFORMANCE_SLOW_REQUEST_MS:
+            self.log_slow(request, response, total_ms, sample)
+        return response
+
+    def log_slow(self, request, response, total_ms, sample=None):
+        message = '%s %s -> %s: %.0f мс (%s)'
+        args = [request.method, request.path, response.status_code, total_ms, _view_name(request)]
+        if sample is not None:
+            message += ', SQL-запросов: %d (%.0f мс), сериализация %.0f мс'
+            args += [sample.queries, sample.db_time * 1000, sample.serialize_time * 1000]
+            for duration, sql in sample.top_queries():
+                message += '\n  %.1f мс: %s'
+                args += [duration * 1000, sql[:SQL_LOG_LENGTH]]
+        logger.warning(message, *args)
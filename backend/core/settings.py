@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'corsheaders',
     'drf_spectacular',
+    'core',
     'users',
     'events',
     'sections',
@@ -49,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы замер включал остальные middleware (core/performance.py)
+    'core.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -133,7 +137,7 @@ STATIC_URL = 'static/'
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': ('users.authentication.ClaimsJWTAuthentication',),
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.IsAuthenticatedOrReadOnly',),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -144,7 +148,12 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Claims пользователя в токене (users/tokens.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'users.tokens.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.tokens.ClaimsTokenRefreshSerializer',
 }
+# Сколько живет в кэше пользователь для аутентификации и /api/users/me/
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '300'))
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'ArenaIce API',
@@ -168,9 +177,76 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Фоновые задачи (core/celery.py). При CELERY_TASK_ALWAYS_EAGER=True задачи
+# выполняются сразу в процессе, без брокера; тесты включают это через core.testing.eager_tasks
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', 'False') == 'True'
+if CELERY_TASK_ALWAYS_EAGER:
+    CELERY_BROKER_URL = 'memory://'
+    CELERY_RESULT_BACKEND = 'cache+memory://'
+    # Результат доступен через /api/jobs/<id>/ и в этом режиме
+    CELERY_TASK_STORE_EAGER_RESULT = True
+    CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_TRACK_STARTED = True
+CELERY_RESULT_EXPIRES = timedelta(days=1)
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-holds': {
+        'task': 'events.tasks.release_expired_holds',
+        'schedule': float(os.getenv('SEAT_HOLD_RELEASE_SECONDS', '30')),
+    },
+    'reconcile-seat-counters': {
+        'task': 'events.tasks.reconcile_seat_counters',
+        'schedule': crontab(hour=4, minute=0),
+    },
+}
+
+# Сколько держится бронь места на время оплаты
+SEAT_HOLD_TTL = timedelta(minutes=int(os.getenv('SEAT_HOLD_MINUTES', '15')))
+
+# Кэш ответов публичных эндпоинтов (core/cache.py): Redis, если задан REDIS_URL, иначе память процесса
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'arenaice',
+        }
+    }
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300'))
+
+# Замеры запросов (core/performance.py): доля замеряемых запросов, порог
+# медленного запроса для лога, длина окна статистики /api/performance/ и
+# замер времени сериализации DRF (подменяет BaseSerializer.data при старте)
+PERFORMANCE_SAMPLE_RATE = float(os.getenv('PERFORMANCE_SAMPLE_RATE', '1' if DEBUG else '0.05'))
+PERFORMANCE_SLOW_REQUEST_MS = int(os.getenv('PERFORMANCE_SLOW_REQUEST_MS', '1000'))
+PERFORMANCE_STATS_WINDOW = int(os.getenv('PERFORMANCE_STATS_WINDOW', '3600'))
+PERFORMANCE_SERIALIZER_TIMING = os.getenv('PERFORMANCE_SERIALIZER_TIMING', 'True') == 'True'
+
+# Уведомления о решениях по заявкам (core/notifications.py, через Celery)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@arenaice.local')
+
+# Живые обновления схемы зала: 'redis' (pub/sub через CELERY_BROKER_URL) или 'memory' (один процесс)
+SEAT_STREAM_BACKEND = os.getenv('SEAT_STREAM_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'memory')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Загруженные файлы импорта (core/imports.py) хранятся вне MEDIA_ROOT и наружу не раздаются;
+# каталог должен быть общим для веб-процессов и воркеров Celery
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'imports': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': os.getenv('IMPORTS_ROOT', str(BASE_DIR / 'imports')), 'base_url': None},
+    },
+}
 STATIC_ROOT = BASE_DIR / 'staticfiles'
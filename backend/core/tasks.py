@@ -0,0 +1,29 @@
+from smtplib import SMTPException
+
+from celery import shared_task
+from django.core.files.storage import storages
+from django.core.mail import send_mail
+from django.utils.module_loading import import_string
+
+from .imports import read_rows
+
+
+@shared_task(autoretry_for=(OSError, SMTPException), retry_backoff=True, max_retries=3)
+def send_notification(notification):
+    """Отправляет одно уведомление {'email', 'subject', 'message'}"""
+    send_mail(notification['subject'], notification['message'], None, [notification['email']])
+
+
+@shared_task
+def run_import(importer, name, input_format, defaults=None):
+    """Загружает файл name из хранилища imports классом importer (путь к core.imports.Importer).
+
+    Файл удаляется после загрузки; результат - отчет Importer.run().
+    """
+    importer_class = import_string(importer)
+    storage = storages['imports']
+    try:
+        with storage.open(name, 'rb') as file:
+            return importer_class(**(defaults or {})).run(read_rows(file, input_format))
+    finally:
+        storage.delete(name)
@@ -0,0 +1,11 @@
+"""Общие настройки для тестов приложений"""
+from django.test import override_settings
+
+# Задачи Celery выполняются сразу, результат доступен через /api/jobs/<id>/
+eager_tasks = override_settings(
+    CELERY_TASK_ALWAYS_EAGER=True,
+    CELERY_TASK_EAGER_PROPAGATES=True,
+    CELERY_TASK_STORE_EAGER_RESULT=True,
+    CELERY_BROKER_URL='memory://',
+    CELERY_RESULT_BACKEND='cache+memory://',
+)
@@ -0,0 +1,327 @@
+"""Кэш ответов, замеры запросов (core/performance.py), выгрузки, чтение файлов импорта и регрессия планов запросов.
+
+EXPLAIN каждого SELECT горячих эндпоинтов работает только на PostgreSQL. Данные небольшие, поэтому планы строятся
+с enable_seqscan = off: планировщик выберет индекс, если он подходит, и
+Seq Scan по большой таблице в плане значит, что индекса под запрос нет.
+"""
+import csv
+import io
+import json
+import unittest
+from datetime import date, time, timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from bookings.models import IceBooking, SlotOccupancy
+from core.imports import ImportFormatError, read_rows
+from events.models import Event, Seat, SeatSchema, Ticket
+from sections.models import Group, GroupMembership, Schedule, Section, SectionRequest
+
+User = get_user_model()
+
+# Таблицы, которые растут с числом пользователей и событий
+LARGE_TABLES = {
+    model._meta.db_table
+    for model in (Event, Seat, Ticket, IceBooking, SlotOccupancy, Schedule, GroupMembership, SectionRequest)
+}
+
+
+def explain(sql):
+    """Корневой узел плана запроса (EXPLAIN FORMAT JSON)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def seq_scans(plan):
+    """Большие таблицы, которые план читает последовательным сканированием"""
+    tables = []
+    if plan['Node Type'] == 'Seq Scan' and plan.get('Relation Name') in LARGE_TABLES:
+        tables.append(plan['Relation Name'])
+    for child in plan.get('Plans', ()):
+        tables += seq_scans(child)
+    return tables
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'EXPLAIN-проверки планов только для PostgreSQL')
+class QueryPlanTest(TestCase):
+    """Запросы эндпоинтов не должны читать большие таблицы целиком"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        cls.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(200)
+        ])
+
+        now = timezone.now()
+        events = Event.objects.bulk_create([
+            Event(
+                title=f'Событие {i}', description='Описание', event_type='hockey',
+                date=now + timedelta(days=i - 100), price_min=500, price_max=1500, is_active=i % 10 != 0,
+            )
+            for i in range(200)
+        ])
+        cls.schema = SeatSchema.objects.create(event=events[150])
+        seats = Seat.objects.bulk_create([
+            Seat(schema=cls.schema, sector='A', row=row, number=number, price=500)
+            for row in range(1, 31) for number in range(1, 31)
+        ])
+        Ticket.objects.bulk_create([
+            Ticket(event=events[150], seat=seat, user=users[i % len(users)] if i % 50 else cls.user, status='paid')
+            for i, seat in enumerate(seats[:600])
+        ])
+
+        today = date.today()
+        # У каждой заявки свой час: одобренные не пересекаются (icebooking_no_overlap)
+        IceBooking.objects.bulk_create([
+            IceBooking(
+                user=users[i % len(users)] if i % 50 else cls.user, date=today + timedelta(days=i // 12 - 80),
+                time_start=time(8 + i % 12), time_end=time(9 + i % 12), duration_hours=1,
+                name='Клиент', phone='+70000000000', status=('pending', 'approved', 'rejected')[i % 3],
+            )
+            for i in range(2000)
+        ])
+
+        section = Section.objects.create(name='Хоккей', section_type='hockey', description='Описание', price=1000)
+        groups = Group.objects.bulk_create([Group(section=section, name=f'Группа {i}') for i in range(50)])
+        Schedule.objects.bulk_create([
+            Schedule(group=group, day_of_week=day, time_start=time(10 + day), time_end=time(11 + day))
+            for group in groups for day in range(7)
+        ])
+        GroupMembership.objects.bulk_create([
+            GroupMembership(user=user, group=groups[i % len(groups)]) for i, user in enumerate(users)
+        ])
+        GroupMembership.objects.create(user=cls.user, group=groups[0])
+        SectionRequest.objects.bulk_create([
+            SectionRequest(
+                section=section, user=users[i % len(users)] if i % 50 else cls.user, name='Заявитель',
+                phone='+70000000000', status=('pending', 'approved', 'rejected')[i % 3],
+            )
+            for i in range(2000)
+        ])
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        # Ответы публичных списков кэшируются (core/cache.py): нужен запрос в БД
+        cache.clear()
+        self.client = APIClient()
+
+    def assertNoSeqScans(self, url, user=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+
+        problems = []
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        try:
+            for query in context.captured_queries:
+                if not query['sql'].lstrip().upper().startswith('SELECT'):
+                    continue
+                tables = seq_scans(explain(query['sql']))
+                if tables:
+                    problems.append(f'{", ".join(tables)}: {query["sql"]}')
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+        self.assertFalse(problems, f'Seq Scan в запросах {url}:\n' + '\n'.join(problems))
+
+    def test_events(self):
+        self.assertNoSeqScans('/api/events/events/')
+        self.assertNoSeqScans('/api/events/events/', self.admin)
+
+    def test_seats(self):
+        self.assertNoSeqScans(f'/api/events/seats/?schema={self.schema.pk}')
+
+    def test_tickets(self):
+        self.assertNoSeqScans('/api/events/tickets/', self.user)
+        self.assertNoSeqScans('/api/events/tickets/', self.admin)
+
+    def test_bookings(self):
+        self.assertNoSeqScans('/api/bookings/bookings/', self.user)
+        self.assertNoSeqScans('/api/bookings/bookings/', self.admin)
+        self.assertNoSeqScans('/api/bookings/bookings/?status=pending', self.admin)
+
+    def test_available_slots(self):
+        day = date.today() + timedelta(days=3)
+        self.assertNoSeqScans(f'/api/bookings/bookings/available_slots/?date={day:%Y-%m-%d}')
+
+    def test_schedules(self):
+        self.assertNoSeqScans('/api/sections/schedules/', self.user)
+
+    def test_section_requests(self):
+        self.assertNoSeqScans('/api/sections/requests/', self.user)
+        self.assertNoSeqScans('/api/sections/requests/', self.admin)
+        self.assertNoSeqScans('/api/sections/requests/?status=pending', self.admin)
+
+
+class ResponseCacheTest(TestCase):
+    """Ответ берется из кэша до смены поколения; If-None-Match с текущим ETag - 304 без БД"""
+
+    url = '/api/events/events/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.create_event('Матч')
+
+    def create_event(self, title, is_active=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Event.objects.create(
+                title=title, description='Описание', event_type='hockey',
+                date=timezone.now(), price_min=500, price_max=1500, is_active=is_active,
+            )
+
+    def titles(self, response):
+        return [event['title'] for event in response.data['results']]
+
+    def test_hit_and_not_modified(self):
+        first = self.client.get(self.url)
+        etag = first['ETag']
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+    def test_bump_invalidates(self):
+        etag = self.client.get(self.url)['ETag']
+        self.create_event('Шоу')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(sorted(self.titles(response)), ['Матч', 'Шоу'])
+
+    def test_staff_response_is_cached_separately(self):
+        self.create_event('Скрытое', is_active=False)
+        self.client.get(self.url)
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        self.assertIn('Скрытое', self.titles(self.client.get(self.url)))
+        self.client.force_authenticate(None)
+        self.assertNotIn('Скрытое', self.titles(self.client.get(self.url)))
+
+
+class PerformanceMiddlewareTest(TestCase):
+    """Замеренный запрос отдает Server-Timing и попадает в статистику представления"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+
+    def test_server_timing_and_stats(self):
+        self.client.force_authenticate(self.admin)
+        with override_settings(PERFORMANCE_SAMPLE_RATE=1, PERFORMANCE_SLOW_REQUEST_MS=0):
+            with self.assertLogs('core.performance', 'WARNING') as logs:
+                response = self.client.get('/api/bookings/bookings/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        self.assertIn('GET booking-list', logs.output[0])
+
+        with override_settings(PERFORMANCE_SAMPLE_RATE=0):
+            stats = self.client.get('/api/performance/').data
+        row = next(row for row in stats['views'] if row['view'] == 'GET booking-list')
+        self.assertEqual(row['count'], 1)
+        self.assertIsNotNone(row['p50_ms'])
+
+    def test_serializer_timing_can_be_disabled(self):
+        config = apps.get_app_config('core')
+        with mock.patch('core.performance.instrument_serializers') as instrument:
+            with override_settings(PERFORMANCE_SERIALIZER_TIMING=False):
+                config.ready()
+            instrument.assert_not_called()
+            config.ready()
+            instrument.assert_called_once()
+
+    def test_stats_require_staff(self):
+        self.client.force_authenticate(User.objects.create_user(username='user', email='user@example.com', password='x'))
+        self.assertEqual(self.client.get('/api/performance/').status_code, 403)
+
+
+class ExportTest(TestCase):
+    """Выгрузка заявок: фильтры, форматы и экранирование формул в CSV"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        self.day = date(2026, 3, 10)
+        IceBooking.objects.bulk_create([
+            IceBooking(date=self.day, time_start=time(10), time_end=time(11), duration_hours=1,
+                       name='=HYPERLINK("http://example.com")', phone='+70000000000', status='approved'),
+            IceBooking(date=self.day, time_start=time(12), time_end=time(13), duration_hours=1,
+                       name='Клиент', phone='1', message='@SUM(A1)', status='pending'),
+            IceBooking(date=self.day + timedelta(days=1), time_start=time(10), time_end=time(11), duration_hours=1,
+                       name='Завтра', phone='1', status='pending'),
+        ])
+
+    def export(self, query):
+        response = self.client.get(f'/api/bookings/bookings/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_escapes_formulas(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('output=csv').lstrip('\ufeff'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['name'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(rows[0]['phone'], "'+70000000000")
+        self.assertEqual(rows[1]['message'], "'@SUM(A1)")
+        self.assertEqual(rows[1]['name'], 'Клиент')
+
+    def test_ndjson_keeps_values(self):
+        rows = [json.loads(line) for line in self.export('output=ndjson').splitlines()]
+        self.assertEqual(rows[0]['name'], '=HYPERLINK("http://example.com")')
+        self.assertEqual(rows[0]['date'], '2026-03-10')
+
+    def test_filters(self):
+        rows = self.export(f'output=ndjson&status=pending&date_from={self.day}&date_to={self.day}').splitlines()
+        self.assertEqual([json.loads(line)['name'] for line in rows], ['Клиент'])
+        reversed_range = f'date_from={self.day + timedelta(days=1)}&date_to={self.day}'
+        for query in ('status=unknown', 'date_from=10.03.2026', reversed_range, 'output=xml'):
+            self.assertEqual(self.client.get(f'/api/bookings/bookings/export/?{query}').status_code, 400, query)
+
+
+class ReadRowsTest(unittest.TestCase):
+    """JSON читается по элементам: границы блоков чтения не меняют результат"""
+
+    def rows(self, text, input_format='json'):
+        # Блок в 3 символа режет элементы и числа посередине
+        with mock.patch('core.imports.JSON_READ_SIZE', 3):
+            return list(read_rows(io.BytesIO(text.encode()), input_format))
+
+    def test_json_elements(self):
+        text = '[{"sector": "A", "row": 12345}, 67890 , {"note": "a,]b"}]'
+        self.assertEqual(self.rows(text), [{'sector': 'A', 'row': 12345}, 67890, {'note': 'a,]b'}])
+        self.assertEqual(self.rows(' [ ] '), [])
+
+    def test_invalid_json(self):
+        for text in ('{"a": 1}', '[{"a": 1}', '[{"a": 1} {"b": 2}]', '[{"a": }]', '[1] 2', ''):
+            with self.assertRaises(ImportFormatError, msg=text):
+                self.rows(text)
+
+    def test_ndjson(self):
+        self.assertEqual(self.rows('{"a": 1}\n\nnot json\n', 'ndjson'), [{'a': 1}, None])
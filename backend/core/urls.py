@@ -4,6 +4,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from .views import JobStatusView, PerformanceStatsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,6 +14,8 @@ urlpatterns = [
     path('api/events/', include('events.urls')),
     path('api/sections/', include('sections.urls')),
     path('api/bookings/', include('bookings.urls')),
+    path('api/jobs/<str:job_id>/', JobStatusView.as_view()),
+    path('api/performance/', PerformanceStatsView.as_view()),
     path('api/schema/', SpectacularAPIView.as_view()),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema')),
 ]
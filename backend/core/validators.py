@@ -28,3 +28,26 @@ def validate_duration(value):
     """Валидация длительности: от 1 до 8 часов"""
     if value < 1 or value > 8:
         raise ValidationError('Длительность должна быть от 1 до 8 часов')
+
+def validate_decisions(data, limit=5000):
+    """Решения по пачке заявок: {'approve': [id, ...], 'reject': [id, ...]}.
+    
+    Возвращает (approve, reject) - списки целых id без повторов.
+    """
+    lists = []
+    for name in ('approve', 'reject'):
+        value = data.get(name) or []
+        if not isinstance(value, list):
+            raise ValidationError(f'{name} должен быть списком id')
+        try:
+            lists.append(list(dict.fromkeys(int(item) for item in value)))
+        except (TypeError, ValueError):
+            raise ValidationError(f'{name} должен содержать целые id')
+    approve, reject = lists
+    if not approve and not reject:
+        raise ValidationError('Нужен хотя бы один id в approve или reject')
+    if len(approve) + len(reject) > limit:
+        raise ValidationError(f'Не более {limit} решений за запрос')
+    if set(approve) & set(reject):
+        raise ValidationError('Один id не может быть одновременно в approve и reject')
+    return approve, reject
@@ -0,0 +1,82 @@
+from uuid import uuid4
+
+from celery.result import AsyncResult
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .celery import app
+from .imports import INPUTS, detect_input
+from .performance import view_stats
+from .tasks import run_import
+
+
+def job_response(result, **extra):
+    """Ответ 202 на поставленную в очередь задачу; состояние - GET /api/jobs/<job>/"""
+    return Response({'job': result.id, 'status': result.status, **extra}, status=status.HTTP_202_ACCEPTED)
+
+
+def enqueue_import(importer, file, input_format, defaults=None, **extra):
+    """Сохраняет файл в хранилище imports (не публичное) и ставит run_import в очередь; ответ 202"""
+    storage = storages['imports']
+    name = storage.save(f'{uuid4().hex}.{input_format}', file)
+    try:
+        result = run_import.delay(importer, name, input_format, defaults)
+    except Exception:
+        storage.delete(name)
+        raise
+    return job_response(result, **extra)
+
+
+def import_response(request, importer, **defaults):
+    """Импорт загруженного файла (multipart, поле file) в фоне.
+
+    Формат - параметр input (csv, json, ndjson) или расширение файла;
+    defaults подставляются в пустые колонки.
+    """
+    file = request.FILES.get('file')
+    if file is None:
+        return Response({'error': 'Не передан файл (поле file)'}, status=status.HTTP_400_BAD_REQUEST)
+    input_format = request.data.get('input') or request.query_params.get('input') or detect_input(file.name)
+    if input_format not in INPUTS:
+        return Response(
+            {'error': f'input должен быть одним из: {", ".join(INPUTS)}'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    return enqueue_import(importer, file, input_format, defaults, filename=file.name)
+
+
+def enqueue_rows(importer, rows, defaults=None, **extra):
+    """Ставит импорт уже разобранных строк (JSON тела запроса) в очередь"""
+    # NDJSON: задача читает строки по одной
+    encoder = DjangoJSONEncoder()
+    content = ContentFile(''.join(encoder.encode(row) + '\n' for row in rows).encode())
+    return enqueue_import(importer, content, 'ndjson', defaults, **extra)
+
+
+class JobStatusView(APIView):
+    """Состояние фоновой задачи: PENDING, STARTED, RETRY, SUCCESS или FAILURE.
+
+    Неизвестный id тоже возвращается как PENDING.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id):
+        result = AsyncResult(job_id, app=app)
+        data = {'job': job_id, 'status': result.status}
+        if result.successful():
+            data['result'] = result.result
+        elif result.failed():
+            data['error'] = str(result.result)
+        return Response(data)
+
+
+class PerformanceStatsView(APIView):
+    """Процентили времени ответа по представлениям за текущее окно (?window=previous - за прошлое)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(view_stats(previous=request.query_params.get('window') == 'previous'))
@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import reverse
 from django.utils.html import format_html
 from .models import Event, SeatSchema, Seat, Ticket
+from . import tasks
+from .layouts import get_layout, iter_sectors, LayoutError
 
 class SeatInline(admin.TabularInline):
     model = Seat
@@ -14,6 +16,7 @@ class EventAdmin(admin.ModelAdmin):
     list_filter = ['event_type', 'is_active', 'date']
     search_fields = ['title', 'description']
     list_editable = ['is_active']
+    list_select_related = ['seat_schema']
     date_hierarchy = 'date'
     
     fieldsets = (
@@ -32,10 +35,9 @@ class EventAdmin(admin.ModelAdmin):
         try:
             schema = obj.seat_schema
             url = reverse('admin:events_seatschema_change', args=[schema.id])
-            seats_count = schema.seats.count()
             return format_html(
-                '<a href="{}" style="color: green; font-weight: bold;">✅ Схема ({} мест)</a>',
-                url, seats_count
+                '<a href="{}" style="color: green; font-weight: bold;">✅ Схема ({} мест, свободно {})</a>',
+                url, schema.seats_total, schema.seats_available
             )
         except SeatSchema.DoesNotExist:
             url = reverse('admin:events_seatschema_add') + f'?event={obj.id}'
@@ -47,18 +49,32 @@ class EventAdmin(admin.ModelAdmin):
 
 @admin.register(SeatSchema)
 class SeatSchemaAdmin(admin.ModelAdmin):
-    list_display = ['event', 'get_seats_count', 'get_sectors_info']
+    list_display = ['event', 'get_seats_count', 'seats_available', 'seats_sold', 'revenue', 'get_sectors_info']
+    list_select_related = ['event']
+    readonly_fields = ['version', 'layout_version'] + SeatSchema.COUNTER_FIELDS
     inlines = [SeatInline]
     
     def get_seats_count(self, obj):
-        return obj.seats.count()
+        return obj.seats_total
     get_seats_count.short_description = 'Количество мест'
     
     def get_sectors_info(self, obj):
+        layout = (obj.schema_data or {}).get('layout')
+        if layout:
+            # Секторы из описания зала, без запроса к местам
+            try:
+                return ', '.join(sorted(name for name, _, _ in iter_sectors(get_layout(layout))))
+            except LayoutError:
+                pass
         sectors = obj.seats.values_list('sector', flat=True).distinct()
         return ', '.join(sorted(set(sectors)))
     get_sectors_info.short_description = 'Секторы'
     
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.has_changed():
+            form.instance.reset_layout()
+    
     def get_changeform_initial_data(self, request):
         """Автоматически подставляем событие из GET параметра"""
         initial = super().get_changeform_initial_data(request)
@@ -73,77 +89,29 @@ class SeatSchemaAdmin(admin.ModelAdmin):
         'clear_all_seats'
     ]
     
+    def _generate(self, queryset, layout):
+        """Ставит создание мест каждой схемы в очередь (events.tasks.generate_layout)"""
+        ids = list(queryset.values_list('pk', flat=True))
+        for schema_id in ids:
+            tasks.generate_layout.delay(schema_id, layout)
+        return len(ids)
+    
     def generate_small_hall(self, request, queryset):
         """Малый зал: 2 сектора x 5 рядов x 10 мест"""
-        for schema in queryset:
-            Seat.objects.filter(schema=schema).delete()
-            sectors = ['A', 'B']
-            for sector in sectors:
-                for row in range(1, 6):
-                    for number in range(1, 11):
-                        if row <= 2:
-                            price = schema.event.price_max
-                        else:
-                            price = schema.event.price_min
-                        
-                        Seat.objects.create(
-                            schema=schema,
-                            sector=sector,
-                            row=row,
-                            number=number,
-                            price=price
-                        )
-        self.message_user(request, f"Малый зал создан: 2 сектора x 5 рядов x 10 мест = 100 мест")
+        total = self._generate(queryset, 'small')
+        self.message_user(request, f"Малый зал (2 сектора x 5 рядов x 10 мест) создается для {total} схем")
     generate_small_hall.short_description = "🏟️ Малый зал (100 мест)"
     
     def generate_medium_hall(self, request, queryset):
         """Средний зал: 3 сектора x 10 рядов x 15 мест"""
-        for schema in queryset:
-            Seat.objects.filter(schema=schema).delete()
-            sectors = ['A', 'B', 'C']
-            for sector in sectors:
-                for row in range(1, 11):
-                    for number in range(1, 16):
-                        if row <= 3:
-                            price = schema.event.price_max
-                        elif row <= 7:
-                            price = (schema.event.price_min + schema.event.price_max) / 2
-                        else:
-                            price = schema.event.price_min
-                        
-                        Seat.objects.create(
-                            schema=schema,
-                            sector=sector,
-                            row=row,
-                            number=number,
-                            price=price
-                        )
-        self.message_user(request, f"Средний зал создан: 3 сектора x 10 рядов x 15 мест = 450 мест")
+        total = self._generate(queryset, 'medium')
+        self.message_user(request, f"Средний зал (3 сектора x 10 рядов x 15 мест) создается для {total} схем")
     generate_medium_hall.short_description = "🏟️ Средний зал (450 мест)"
     
     def generate_large_hall(self, request, queryset):
         """Большой зал: 4 сектора x 15 рядов x 20 мест"""
-        for schema in queryset:
-            Seat.objects.filter(schema=schema).delete()
-            sectors = ['A', 'B', 'C', 'D']
-            for sector in sectors:
-                for row in range(1, 16):
-                    for number in range(1, 21):
-                        if row <= 5:
-                            price = schema.event.price_max
-                        elif row <= 10:
-                            price = (schema.event.price_min + schema.event.price_max) / 2
-                        else:
-                            price = schema.event.price_min
-                        
-                        Seat.objects.create(
-                            schema=schema,
-                            sector=sector,
-                            row=row,
-                            number=number,
-                            price=price
-                        )
-        self.message_user(request, f"Большой зал создан: 4 сектора x 15 рядов x 20 мест = 1200 мест")
+        total = self._generate(queryset, 'large')
+        self.message_user(request, f"Большой зал (4 сектора x 15 рядов x 20 мест) создается для {total} схем")
     generate_large_hall.short_description = "🏟️ Большой зал (1200 мест)"
     
     def clear_all_seats(self, request, queryset):
@@ -152,6 +120,7 @@ class SeatSchemaAdmin(admin.ModelAdmin):
         for schema in queryset:
             count = schema.seats.count()
             schema.seats.all().delete()
+            schema.reset_layout()
             total += count
         self.message_user(request, f"Удалено {total} мест из {queryset.count()} схем")
     clear_all_seats.short_description = "🗑️ Очистить все места"
@@ -166,6 +135,22 @@ class SeatAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related('schema__event')
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            super().save_model(request, obj, form, change)
+            obj.schema.reset_layout()
+            return
+        # Статус меняем через set_status, чтобы изменение попало в seat_changes
+        new_status = obj.status
+        if 'status' in form.changed_data:
+            obj.status = form.initial['status']
+        super().save_model(request, obj, form, change)
+        if new_status != obj.status:
+            Seat.objects.filter(pk=obj.pk).set_status(new_status, schema_id=obj.schema_id)
+            obj.status = new_status
+        if set(form.changed_data) - {'status'}:
+            obj.schema.reset_layout()
 
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class EventsConfig(AppConfig):
     name = 'events'
+
+    def ready(self):
+        from core.cache import invalidate_on_change
+        from .models import Event, Seat, SeatSchema
+
+        # Массовые изменения мест (set_status, reset_layout) сбрасывают кэш сами
+        invalidate_on_change(Event, 'events', 'seats')
+        invalidate_on_change(SeatSchema, 'events', 'seats')
+        invalidate_on_change(Seat, 'events', 'seats')
@@ -0,0 +1,37 @@
+"""Импорт мест схемы зала из файла (core.imports)"""
+from core.imports import Importer
+from .models import Seat, SeatSchema
+
+
+class SeatImporter(Importer):
+    """Места по ключу (схема, сектор, ряд, место).
+
+    У существующих мест обновляется только цена: статус проданных и
+    забронированных мест меняется через покупки, а не импортом.
+    """
+    model = Seat
+    fields = ('schema', 'sector', 'row', 'number', 'price', 'status')
+    key = ('schema', 'sector', 'row', 'number')
+    update_fields = ('price',)
+    constants = {'version': 0}
+
+    def __init__(self, **defaults):
+        super().__init__(**defaults)
+        self.schema_ids = set()
+
+    def check(self, values):
+        errors = {}
+        for name in ('row', 'number'):
+            if values[name] < 1:
+                errors[name] = 'Должно быть не меньше 1'
+        if values['price'] < 0:
+            errors['price'] = 'Цена не может быть отрицательной'
+        return errors
+
+    def touch(self, rows):
+        self.schema_ids.update(row['schema'] for row in rows)
+
+    def finish(self):
+        # Новая версия раскладки и пересчет счетчиков затронутых схем
+        for schema_id in sorted(self.schema_ids):
+            SeatSchema(pk=schema_id).reset_layout()
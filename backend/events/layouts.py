@@ -0,0 +1,274 @@
+"""Генерация мест зала по декларативному описанию.
+
+Описание зала (spec)::
+
+    {
+        'sectors': ['A', 'B'],      # или [{'name': 'A', 'rows': 5, 'seats_per_row': 10}, ...]
+        'rows': 5,                  # значения по умолчанию для секторов
+        'seats_per_row': 10,
+        'prices': [                 # первое подходящее правило задает цену ряда
+            {'rows': [1, 2], 'price': 'max'},
+            {'sectors': ['B'], 'price': 1500},
+            {'price': 'min'},
+        ],
+    }
+
+Цена - число или 'min' / 'mid' / 'max' относительно price_min и price_max
+события, поэтому одно описание подходит для разных событий.
+
+Описание хранится в SeatSchema.schema_data как ``{'layout': ..., 'materialized': bool}``,
+где layout - имя шаблона из LAYOUTS или само описание. assign_layout только
+запоминает описание (O(1) для любого размера зала). Первое чтение схемы
+или заказ мест (ensure_seats) ставит создание мест в очередь: запросы на
+чтение сами в БД не пишут. Ручная правка мест (SeatSchema.reset_layout) отменяет развертывание.
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.bulk import insert_rows
+from core.cache import KEY_PREFIX
+from .models import Seat, SeatSchema
+
+LAYOUTS = {
+    'small': {
+        'sectors': ['A', 'B'],
+        'rows': 5,
+        'seats_per_row': 10,
+        'prices': [{'rows': [1, 2], 'price': 'max'}, {'price': 'min'}],
+    },
+    'medium': {
+        'sectors': ['A', 'B', 'C'],
+        'rows': 10,
+        'seats_per_row': 15,
+        'prices': [{'rows': [1, 3], 'price': 'max'}, {'rows': [4, 7], 'price': 'mid'}, {'price': 'min'}],
+    },
+    'large': {
+        'sectors': ['A', 'B', 'C', 'D'],
+        'rows': 15,
+        'seats_per_row': 20,
+        'prices': [{'rows': [1, 5], 'price': 'max'}, {'rows': [6, 10], 'price': 'mid'}, {'price': 'min'}],
+    },
+}
+
+MAX_SEATS = 100000
+CENTS = Decimal('0.01')
+# Повторная постановка развертывания схемы в очередь не раньше, чем через столько секунд
+MATERIALIZE_RETRY_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class LayoutError(ValueError):
+    pass
+
+
+def get_layout(layout):
+    """Описание зала по имени шаблона или само описание"""
+    if isinstance(layout, str):
+        if layout not in LAYOUTS:
+            raise LayoutError(f'Неизвестный шаблон зала: {layout}')
+        return LAYOUTS[layout]
+    if not isinstance(layout, dict):
+        raise LayoutError('Описание зала должно быть объектом или именем шаблона')
+    return layout
+
+
+def _positive_int(value, name):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise LayoutError(f'{name} должно быть целым числом')
+    if value < 1:
+        raise LayoutError(f'{name} должно быть больше 0')
+    return value
+
+
+def iter_sectors(spec):
+    """(название, рядов, мест в ряду) для каждого сектора"""
+    sectors = spec.get('sectors')
+    if not sectors:
+        raise LayoutError('Не заданы секторы')
+    if not isinstance(sectors, list):
+        raise LayoutError('Секторы должны быть списком')
+    for sector in sectors:
+        if isinstance(sector, dict):
+            name = sector.get('name')
+            rows = sector.get('rows', spec.get('rows'))
+            seats_per_row = sector.get('seats_per_row', spec.get('seats_per_row'))
+        else:
+            name, rows, seats_per_row = sector, spec.get('rows'), spec.get('seats_per_row')
+        if not name or len(str(name)) > 10:
+            raise LayoutError('Название сектора должно быть от 1 до 10 символов')
+        yield str(name), _positive_int(rows, 'Количество рядов'), _positive_int(seats_per_row, 'Количество мест в ряду')
+
+
+def count_seats(spec):
+    return sum(rows * seats_per_row for _, rows, seats_per_row in iter_sectors(spec))
+
+
+def _resolve_price(value, event):
+    if value == 'min':
+        value = event.price_min
+    elif value == 'max':
+        value = event.price_max
+    elif value == 'mid':
+        value = (Decimal(event.price_min) + Decimal(event.price_max)) / 2
+    try:
+        price = Decimal(str(value))
+        if not price.is_finite() or price < 0:
+            raise ValueError
+        return price.quantize(CENTS)
+    except (InvalidOperation, ValueError):
+        raise LayoutError(f'Некорректная цена: {value}')
+
+
+def price_for(rules, sector, row, event):
+    for rule in rules:
+        if 'sectors' in rule and sector not in rule['sectors']:
+            continue
+        if 'rows' in rule and not rule['rows'][0] <= row <= rule['rows'][-1]:
+            continue
+        return _resolve_price(rule.get('price', 'min'), event)
+    return _resolve_price('min', event)
+
+
+def iter_seat_rows(spec, event):
+    """Кортежи (sector, row, number, price) по описанию зала"""
+    spec = get_layout(spec)
+    if count_seats(spec) > MAX_SEATS:
+        raise LayoutError(f'Не более {MAX_SEATS} мест в зале')
+    rules = spec.get('prices') or []
+    rows = []
+    for sector, row_count, seats_per_row in iter_sectors(spec):
+        for row in range(1, row_count + 1):
+            # Цена считается один раз на ряд, а не на каждое место
+            price = price_for(rules, sector, row, event)
+            rows.extend((sector, row, number, price) for number in range(1, seats_per_row + 1))
+    return rows
+
+
+def _check_rule(rule):
+    """Правило цены: {'rows': [от, до]?, 'sectors': [...]?, 'price': ...}"""
+    if not isinstance(rule, dict):
+        raise LayoutError('Правило цены должно быть объектом')
+    if 'rows' in rule:
+        rows = rule['rows']
+        if (
+            not isinstance(rows, list) or len(rows) != 2
+            or not all(isinstance(row, int) and not isinstance(row, bool) for row in rows)
+        ):
+            raise LayoutError('rows в правиле цены - список из двух целых чисел [от, до]')
+        if rows[0] > rows[1]:
+            raise LayoutError('rows в правиле цены: начало больше конца')
+    if 'sectors' in rule:
+        sectors = rule['sectors']
+        if not isinstance(sectors, list) or not all(isinstance(sector, str) for sector in sectors):
+            raise LayoutError('sectors в правиле цены - список названий секторов')
+
+
+def validate_layout(layout, event):
+    """Проверяет описание без построения мест"""
+    spec = get_layout(layout)
+    if count_seats(spec) > MAX_SEATS:
+        raise LayoutError(f'Не более {MAX_SEATS} мест в зале')
+    rules = spec.get('prices') or []
+    if not isinstance(rules, list):
+        raise LayoutError('prices должно быть списком правил')
+    for rule in rules:
+        _check_rule(rule)
+        _resolve_price(rule.get('price', 'min'), event)
+    return spec
+
+
+def _store_layout(schema, layout, materialized):
+    schema.schema_data = {'layout': layout, 'materialized': materialized}
+    SeatSchema.objects.filter(pk=schema.pk).update(schema_data=schema.schema_data)
+
+
+def generate_layout(schema, layout):
+    """Пересоздает места схемы одной транзакцией.
+
+    Строки пишутся напрямую (COPY на PostgreSQL), без экземпляров Seat.
+    Возвращает количество созданных мест.
+    """
+    rows = iter_seat_rows(layout, schema.event)
+    with transaction.atomic():
+        Seat.objects.filter(schema=schema).delete()
+        count = insert_rows(
+            Seat,
+            ('schema', 'sector', 'row', 'number', 'price', 'status', 'version'),
+            ((schema.id, sector, row, number, price, 'available', 0) for sector, row, number, price in rows),
+        )
+        _store_layout(schema, layout, True)
+        schema.reset_layout(keep_template=True)
+    return count
+
+
+def assign_layout(schema, layout):
+    """Запоминает описание зала в schema_data, не создавая мест.
+
+    Возвращает количество мест, которое будет создано.
+    """
+    spec = validate_layout(layout, schema.event)
+    with transaction.atomic():
+        Seat.objects.filter(schema=schema).delete()
+        _store_layout(schema, layout, False)
+        # Места создаст задача при первом чтении схемы или заказе (ensure_seats)
+        schema.reset_layout(keep_template=True)
+    return count_seats(spec)
+
+
+def is_pending(schema):
+    data = schema.schema_data or {}
+    return bool(data.get('layout')) and not data.get('materialized')
+
+
+def _materialize_key(schema_id):
+    return f'{KEY_PREFIX}:materialize:{schema_id}'
+
+
+def materialize_layout(schema_id):
+    """Создает места схемы из назначенного описания (events.tasks.materialize_layout).
+
+    Ничего не удаляет: если у схемы уже есть места, описание только
+    помечается развернутым. Возвращает количество созданных мест.
+    """
+    try:
+        with transaction.atomic():
+            # Блокировка строки схемы: параллельные задачи создадут места один раз
+            schema = SeatSchema.objects.select_for_update().select_related('event').get(pk=schema_id)
+            if not is_pending(schema):
+                return 0
+            if Seat.objects.filter(schema=schema).exists():
+                _store_layout(schema, schema.schema_data['layout'], True)
+                return 0
+            return generate_layout(schema, schema.schema_data['layout'])
+    finally:
+        # Схему с новым описанием можно снова ставить в очередь
+        cache.delete(_materialize_key(schema_id))
+
+
+def ensure_seats(schema):
+    """Ставит создание мест в очередь при первом обращении к неразвернутой схеме.
+
+    Чтение схемы не меняет места: до выполнения задачи отдается то, что
+    есть в таблице. Возвращает True, если задача поставлена этим вызовом.
+    """
+    if not is_pending(schema):
+        return False
+    key = _materialize_key(schema.pk)
+    if not cache.add(key, 1, MATERIALIZE_RETRY_SECONDS):
+        return False
+    from .tasks import materialize_layout as materialize_task
+    try:
+        materialize_task.delay(schema.pk)
+    except Exception:
+        cache.delete(key)
+        logger.exception('Не удалось поставить развертывание схемы %s в очередь', schema.pk)
+        return False
+    # Без брокера (CELERY_TASK_ALWAYS_EAGER) места уже созданы
+    schema.refresh_from_db(fields=['schema_data', 'version', 'layout_version'])
+    return True
@@ -0,0 +1,175 @@
+"""Живые обновления схемы зала.
+
+В каждом процессе работает один SeatBroadcaster: он раздает изменения мест
+локальным подписчикам (SSE-потокам и long-poll запросам). Между процессами
+изменения ходят через Redis pub/sub (SEAT_STREAM_BACKEND = 'redis'),
+для тестов и одиночного процесса достаточно 'memory'.
+
+SSE-поток держит HTTP-соединение до 5 минут (events.seatmap.stream_seat_changes),
+поэтому в production gunicorn запускается с gevent-воркерами (gunicorn.conf.py,
+CMD в Dockerfile): синхронный воркер на все это время занят одним клиентом.
+"""
+import abc
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'arenaice:seats'
+
+
+class Subscriber:
+    """Очередь сообщений одного клиента"""
+
+    def __init__(self, maxsize=100):
+        self.queue = queue.Queue(maxsize=maxsize)
+        # Клиент не успевал читать и пропустил сообщения - нужна пересинхронизация
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Следующее сообщение или None по таймауту"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SeatBroadcaster(abc.ABC):
+    """Раздает сообщения по схемам локальным подписчикам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, schema_id):
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers[schema_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, schema_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(schema_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[schema_id]
+
+    def dispatch(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(message['schema'], ()))
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    @abc.abstractmethod
+    def publish(self, message):
+        """Доставляет сообщение подписчикам всех процессов"""
+
+
+class MemoryBroadcaster(SeatBroadcaster):
+    """Доставка только внутри текущего процесса"""
+
+    def publish(self, message):
+        self.dispatch(message)
+
+
+class RedisBroadcaster(SeatBroadcaster):
+    """Доставка между процессами через Redis pub/sub"""
+
+    def __init__(self, url):
+        super().__init__()
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self, schema_id):
+        self._ensure_listener()
+        return super().subscribe(schema_id)
+
+    def publish(self, message):
+        try:
+            self._redis.publish(CHANNEL, json.dumps(message))
+        except Exception:
+            # Продажа уже закоммичена, клиенты догонят через seat_changes
+            logger.exception('Не удалось опубликовать изменения мест')
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='seat-broadcaster', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(CHANNEL)
+        try:
+            for item in pubsub.listen():
+                try:
+                    self.dispatch(json.loads(item['data']))
+                except (ValueError, KeyError, TypeError):
+                    logger.warning('Некорректное сообщение в канале %s', CHANNEL)
+        except Exception:
+            logger.exception('Слушатель %s остановлен', CHANNEL)
+            # Все подписчики переходят на пересинхронизацию при следующем сообщении
+            with self._lock:
+                for subscribers in self._subscribers.values():
+                    for subscriber in subscribers:
+                        subscriber.overflowed = True
+        finally:
+            pubsub.close()
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                if settings.SEAT_STREAM_BACKEND == 'redis':
+                    _broadcaster = RedisBroadcaster(settings.CELERY_BROKER_URL)
+                else:
+                    _broadcaster = MemoryBroadcaster()
+    return _broadcaster
+
+
+def publish_seat_changes(schema_id, version, changes=None):
+    """Публикует изменения мест; changes=None означает перестройку схемы"""
+    message = {'schema': schema_id, 'version': version}
+    if changes is None:
+        message['resync'] = True
+    else:
+        message.update(resync=False, changes=changes)
+    get_broadcaster().publish(message)
+
+
+@contextmanager
+def subscription(schema_id):
+    broadcaster = get_broadcaster()
+    subscriber = broadcaster.subscribe(schema_id)
+    try:
+        yield subscriber
+    finally:
+        broadcaster.unsubscribe(schema_id, subscriber)
+
+
+def format_sse(data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
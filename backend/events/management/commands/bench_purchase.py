@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from events.models import Event, SeatSchema, Seat, Ticket
+from events.purchases import claim_seat
+
+User = get_user_model()
+
+
+def claim_seat_locked(user, event_id, schema_id, seat_id):
+    """Прежний путь покупки: SELECT ... FOR UPDATE, проверка в Python, seat.save()"""
+    with transaction.atomic():
+        seat = Seat.objects.select_for_update().get(id=seat_id)
+        if seat.status != 'available':
+            return None
+        seat.status = 'sold'
+        seat.save()
+        return Ticket.objects.create(event_id=event_id, seat=seat, user=user, status='paid')
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность покупки мест при N параллельных покупателях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=16, help='Число параллельных покупателей')
+        parser.add_argument('--seats', type=int, default=1200, help='Число мест в зале')
+        parser.add_argument('--attempts', type=int, default=200, help='Попыток покупки на покупателя')
+        parser.add_argument('--hot', type=int, default=100,
+                            help='Размер "горячей" зоны мест, за которую идет конкуренция')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite сериализует запись, результаты не показательны'))
+
+        users = [
+            User.objects.get_or_create(
+                email=f'bench{i}@arena.local', defaults={'username': f'bench{i}'}
+            )[0]
+            for i in range(options['buyers'])
+        ]
+        try:
+            for name, claim in [('select_for_update', claim_seat_locked), ('conditional_update', claim_seat)]:
+                self._run(name, claim, users, options)
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def _run(self, name, claim, users, options):
+        event = Event.objects.create(
+            title=f'bench {name}', description='bench', event_type='hockey',
+            date=timezone.now(), price_min=100, price_max=100, is_active=False
+        )
+        schema = SeatSchema.objects.create(event=event)
+        Seat.objects.bulk_create(
+            [Seat(schema=schema, sector='A', row=1 + i // 100, number=1 + i % 100, price=100)
+             for i in range(options['seats'])],
+            batch_size=1000,
+        )
+        seat_ids = list(Seat.objects.filter(schema=schema).values_list('id', flat=True))
+        hot = seat_ids[:options['hot']]
+        results = {'sold': 0, 'conflicts': 0, 'errors': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(users) + 1)
+
+        def buyer(user, seed):
+            rnd = random.Random(seed)
+            sold = conflicts = errors = 0
+            barrier.wait()
+            try:
+                for _ in range(options['attempts']):
+                    # Половина попыток - в горячую зону, остальные - по всему залу
+                    seat_id = rnd.choice(hot if rnd.random() < 0.5 else seat_ids)
+                    try:
+                        ticket = claim(user, event.id, schema.id, seat_id)
+                    except DatabaseError:
+                        errors += 1
+                        continue
+                    if ticket is None:
+                        conflicts += 1
+                    else:
+                        sold += 1
+            finally:
+                connection.close()
+            with lock:
+                results['sold'] += sold
+                results['conflicts'] += conflicts
+                results['errors'] += errors
+
+        threads = [threading.Thread(target=buyer, args=(user, i)) for i, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attempts = len(users) * options['attempts']
+        self.stdout.write(
+            f'{name:>20}: {attempts / elapsed:8.0f} попыток/с, {results["sold"] / elapsed:8.0f} продаж/с '
+            f'(продано {results["sold"]}, отказов {results["conflicts"]}, ошибок {results["errors"]}, {elapsed:.2f} с)'
+        )
+        event.delete()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from events.tasks import reconcile_seat_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики мест схем по таблице мест'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', type=int, action='append',
+                            help='ID схемы (можно указать несколько раз), по умолчанию все')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = reconcile_seat_counters(options['schema'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано схем: {total}'))
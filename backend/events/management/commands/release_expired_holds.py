@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from events.purchases import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Освобождает места с истекшей бронью'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=int, default=0,
+                            help='Повторять каждые N секунд (0 - один проход)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            released = release_expired_holds(batch_size=options['batch_size'])
+            if released or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Освобождено мест: {released}'))
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
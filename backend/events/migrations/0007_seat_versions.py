@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_alter_event_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seat',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='layout_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(fields=['schema', 'version'], name='events_seat_schema__be9baf_idx'),
+        ),
+    ]
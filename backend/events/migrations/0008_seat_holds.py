@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_seat_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seat',
+            name='reserved_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='seat_holds', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(('status', 'reserved')), fields=['reserved_until'], name='seat_hold_expiry_idx'),
+        ),
+    ]
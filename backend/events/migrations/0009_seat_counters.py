@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q, Sum
+
+
+def fill_counters(apps, schema_editor):
+    from events.layouts import iter_seat_rows
+
+    SeatSchema = apps.get_model('events', 'SeatSchema')
+    Seat = apps.get_model('events', 'Seat')
+    stats = {
+        row.pop('schema_id'): row
+        for row in Seat.objects.order_by().values('schema_id').annotate(
+            seats_total=Count('id'),
+            seats_available=Count('id', filter=Q(status='available')),
+            seats_reserved=Count('id', filter=Q(status='reserved')),
+            seats_sold=Count('id', filter=Q(status='sold')),
+            revenue=Sum('price', filter=Q(status='sold')),
+            price_from=Min('price'),
+            price_to=Max('price'),
+        )
+    }
+    schemas = list(SeatSchema.objects.select_related('event'))
+    for schema in schemas:
+        row = stats.get(schema.pk)
+        data = schema.schema_data or {}
+        if row is None and data.get('layout') and not data.get('materialized'):
+            prices = [price for *_, price in iter_seat_rows(data['layout'], schema.event)]
+            row = {'seats_total': len(prices), 'seats_available': len(prices),
+                   'price_from': min(prices), 'price_to': max(prices)}
+        for field, value in (row or {}).items():
+            setattr(schema, field, value)
+        schema.revenue = schema.revenue or Decimal('0')
+    SeatSchema.objects.bulk_update(schemas, [
+        'seats_total', 'seats_available', 'seats_reserved', 'seats_sold', 'revenue', 'price_from', 'price_to',
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_seat_holds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatschema',
+            name='price_from',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='price_to',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='seats_available',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='seats_reserved',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='seats_sold',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='seatschema',
+            name='seats_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
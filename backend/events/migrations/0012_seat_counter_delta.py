@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:19
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatCounterDelta',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marker', models.BigIntegerField(unique=True)),
+                ('seats_available', models.IntegerField(default=0)),
+                ('seats_reserved', models.IntegerField(default=0)),
+                ('seats_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('schema', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_deltas', to='events.seatschema')),
+            ],
+        ),
+    ]
@@ -1,8 +1,30 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+import secrets
+from decimal import Decimal
+from functools import partial
+from core.cache import bump
+from .live import publish_seat_changes
 
 User = get_user_model()
 
+# Компактные коды статусов мест (seatmap, seat_changes, живые обновления)
+STATUS_CODES = {'available': 0, 'reserved': 1, 'sold': 2}
+# Счетчик SeatSchema для каждого статуса места
+STATUS_COUNTERS = {'available': 'seats_available', 'reserved': 'seats_reserved', 'sold': 'seats_sold'}
+
+class EventQuerySet(models.QuerySet):
+    def with_seat_stats(self):
+        """Аннотирует события счетчиками мест из SeatSchema (один JOIN, без обхода мест)"""
+        return self.annotate(
+            seats_total=Coalesce(F('seat_schema__seats_total'), 0),
+            seats_available=Coalesce(F('seat_schema__seats_available'), 0),
+            price_from=F('seat_schema__price_from'),
+            price_to=F('seat_schema__price_to'),
+        )
+
 class Event(models.Model):
     EVENT_TYPES = [
         ('hockey', 'Хоккей'),
@@ -21,18 +43,226 @@ class Event(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = EventQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Занятость льда по диапазону дат и список для администратора
+            models.Index(fields=['date'], name='event_date_idx'),
+            # Публичный список: активные события по дате
+            models.Index(fields=['-date'], condition=models.Q(is_active=True), name='event_active_date_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
+class SeatSchemaQuerySet(models.QuerySet):
+    def recount(self):
+        """Пересчитывает счетчики мест схем с нуля.
+        
+        Строки схем блокируются до подсчета: параллельные продажи
+        увеличат счетчики уже после пересчета. Возвращает число схем.
+        """
+        from .layouts import is_pending, iter_seat_rows
+        
+        with transaction.atomic(using=self.db):
+            schemas = list(self.select_for_update(of=('self',)).select_related('event'))
+            schema_ids = [schema.pk for schema in schemas]
+            self._stamp_pending_seats(schema_ids)
+            # Счетчики считаются заново: еще не примененные приращения больше не нужны
+            SeatCounterDelta.objects.filter(schema__in=schema_ids).delete()
+            stats = {
+                row.pop('schema_id'): row
+                for row in Seat.objects.filter(schema__in=[schema.pk for schema in schemas])
+                .order_by()
+                .values('schema_id')
+                .annotate(
+                    seats_total=Count('id'),
+                    seats_available=Count('id', filter=Q(status='available')),
+                    seats_reserved=Count('id', filter=Q(status='reserved')),
+                    seats_sold=Count('id', filter=Q(status='sold')),
+                    revenue=Coalesce(Sum('price', filter=Q(status='sold')), Decimal('0')),
+                    price_from=Min('price'),
+                    price_to=Max('price'),
+                )
+            }
+            for schema in schemas:
+                row = stats.get(schema.pk)
+                if row is None and is_pending(schema):
+                    # Места еще не созданы: счетчики по описанию зала
+                    prices = [price for *_, price in iter_seat_rows(schema.schema_data['layout'], schema.event)]
+                    row = {
+                        'seats_total': len(prices), 'seats_available': len(prices),
+                        'price_from': min(prices), 'price_to': max(prices),
+                    }
+                row = row or {}
+                for field in SeatSchema.COUNTER_FIELDS:
+                    setattr(schema, field, row.get(field, SeatSchema._meta.get_field(field).get_default()))
+            SeatSchema.objects.bulk_update(schemas, SeatSchema.COUNTER_FIELDS, batch_size=500)
+        return len(schemas)
+    
+    def _stamp_pending_seats(self, schema_ids):
+        """Версии мест, оставшиеся без apply_seat_changes (сбой после коммита покупки)"""
+        pending = set(
+            Seat.objects.filter(schema__in=schema_ids, version__lt=0).order_by().values_list('schema_id', flat=True).distinct()
+        )
+        for schema_id in sorted(pending):
+            version = SeatSchema.next_version(schema_id)
+            Seat.objects.filter(schema_id=schema_id, version__lt=0).update(version=version)
+            # Какие места изменились, уже неизвестно: клиенты перечитают схему
+            transaction.on_commit(partial(publish_seat_changes, schema_id, version), using=self.db)
+
 class SeatSchema(models.Model):
     event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='seat_schema')
     schema_data = models.JSONField(default=dict, blank=True)
+    # Растет при каждом изменении статуса мест (курсор для seat_changes)
+    version = models.BigIntegerField(default=0)
+    # Версия последней перестройки схемы: более старые курсоры требуют полной синхронизации
+    layout_version = models.BigIntegerField(default=0)
+    # Счетчики мест: меняются после коммита смены статусов (apply_seat_changes), сверяются reconcile_seat_counters
+    seats_total = models.IntegerField(default=0)
+    seats_available = models.IntegerField(default=0)
+    seats_reserved = models.IntegerField(default=0)
+    seats_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    price_from = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    price_to = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    COUNTER_FIELDS = [
+        'seats_total', 'seats_available', 'seats_reserved', 'seats_sold', 'revenue', 'price_from', 'price_to',
+    ]
+    
+    objects = SeatSchemaQuerySet.as_manager()
     
     def __str__(self):
         return f"Schema for {self.event.title}"
+    
+    @classmethod
+    def next_version(cls, schema_id):
+        """Увеличивает версию схемы и возвращает новое значение (один UPDATE ... RETURNING)"""
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET version = version + 1 WHERE id = %s RETURNING version', [schema_id])
+            return cursor.fetchone()[0]
+    
+    def reset_layout(self, keep_template=False):
+        """Отмечает перестройку мест: все клиенты получат полную схему, счетчики пересчитываются.
+        
+        Без keep_template места считаются правленными вручную: еще не
+        развернутое описание зала (events.layouts) больше не применяется,
+        иначе его развертывание заменило бы ручные места.
+        """
+        schemas = SeatSchema.objects.filter(pk=self.pk)
+        if not keep_template:
+            data = schemas.values_list('schema_data', flat=True).first() or {}
+            if data.get('layout') and not data.get('materialized'):
+                schemas.update(schema_data={**data, 'materialized': True})
+        schemas.update(version=F('version') + 1, layout_version=F('version') + 1)
+        self.version = self.layout_version = schemas.values_list('version', flat=True).get()
+        schemas.recount()
+        transaction.on_commit(partial(publish_seat_changes, self.pk, self.version))
+        bump('events', 'seats')
+
+def apply_seat_changes(schema_id, marker, status):
+    """Версия схемы и счетчики для мест, измененных set_status (после коммита).
+    
+    Короткая отдельная транзакция: строка SeatSchema блокируется на
+    несколько UPDATE, а не на всю покупку. Порядок версий совпадает с
+    порядком коммитов этих транзакций, поэтому курсор seat_changes ничего
+    не пропускает. Приращение счетчиков (SeatCounterDelta) применяется,
+    даже если места с меткой уже изменила следующая покупка, и не
+    применяется, если его учел recount().
+    """
+    seat_table = connection.ops.quote_name(Seat._meta.db_table)
+    with transaction.atomic():
+        version = SeatSchema.next_version(schema_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {seat_table} SET version = %s WHERE schema_id = %s AND version = %s RETURNING id',
+                [version, schema_id, marker],
+            )
+            changed = [seat_id for seat_id, in cursor.fetchall()]
+        delta = SeatCounterDelta.objects.filter(marker=marker).first()
+        if delta is not None:
+            SeatSchema.objects.filter(pk=schema_id).update(
+                **{field: F(field) + getattr(delta, field) for field in SeatCounterDelta.FIELDS}
+            )
+            delta.delete()
+    
+    if changed:
+        code = STATUS_CODES.get(status, 0)
+        publish_seat_changes(schema_id, version, [[seat_id, code] for seat_id in changed])
+    bump('events', 'seats')
+
+class SeatQuerySet(models.QuerySet):
+    def set_status(self, status, expected=None, schema_id=None, **fields):
+        """Меняет статус мест; версия и счетчики схемы обновляются после коммита.
+        
+        В транзакции покупателя меняются только строки мест: они получают
+        временную отрицательную метку вместо версии, строка SeatSchema не
+        блокируется, и покупки одного события не ждут друг друга.
+        Версию и счетчики проставляет apply_seat_changes после коммита
+        (метки, оставшиеся после сбоя, - recount()).
+        
+        expected - требуемый текущий статус (условное обновление),
+        schema_id - схема, если известна заранее (экономит запрос).
+        Возвращает количество измененных мест.
+        """
+        if expected is None:
+            # Счетчикам нужен прежний статус: разбиваем на условные переходы
+            statuses = list(self.order_by().values_list('status', flat=True).distinct())
+            with transaction.atomic(using=self.db):
+                return sum(
+                    self.set_status(status, expected=old, schema_id=schema_id, **fields) for old in statuses
+                )
+        
+        queryset = self.filter(status=expected)
+        if schema_id is None:
+            schema_ids = list(queryset.order_by().values_list('schema_id', flat=True).distinct())
+        else:
+            schema_ids = [schema_id]
+        
+        updated = 0
+        with transaction.atomic(using=self.db):
+            for sid in schema_ids:
+                # Метка уникальна для вызова: по ней apply_seat_changes найдет именно эти места
+                marker = -secrets.randbits(62) - 1
+                count = queryset.filter(schema_id=sid).update(status=status, version=marker, **fields)
+                if not count:
+                    continue
+                if expected != status:
+                    # Вставка строки, а не UPDATE схемы: покупки не ждут друг друга
+                    delta = SeatCounterDelta(schema_id=sid, marker=marker)
+                    setattr(delta, STATUS_COUNTERS[expected], -count)
+                    setattr(delta, STATUS_COUNTERS[status], count)
+                    if 'sold' in (expected, status):
+                        amount = Seat.objects.filter(schema_id=sid, version=marker).aggregate(amount=Sum('price'))['amount']
+                        delta.revenue = amount if status == 'sold' else -amount
+                    delta.save(force_insert=True)
+                # robust: покупка уже закоммичена, сбой здесь исправит ночной recount()
+                transaction.on_commit(
+                    partial(apply_seat_changes, sid, marker, status), using=self.db, robust=True
+                )
+                updated += count
+        return updated
+
+class SeatCounterDelta(models.Model):
+    """Приращение счетчиков схемы от одной смены статусов (set_status).
+    
+    Пишется в транзакции покупателя вместо UPDATE строки SeatSchema,
+    применяется и удаляется apply_seat_changes после коммита; recount()
+    удаляет оставшиеся.
+    """
+    schema = models.ForeignKey(SeatSchema, on_delete=models.CASCADE, related_name='counter_deltas')
+    # Метка версии измененных мест (SeatQuerySet.set_status)
+    marker = models.BigIntegerField(unique=True)
+    seats_available = models.IntegerField(default=0)
+    seats_reserved = models.IntegerField(default=0)
+    seats_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    
+    FIELDS = ['seats_available', 'seats_reserved', 'seats_sold', 'revenue']
 
 class Seat(models.Model):
     SEAT_STATUS = [
@@ -47,9 +277,21 @@ class Seat(models.Model):
     number = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=SEAT_STATUS, default='available')
+    version = models.BigIntegerField(default=0)
+    # Бронь на время оплаты (status='reserved'), снимается release_expired_holds
+    reserved_until = models.DateTimeField(null=True, blank=True)
+    reserved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='seat_holds')
+    
+    objects = SeatQuerySet.as_manager()
     
     class Meta:
         unique_together = ['schema', 'sector', 'row', 'number']
+        indexes = [
+            models.Index(fields=['schema', 'version']),
+            # Условная смена статуса (SeatQuerySet.set_status) и счетчики схемы
+            models.Index(fields=['schema', 'status'], name='seat_schema_status_idx'),
+            models.Index(fields=['reserved_until'], condition=models.Q(status='reserved'), name='seat_hold_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sector}-{self.row}-{self.number}"
@@ -69,6 +311,11 @@ class Ticket(models.Model):
     
     class Meta:
         unique_together = ['event', 'seat']
+        indexes = [
+            # Пагинация по ключу (core/pagination.py)
+            models.Index(fields=['created_at', 'id'], name='ticket_created_id_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='ticket_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"Ticket {self.id} - {self.event.title}"
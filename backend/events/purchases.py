@@ -0,0 +1,155 @@
+"""Покупка и бронирование мест."""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Seat, Ticket
+
+
+class SeatsUnavailable(Exception):
+    """Часть мест заказа недоступна; failures - список {'seat', 'error'}"""
+
+    def __init__(self, failures):
+        super().__init__(failures)
+        self.failures = failures
+
+
+def claim_seat(user, event_id, schema_id, seat_id):
+    """Покупает одно место без SELECT ... FOR UPDATE.
+
+    Место захватывается одним условным UPDATE ... WHERE status = 'available',
+    билет создается в той же короткой транзакции. Возвращает билет или None,
+    если место уже занято (или не принадлежит схеме).
+    """
+    with transaction.atomic():
+        if not Seat.objects.filter(id=seat_id).set_status('sold', expected='available', schema_id=schema_id):
+            return None
+        return Ticket.objects.create(event_id=event_id, seat_id=seat_id, user=user, status='paid')
+
+
+def _unavailable(schema_id, seat_ids, statuses=None):
+    if statuses is None:
+        statuses = dict(Seat.objects.filter(schema_id=schema_id, id__in=seat_ids).values_list('id', 'status'))
+    failures = []
+    for seat_id in seat_ids:
+        if seat_id not in statuses:
+            failures.append({'seat': seat_id, 'error': 'Место не найдено'})
+        elif statuses[seat_id] != 'available':
+            failures.append({'seat': seat_id, 'error': 'Место недоступно'})
+    return failures
+
+
+def purchase_seats(user, event_id, schema_id, seat_ids):
+    """Покупает несколько мест одной транзакцией: все или ничего.
+
+    Места блокируются одним SELECT ... FOR UPDATE в порядке id, поэтому
+    пересекающиеся заказы ждут друг друга, а не взаимоблокируются.
+    SeatsUnavailable - часть мест занята или не принадлежит схеме.
+    """
+    with transaction.atomic():
+        statuses = dict(
+            Seat.objects.select_for_update()
+            .filter(schema_id=schema_id, id__in=seat_ids)
+            .order_by('id')
+            .values_list('id', 'status')
+        )
+        failures = _unavailable(schema_id, seat_ids, statuses)
+        if failures:
+            raise SeatsUnavailable(failures)
+        Seat.objects.filter(id__in=seat_ids).set_status('sold', expected='available', schema_id=schema_id)
+        Ticket.objects.bulk_create([
+            Ticket(event_id=event_id, seat_id=seat_id, user=user, status='paid')
+            for seat_id in seat_ids
+        ])
+
+
+def hold_seats(user, event_id, schema_id, seat_ids, ttl=None):
+    """Бронирует места на время оплаты: все или ничего.
+
+    Места переводятся в 'reserved' одним условным UPDATE, на каждое
+    создается билет 'pending'. Возвращает время окончания брони.
+    """
+    expires_at = timezone.now() + (ttl or settings.SEAT_HOLD_TTL)
+    try:
+        with transaction.atomic():
+            held = Seat.objects.filter(id__in=seat_ids).set_status(
+                'reserved', expected='available', schema_id=schema_id,
+                reserved_until=expires_at, reserved_by=user
+            )
+            if held != len(seat_ids):
+                raise SeatsUnavailable([])
+            Ticket.objects.bulk_create([
+                Ticket(event_id=event_id, seat_id=seat_id, user=user, status='pending')
+                for seat_id in seat_ids
+            ])
+    except SeatsUnavailable:
+        raise SeatsUnavailable(_unavailable(schema_id, seat_ids))
+    return expires_at
+
+
+def confirm_holds(user, event_id, schema_id):
+    """Оплачивает действующие брони пользователя на событие.
+
+    Истекшие, но еще не снятые брони не мешают оплате остальных: они
+    сразу освобождаются и попадают в отчет. Возвращает
+    (id проданных мест, список {'seat', 'error'} по истекшим).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Блокируются только места этого пользователя: снятие истекших броней
+        # не освободит место между проверкой срока и продажей
+        holds = list(
+            Seat.objects.select_for_update()
+            .filter(schema_id=schema_id, reserved_by=user, status='reserved')
+            .order_by('id')
+            .values_list('id', 'reserved_until')
+        )
+        seat_ids = [seat_id for seat_id, until in holds if until is not None and until > now]
+        expired = [seat_id for seat_id, until in holds if until is None or until <= now]
+        if seat_ids:
+            Seat.objects.filter(id__in=seat_ids).set_status(
+                'sold', expected='reserved', schema_id=schema_id, reserved_until=None, reserved_by=None
+            )
+            Ticket.objects.filter(event_id=event_id, seat_id__in=seat_ids, user=user, status='pending').update(status='paid')
+        if expired:
+            _release(Seat.objects.filter(id__in=expired), expired, schema_id)
+    return seat_ids, [{'seat': seat_id, 'error': 'Бронь истекла'} for seat_id in expired]
+
+
+def release_holds(user, schema_id):
+    """Снимает все брони пользователя в схеме"""
+    with transaction.atomic():
+        seat_ids = list(
+            Seat.objects.filter(schema_id=schema_id, reserved_by=user, status='reserved').values_list('id', flat=True)
+        )
+        return _release(Seat.objects.filter(id__in=seat_ids, reserved_by=user), seat_ids, schema_id)
+
+
+def release_expired_holds(batch_size=1000, now=None):
+    """Освобождает истекшие брони пачками (индекс seat_hold_expiry_idx).
+
+    Возвращает количество освобожденных мест.
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            seat_ids = list(
+                Seat.objects.filter(status='reserved', reserved_until__lt=now)
+                .order_by('reserved_until')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not seat_ids:
+                return released
+            released += _release(Seat.objects.filter(id__in=seat_ids, reserved_until__lt=now), seat_ids)
+        if len(seat_ids) < batch_size:
+            return released
+
+
+def _release(seats, seat_ids, schema_id=None):
+    count = seats.set_status('available', expected='reserved', schema_id=schema_id, reserved_until=None, reserved_by=None)
+    if count:
+        # Удаляем, а не отменяем: билет уникален для (event, seat) и иначе место не продать снова
+        freed = Seat.objects.filter(id__in=seat_ids, status='available').values_list('id', flat=True)
+        Ticket.objects.filter(seat_id__in=freed, status='pending').delete()
+    return count
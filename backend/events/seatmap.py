@@ -0,0 +1,156 @@
+"""Компактное (колоночное) представление схемы зала.
+
+Места кодируются не списком объектов, а набором параллельных массивов:
+
+* ``sectors`` - список названий секторов;
+* ``prices`` - таблица ценовых категорий (строки, как в ``SeatSerializer``);
+* ``runs`` - отрезки подряд идущих мест
+  ``[сектор, ряд, первый номер, количество, категория цены, первый id]``;
+* ``statuses`` - упакованная битовая карта статусов в base64,
+  по 2 бита на место в порядке раскрытия ``runs``;
+* ``version`` - версия схемы, курсор для ``seat_changes``.
+
+Отрезок продолжается, пока совпадают сектор, ряд и цена, а номера и id
+мест идут подряд - для сгенерированных залов это один отрезок на ряд
+(или на ценовую категорию внутри ряда).
+"""
+import base64
+import time
+
+from django.db import connection
+
+from .live import format_sse, subscription
+from .models import Seat, STATUS_CODES
+
+STATUS_BITS = 2
+SEATS_PER_BYTE = 8 // STATUS_BITS
+
+
+def pack_statuses(codes):
+    """Упаковывает коды статусов по 4 на байт и кодирует в base64"""
+    packed = bytearray((len(codes) + SEATS_PER_BYTE - 1) // SEATS_PER_BYTE)
+    for index, code in enumerate(codes):
+        if code:
+            packed[index // SEATS_PER_BYTE] |= code << (index % SEATS_PER_BYTE * STATUS_BITS)
+    return base64.b64encode(bytes(packed)).decode('ascii')
+
+
+def unpack_statuses(data, count):
+    """Обратная операция к pack_statuses"""
+    packed = base64.b64decode(data)
+    mask = (1 << STATUS_BITS) - 1
+    return [
+        packed[index // SEATS_PER_BYTE] >> (index % SEATS_PER_BYTE * STATUS_BITS) & mask
+        for index in range(count)
+    ]
+
+
+def encode_seat_rows(rows):
+    """Кодирует кортежи (id, sector, row, number, price, status).
+
+    Кортежи должны быть отсортированы по сектору, ряду и номеру.
+    """
+    sectors, sector_index = [], {}
+    prices, price_index = [], {}
+    runs, codes = [], []
+    run = None
+
+    for seat_id, sector, row, number, price, seat_status in rows:
+        s = sector_index.get(sector)
+        if s is None:
+            s = sector_index[sector] = len(sectors)
+            sectors.append(sector)
+        p = price_index.get(price)
+        if p is None:
+            p = price_index[price] = len(prices)
+            prices.append(f'{price:.2f}')
+
+        if (run is not None and run[0] == s and run[1] == row and run[4] == p
+                and run[2] + run[3] == number and run[5] + run[3] == seat_id):
+            run[3] += 1
+        else:
+            run = [s, row, number, 1, p, seat_id]
+            runs.append(run)
+        codes.append(STATUS_CODES.get(seat_status, 0))
+
+    return {
+        'count': len(codes),
+        'sectors': sectors,
+        'prices': prices,
+        'runs': runs,
+        'statuses': pack_statuses(codes),
+    }
+
+
+def encode_seat_map(schema):
+    """Компактная схема зала прямо из values_list, без сериализаторов"""
+    rows = Seat.objects.filter(schema=schema).order_by('sector', 'row', 'number').values_list(
+        'id', 'sector', 'row', 'number', 'price', 'status'
+    )
+    data = encode_seat_rows(rows.iterator(chunk_size=2000))
+    data.update(schema=schema.id, version=schema.version)
+    return data
+
+
+def encode_seat_changes(schema, since, limit=500):
+    """Изменения статусов мест после версии since.
+
+    Если курсор старше последней перестройки схемы, указывает в будущее
+    или изменений больше limit, возвращается полная компактная схема
+    с флагом resync.
+    """
+    # Версию читаем до мест: изменения, закоммиченные между запросами,
+    # в худшем случае придут повторно, но не потеряются
+    version = schema.version
+    if schema.layout_version <= since <= version:
+        changes = list(
+            Seat.objects.filter(schema=schema, version__gt=since)
+            .order_by('version')
+            .values_list('id', 'status')[:limit + 1]
+        )
+        if len(changes) <= limit:
+            return {
+                'schema': schema.id,
+                'version': version,
+                'resync': False,
+                'changes': [[seat_id, STATUS_CODES.get(seat_status, 0)] for seat_id, seat_status in changes],
+            }
+    data = encode_seat_map(schema)
+    data['resync'] = True
+    return data
+
+
+def stream_seat_changes(schema, since, duration=300, heartbeat=15):
+    """Генератор SSE-потока изменений схемы.
+
+    Сначала отдает изменения после since (или полную схему), затем
+    живые обновления только из канала (events.live), без обращений к БД.
+    Через duration секунд, при перестройке схемы или пропуске сообщений
+    поток закрывается, и EventSource переподключается с Last-Event-ID:
+    новый запрос отдаст недостающее из БД. Нужен асинхронный воркер (events.live).
+    """
+    with subscription(schema.id) as subscriber:
+        # Подписываемся до чтения из БД, чтобы не потерять изменения между ними
+        data = encode_seat_changes(schema, since)
+        version = snapshot_version = data['version']
+        # Соединение с БД больше не нужно - не держим его до закрытия потока
+        # (внутри транзакции, например в тестах, закрыть его нельзя)
+        if not connection.in_atomic_block:
+            connection.close()
+        yield format_sse(data, version)
+
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            message = subscriber.get(timeout=heartbeat)
+            if message is None:
+                yield ': ping\n\n'
+                continue
+            if subscriber.overflowed or message['resync']:
+                # Полная схема читается из БД уже при переподключении
+                return
+            # Публикации разных процессов могут прийти не по порядку версий,
+            # поэтому пропускаем только уже отданное снимком из БД
+            if message['version'] <= snapshot_version:
+                continue
+            version = max(version, message['version'])
+            yield format_sse(message, version)
@@ -20,6 +20,20 @@ class EventSerializer(serializers.ModelSerializer):
         model = Event
         fields = ['id', 'title', 'description', 'event_type', 'date', 'image', 'price_min', 'price_max', 'is_active', 'seat_schema']
 
+class EventListSerializer(serializers.ModelSerializer):
+    """Легкое представление для списка: статистика мест вместо вложенной схемы"""
+    seats_total = serializers.IntegerField(read_only=True, default=0)
+    seats_available = serializers.IntegerField(read_only=True, default=0)
+    price_from = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True, default=None)
+    price_to = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True, default=None)
+    
+    class Meta:
+        model = Event
+        fields = [
+            'id', 'title', 'description', 'event_type', 'date', 'image', 'price_min', 'price_max', 'is_active',
+            'seats_total', 'seats_available', 'price_from', 'price_to',
+        ]
+
 class TicketSerializer(serializers.ModelSerializer):
     event_title = serializers.CharField(source='event.title', read_only=True)
     seat_info = SeatSerializer(source='seat', read_only=True)
@@ -29,3 +43,25 @@ class TicketSerializer(serializers.ModelSerializer):
         model = Ticket
         fields = ['id', 'event', 'event_title', 'seat', 'seat_info', 'user_email', 'status', 'created_at']
         read_only_fields = ['created_at']
+
+
+class EventOrderSerializer(serializers.Serializer):
+    """Запрос по броням пользователя на событие: {event}"""
+    event = serializers.IntegerField(min_value=1)
+
+
+class SeatClaimSerializer(EventOrderSerializer):
+    """Покупка одного места: {event, seat}"""
+    seat = serializers.IntegerField(min_value=1)
+
+
+class SeatOrderSerializer(EventOrderSerializer):
+    """Заказ нескольких мест: {event, seats}; повторы id убираются"""
+    MAX_SEATS = 20
+
+    seats = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_SEATS
+    )
+
+    def validate_seats(self, value):
+        return sorted(set(value))
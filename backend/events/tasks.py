@@ -0,0 +1,37 @@
+from celery import shared_task
+
+from . import layouts, purchases
+from .models import SeatSchema
+
+
+@shared_task
+def generate_layout(schema_id, layout):
+    """Пересоздает места схемы по описанию зала (events.layouts)"""
+    schema = SeatSchema.objects.select_related('event').get(pk=schema_id)
+    return {'schema': schema_id, 'count': layouts.generate_layout(schema, layout)}
+
+
+@shared_task
+def materialize_layout(schema_id):
+    """Создает места схемы из назначенного описания зала (первое обращение к схеме)"""
+    return {'schema': schema_id, 'count': layouts.materialize_layout(schema_id)}
+
+
+@shared_task
+def reconcile_seat_counters(schema_ids=None, batch_size=500):
+    """Пересчитывает счетчики мест схем (по умолчанию всех) по таблице мест"""
+    queryset = SeatSchema.objects.order_by('id')
+    if schema_ids:
+        queryset = queryset.filter(id__in=schema_ids)
+    ids = list(queryset.values_list('id', flat=True))
+    total = 0
+    # Каждая пачка - отдельная транзакция, чтобы не держать блокировки всех схем
+    for start in range(0, len(ids), batch_size):
+        total += SeatSchema.objects.filter(id__in=ids[start:start + batch_size]).recount()
+    return total
+
+
+@shared_task
+def release_expired_holds(batch_size=1000):
+    """Освобождает места с истекшей бронью; запускается планировщиком"""
+    return purchases.release_expired_holds(batch_size=batch_size)
@@ -1,3 +1,571 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.testing import eager_tasks
+from .layouts import materialize_layout
+from .live import SeatBroadcaster, publish_seat_changes
+from .models import Event, Seat, SeatCounterDelta, SeatSchema, Ticket
+from .purchases import (
+    SeatsUnavailable, claim_seat, confirm_holds, hold_seats, purchase_seats, release_expired_holds, release_holds,
+)
+from .seatmap import encode_seat_changes, encode_seat_map, stream_seat_changes, unpack_statuses
+
+User = get_user_model()
+
+
+@eager_tasks
+class GenerateLayoutJobTest(TestCase):
+    """Создание зала идет фоновой задачей; в тестах Celery выполняет ее сразу"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=event)
+
+    def test_generate_returns_job_with_result(self):
+        response = self.client.post(f'/api/events/seat-schemas/{self.schema.pk}/generate_small_hall/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['count'], 100)
+
+        job = self.client.get(f"/api/jobs/{response.data['job']}/")
+        self.assertEqual(job.status_code, 200)
+        self.assertEqual(job.data['status'], 'SUCCESS')
+        self.assertEqual(job.data['result'], {'schema': self.schema.pk, 'count': 100})
+        self.assertEqual(Seat.objects.filter(schema=self.schema).count(), 100)
+
+    def test_invalid_layout_is_rejected_before_queueing(self):
+        response = self.client.post(f'/api/events/seat-schemas/{self.schema.pk}/generate/', {'layout': 'unknown'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('job', response.data)
+
+    def test_malformed_price_rules_are_rejected(self):
+        url = f'/api/events/seat-schemas/{self.schema.pk}/generate/'
+        for rule in ({'rows': 5}, {'rows': [3, 1]}, {'rows': ['1', 2]}, {'sectors': 'A'}, {'sectors': [1]}, 'max'):
+            layout = {'sectors': ['A'], 'rows': 2, 'seats_per_row': 2, 'prices': [rule]}
+            response = self.client.post(url, {'layout': layout}, format='json')
+            self.assertEqual(response.status_code, 400, rule)
+            self.assertIn('error', response.data)
+
+    def test_negative_and_nan_prices_are_rejected(self):
+        url = f'/api/events/seat-schemas/{self.schema.pk}/generate/'
+        for price in (-1, '-0.01', 'NaN', 'sNaN', 'Infinity', '-Infinity'):
+            layout = {'sectors': ['A'], 'rows': 2, 'seats_per_row': 2, 'prices': [{'price': price}]}
+            response = self.client.post(url, {'layout': layout}, format='json')
+            self.assertEqual(response.status_code, 400, price)
+            self.assertIn('error', response.data)
+        self.assertFalse(self.schema.seats.exists())
+
+
+@eager_tasks
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    'imports': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+})
+class SeatImportTest(TestCase):
+    """Строки с ошибками попадают в отчет и не мешают загрузке остальных"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=event)
+
+    def test_bulk_create_reports_row_errors(self):
+        seats = [
+            {'schema': self.schema.pk, 'sector': 'A', 'row': 1, 'number': 1, 'price': 500},
+            {'schema': self.schema.pk, 'sector': 'A', 'row': 1, 'number': 2, 'price': 500, 'status': 'sold'},
+            {'schema': self.schema.pk, 'sector': 'A', 'row': 0, 'number': 3, 'price': 500},
+            {'schema': self.schema.pk, 'sector': 'A', 'row': 1, 'number': 1, 'price': 700},
+            {'schema': 999, 'sector': 'A', 'row': 1, 'number': 4, 'price': 500},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/events/seats/bulk_create/', {'seats': seats}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5])
+        self.assertIn('row', response.data['errors'][0]['errors'])
+        self.assertIn('schema', response.data['errors'][2]['errors'])
+
+        self.schema.refresh_from_db()
+        self.assertEqual((self.schema.seats_available, self.schema.seats_sold), (1, 1))
+
+    def test_file_import_updates_existing_seats(self):
+        Seat.objects.create(schema=self.schema, sector='A', row=1, number=1, price=500, status='sold')
+        content = 'sector,row,number,price\nA,1,1,800\nA,1,2,800\nA,x,3,800\n'
+        upload = SimpleUploadedFile('seats.csv', content.encode('utf-8-sig'))
+        response = self.client.post(f'/api/events/seats/import/?schema={self.schema.pk}', {'file': upload})
+        self.assertEqual(response.status_code, 202)
+
+        job = self.client.get(f"/api/jobs/{response.data['job']}/")
+        self.assertEqual(job.data['status'], 'SUCCESS')
+        self.assertEqual(job.data['result']['imported'], 2)
+        self.assertEqual(job.data['result']['errors'][0]['row'], 3)
+        seats = Seat.objects.filter(schema=self.schema).order_by('number')
+        self.assertEqual([(seat.price, seat.status) for seat in seats], [(800, 'sold'), (800, 'available')])
+
+
+@eager_tasks
+class LayoutMaterializeTest(TestCase):
+    """Шаблон зала разворачивается задачей при первом обращении и не затирает места, правленные вручную"""
+
+    layout = {'sectors': [{'name': 'A', 'rows': 2, 'seats_per_row': 2}]}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=event)
+
+    def apply_layout(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.post(
+            f'/api/events/seat-schemas/{self.schema.pk}/apply_layout/', {'layout': self.layout}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+
+    def test_seats_created_on_first_read(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.apply_layout()
+        # Назначение шаблона мест не создает и задачу не ставит
+        self.assertFalse(Seat.objects.filter(schema=self.schema).exists())
+        self.schema.refresh_from_db()
+        self.assertFalse(self.schema.schema_data['materialized'])
+
+        self.client.force_authenticate(None)
+        with eager_tasks:
+            response = self.client.get(f'/api/events/events/{self.schema.event_id}/seats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Seat.objects.filter(schema=self.schema, sector='A').count(), 4)
+        self.schema.refresh_from_db()
+        self.assertTrue(self.schema.schema_data['materialized'])
+
+    def test_order_materializes_seats(self):
+        self.apply_layout()
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with eager_tasks:
+            client.post('/api/events/tickets/release/', {'event': self.schema.event_id}, format='json')
+        self.assertEqual(Seat.objects.filter(schema=self.schema).count(), 4)
+
+    def test_manual_seats_survive_public_read(self):
+        self.apply_layout()
+        self.client.post('/api/events/seats/bulk_delete/', {'schema_id': self.schema.pk}, format='json')
+        seats = [{'schema': self.schema.pk, 'sector': 'Z', 'row': 1, 'number': number, 'price': 500} for number in (1, 2, 3)]
+        response = self.client.post('/api/events/seats/bulk_create/', {'seats': seats}, format='json')
+        self.assertEqual(response.data['count'], 3)
+
+        self.client.force_authenticate(None)
+        response = self.client.get(f'/api/events/seats/?schema={self.schema.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(seat['sector'] for seat in response.data), ['Z', 'Z', 'Z'])
+        self.assertEqual(materialize_layout(self.schema.pk), 0)
+        self.assertEqual(Seat.objects.filter(schema=self.schema).count(), 3)
+
+    def test_materialize_keeps_existing_seats(self):
+        self.apply_layout()
+        Seat.objects.create(schema=self.schema, sector='Z', row=1, number=1, price=500)
+        self.assertEqual(materialize_layout(self.schema.pk), 0)
+        self.assertEqual(list(Seat.objects.filter(schema=self.schema).values_list('sector', flat=True)), ['Z'])
+        self.schema.refresh_from_db()
+        self.assertTrue(self.schema.schema_data['materialized'])
+
+
+class EventListQueriesTest(TestCase):
+    """Список событий берет статистику мест из счетчиков схемы одним JOIN"""
+
+    def setUp(self):
+        cache.clear()
+
+    def create_events(self, count):
+        for i in range(count):
+            event = Event.objects.create(
+                title=f'Событие {i}', description='Описание', event_type='hockey',
+                date=timezone.now() + timedelta(days=i), price_min=500, price_max=1500,
+            )
+            schema, _ = SeatSchema.objects.get_or_create(event=event)
+            Seat.objects.bulk_create([
+                Seat(schema=schema, sector='A', row=1, number=number, price=500 + number * 100, status=status)
+                for number, status in ((1, 'available'), (2, 'sold'), (3, 'available'))
+            ])
+            schema.reset_layout()
+
+    def list_events(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/events/events/')
+        self.assertEqual(response.status_code, 200)
+        # Места не читаются: только счетчики SeatSchema
+        seat_table = f'"{Seat._meta.db_table}"'
+        self.assertFalse([query['sql'] for query in context if seat_table in query['sql']])
+        return response.data['results'], len(context)
+
+    def test_query_count_is_constant(self):
+        self.create_events(2)
+        events, queries = self.list_events()
+        self.create_events(6)
+        more_events, more_queries = self.list_events()
+        self.assertEqual(len(more_events), 8)
+        self.assertEqual(queries, more_queries)
+
+        event = events[0]
+        self.assertEqual((event['seats_total'], event['seats_available']), (3, 2))
+        self.assertEqual((event['price_from'], event['price_to']), ('600.00', '800.00'))
+
+
+class SeatMapTest(TestCase):
+    """Компактная схема: отрезки мест подряд и упакованные статусы"""
+
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=self.event)
+        self.seats = Seat.objects.bulk_create(
+            [Seat(schema=self.schema, sector='A', row=1, number=number, price=500) for number in range(1, 5)]
+            + [Seat(schema=self.schema, sector='A', row=1, number=5, price=700)]
+            + [Seat(schema=self.schema, sector='B', row=2, number=number, price=500) for number in range(1, 3)]
+        )
+        Seat.objects.filter(pk=self.seats[1].pk).update(status='sold')
+        Seat.objects.filter(pk=self.seats[5].pk).update(status='reserved')
+
+    def test_runs_and_statuses(self):
+        data = encode_seat_map(self.schema)
+        ids = [seat.pk for seat in self.seats]
+        self.assertEqual(data['sectors'], ['A', 'B'])
+        self.assertEqual(data['prices'], ['500.00', '700.00'])
+        # Смена цены и ряда начинает новый отрезок
+        self.assertEqual(data['runs'], [[0, 1, 1, 4, 0, ids[0]], [0, 1, 5, 1, 1, ids[4]], [1, 2, 1, 2, 0, ids[5]]])
+        self.assertEqual(unpack_statuses(data['statuses'], data['count']), [0, 2, 0, 0, 0, 1, 0])
+        self.assertEqual((data['schema'], data['version']), (self.schema.pk, self.schema.version))
+
+    def test_compact_query_count_does_not_depend_on_seats(self):
+        url = f'/api/events/events/{self.event.pk}/seats/?compact=1'
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).data['count'], len(self.seats))
+        Seat.objects.bulk_create([
+            Seat(schema=self.schema, sector='C', row=row, number=number, price=500)
+            for row in range(1, 11) for number in range(1, 21)
+        ])
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(url).data['count'], len(self.seats) + 200)
+        self.assertEqual(len(small), len(large))
+
+
+class SeatChangesTest(TestCase):
+    """Лента изменений по курсору версии и полная схема, если курсор устарел"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        self.event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=self.event)
+        self.seats = Seat.objects.bulk_create([
+            Seat(schema=self.schema, sector='A', row=1, number=number, price=500) for number in range(1, 4)
+        ])
+        self.schema.reset_layout()
+        self.start = self.schema.version
+
+    def changes(self, since, **kwargs):
+        self.schema.refresh_from_db()
+        return encode_seat_changes(self.schema, since, **kwargs)
+
+    def test_changes_after_cursor(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            claim_seat(self.user, self.event.pk, self.schema.pk, self.seats[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            hold_seats(self.user, self.event.pk, self.schema.pk, [self.seats[1].pk])
+
+        data = self.changes(self.start)
+        self.assertFalse(data['resync'])
+        self.assertEqual(data['version'], self.start + 2)
+        self.assertEqual(data['changes'], [[self.seats[0].pk, 2], [self.seats[1].pk, 1]])
+        self.assertEqual(self.changes(self.start + 1)['changes'], [[self.seats[1].pk, 1]])
+        self.assertEqual(self.changes(data['version'])['changes'], [])
+
+    def test_resync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            claim_seat(self.user, self.event.pk, self.schema.pk, self.seats[0].pk)
+        # Курсор из будущего, до перестройки схемы и слишком много изменений
+        for since, limit in ((self.start + 5, 500), (self.start - 1, 500), (self.start, 0)):
+            data = self.changes(since, limit=limit)
+            self.assertTrue(data['resync'], (since, limit))
+            self.assertEqual(data['count'], len(self.seats))
+
+    def test_api(self):
+        url = f'/api/events/events/{self.event.pk}/seat_changes/'
+        response = self.client.get(f'{url}?since={self.start}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['version'], response.data['changes']), (self.start, []))
+        self.assertEqual(self.client.get(f'{url}?since=abc').status_code, 400)
+        self.assertEqual(self.client.get(f'{url}?since=0&wait=-1').status_code, 400)
+        # Изменения уже есть (курсор до перестройки): long-poll отвечает сразу
+        response = self.client.get(f'{url}?since={self.start - 1}&wait=30')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['resync'])
+
+
+@override_settings(SEAT_STREAM_BACKEND='memory')
+class SeatStreamTest(TestCase):
+    """После снимка поток отдает изменения только из канала и закрывается для пересинхронизации"""
+
+    def setUp(self):
+        event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=event)
+        self.seat = Seat.objects.create(schema=self.schema, sector='A', row=1, number=1, price=500)
+
+    def test_broadcaster_requires_publish(self):
+        with self.assertRaises(TypeError):
+            SeatBroadcaster()
+
+    def test_changes_then_resync_closes_stream(self):
+        stream = stream_seat_changes(self.schema, 0, heartbeat=1)
+        snapshot = json.loads(next(stream).split('data: ', 1)[1])
+        self.assertEqual(snapshot['schema'], self.schema.pk)
+
+        publish_seat_changes(self.schema.pk, snapshot['version'] + 1, [[self.seat.pk, 2]])
+        with self.assertNumQueries(0):
+            message = next(stream)
+            self.assertIn(f'id: {snapshot["version"] + 1}', message)
+            self.assertIn(f'[[{self.seat.pk},2]]', message)
+
+            publish_seat_changes(self.schema.pk, snapshot['version'] + 2)
+            with self.assertRaises(StopIteration):
+                next(stream)
+
+
+class SeatCountersTest(TestCase):
+    """Счетчики, обновленные после коммита покупок, совпадают с пересчетом по местам"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        self.event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=self.event)
+        self.seats = Seat.objects.bulk_create([
+            Seat(schema=self.schema, sector='A', row=1, number=number, price=500 if number % 2 else 700)
+            for number in range(1, 7)
+        ])
+        self.schema.reset_layout()
+
+    def counters(self):
+        self.schema.refresh_from_db()
+        return {field: getattr(self.schema, field) for field in SeatSchema.COUNTER_FIELDS}
+
+    def assertCountersMatchRecount(self):
+        incremental = self.counters()
+        SeatSchema.objects.filter(pk=self.schema.pk).recount()
+        self.assertEqual(incremental, self.counters())
+
+    def test_claim_hold_release_reset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNotNone(claim_seat(self.user, self.event.pk, self.schema.pk, self.seats[0].pk))
+        self.assertEqual((self.counters()['seats_sold'], self.counters()['revenue']), (1, 500))
+        self.assertCountersMatchRecount()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hold_seats(self.user, self.event.pk, self.schema.pk, [self.seats[1].pk, self.seats[2].pk])
+        self.assertEqual(self.counters()['seats_reserved'], 2)
+        self.assertCountersMatchRecount()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(release_holds(self.user, self.schema.pk), 2)
+        self.assertCountersMatchRecount()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hold_seats(self.user, self.event.pk, self.schema.pk, [self.seats[3].pk], ttl=timedelta(seconds=-1))
+            self.assertEqual(release_expired_holds(), 1)
+        self.assertCountersMatchRecount()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schema.reset_layout()
+        self.assertEqual(self.counters()['seats_available'], 5)
+        self.assertCountersMatchRecount()
+
+    def test_status_change_and_recount_in_one_transaction(self):
+        # Как в админке: смена статуса и перестройка схемы одной транзакцией
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Seat.objects.filter(pk=self.seats[0].pk).set_status('sold', schema_id=self.schema.pk)
+                self.schema.reset_layout()
+        self.assertEqual(self.counters()['seats_sold'], 1)
+        self.assertCountersMatchRecount()
+
+    def test_versions_assigned_after_commit(self):
+        self.schema.refresh_from_db()
+        version = self.schema.version
+        with self.captureOnCommitCallbacks() as callbacks:
+            claim_seat(self.user, self.event.pk, self.schema.pk, self.seats[0].pk)
+        # До коммита строка схемы не менялась
+        self.schema.refresh_from_db()
+        self.assertEqual((self.schema.version, self.schema.seats_sold), (version, 0))
+        self.assertLess(Seat.objects.get(pk=self.seats[0].pk).version, 0)
+
+        for callback in callbacks:
+            callback()
+        self.schema.refresh_from_db()
+        self.assertEqual((self.schema.version, self.schema.seats_sold), (version + 1, 1))
+        self.assertEqual(Seat.objects.get(pk=self.seats[0].pk).version, version + 1)
+
+    def test_recount_stamps_lost_changes(self):
+        # Коллбэк после коммита не выполнился (сбой процесса)
+        claim_seat(self.user, self.event.pk, self.schema.pk, self.seats[0].pk)
+        SeatSchema.objects.filter(pk=self.schema.pk).recount()
+        self.schema.refresh_from_db()
+        self.assertEqual(self.schema.seats_sold, 1)
+        self.assertEqual(Seat.objects.get(pk=self.seats[0].pk).version, self.schema.version)
+        self.assertFalse(Seat.objects.filter(version__lt=0).exists())
+        self.assertFalse(SeatCounterDelta.objects.exists())
+
+
+class PurchaseTest(TestCase):
+    """Покупка и брони: место продается один раз, истекшие брони освобождаются"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='x')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        self.event = Event.objects.create(
+            title='Матч', description='Описание', event_type='hockey',
+            date=timezone.now(), price_min=500, price_max=1500,
+        )
+        self.schema, _ = SeatSchema.objects.get_or_create(event=self.event)
+        self.seats = [
+            seat.pk for seat in Seat.objects.bulk_create([
+                Seat(schema=self.schema, sector='A', row=1, number=number, price=500) for number in range(1, 5)
+            ])
+        ]
+
+    def expire(self, seat_ids):
+        Seat.objects.filter(id__in=seat_ids).update(reserved_until=timezone.now() - timedelta(minutes=1))
+
+    def test_double_claim(self):
+        self.assertIsNotNone(claim_seat(self.user, self.event.pk, self.schema.pk, self.seats[0]))
+        self.assertIsNone(claim_seat(self.other, self.event.pk, self.schema.pk, self.seats[0]))
+        self.assertEqual(Ticket.objects.filter(seat_id=self.seats[0]).count(), 1)
+
+    def test_hold_is_all_or_nothing(self):
+        claim_seat(self.other, self.event.pk, self.schema.pk, self.seats[1])
+        with self.assertRaises(SeatsUnavailable) as context:
+            hold_seats(self.user, self.event.pk, self.schema.pk, self.seats[:2])
+        self.assertEqual(context.exception.failures, [{'seat': self.seats[1], 'error': 'Место недоступно'}])
+        self.assertEqual(Seat.objects.get(pk=self.seats[0]).status, 'available')
+
+    def test_expired_hold_is_released(self):
+        hold_seats(self.user, self.event.pk, self.schema.pk, self.seats[:2])
+        self.expire(self.seats[:1])
+        self.assertEqual(release_expired_holds(), 1)
+        self.assertEqual(Seat.objects.get(pk=self.seats[0]).status, 'available')
+        self.assertFalse(Ticket.objects.filter(seat_id=self.seats[0]).exists())
+        # Освобожденное место снова можно купить
+        self.assertIsNotNone(claim_seat(self.other, self.event.pk, self.schema.pk, self.seats[0]))
+
+    def test_confirm_with_partly_expired_holds(self):
+        hold_seats(self.user, self.event.pk, self.schema.pk, self.seats[:3])
+        self.expire(self.seats[2:3])
+        seat_ids, expired = confirm_holds(self.user, self.event.pk, self.schema.pk)
+        self.assertEqual(seat_ids, self.seats[:2])
+        self.assertEqual(expired, [{'seat': self.seats[2], 'error': 'Бронь истекла'}])
+        statuses = dict(Seat.objects.filter(id__in=self.seats[:3]).values_list('id', 'status'))
+        self.assertEqual([statuses[pk] for pk in self.seats[:3]], ['sold', 'sold', 'available'])
+        self.assertEqual(
+            list(Ticket.objects.filter(user=self.user).order_by('seat_id').values_list('status', flat=True)),
+            ['paid', 'paid'],
+        )
+
+    def test_confirm_api_reports_expired(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        hold_seats(self.user, self.event.pk, self.schema.pk, self.seats[:2])
+        self.expire(self.seats)
+        response = client.post('/api/events/tickets/confirm/', {'event': self.event.pk}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([failure['seat'] for failure in response.data['seats']], self.seats[:2])
+
+        hold_seats(self.user, self.event.pk, self.schema.pk, self.seats[2:])
+        response = client.post('/api/events/tickets/confirm/', {'event': self.event.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_purchase_is_all_or_nothing(self):
+        claim_seat(self.other, self.event.pk, self.schema.pk, self.seats[1])
+        with self.assertRaises(SeatsUnavailable) as context:
+            purchase_seats(self.user, self.event.pk, self.schema.pk, [self.seats[0], self.seats[1], 0])
+        self.assertEqual(context.exception.failures, [
+            {'seat': self.seats[1], 'error': 'Место недоступно'},
+            {'seat': 0, 'error': 'Место не найдено'},
+        ])
+        self.assertEqual(Seat.objects.get(pk=self.seats[0]).status, 'available')
+        self.assertFalse(Ticket.objects.filter(user=self.user).exists())
+
+    def test_purchase_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        order = {'event': self.event.pk, 'seats': [self.seats[1], self.seats[0], self.seats[1]]}
+        response = client.post('/api/events/tickets/purchase/', order, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(ticket['seat'] for ticket in response.data), self.seats[:2])
+        self.assertEqual(Seat.objects.filter(id__in=self.seats[:2], status='sold').count(), 2)
+
+        response = client.post('/api/events/tickets/purchase/', order, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(len(response.data['seats']), 2)
+
+    def test_invalid_order_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        too_many = list(range(1, 22))
+        for url, data in (
+            ('/api/events/tickets/purchase/', {'event': 'abc', 'seats': self.seats[:1]}),
+            ('/api/events/tickets/purchase/', {'event': self.event.pk, 'seats': too_many}),
+            ('/api/events/tickets/purchase/', {'event': self.event.pk, 'seats': ['x']}),
+            ('/api/events/tickets/hold/', {'seats': self.seats[:1]}),
+            ('/api/events/tickets/', {'event': [1], 'seat': self.seats[0]}),
+            ('/api/events/tickets/confirm/', {'event': 'abc'}),
+            ('/api/events/tickets/release/', {'event': None}),
+        ):
+            response = client.post(url, data, format='json')
+            self.assertEqual(response.status_code, 400, (url, data))
+            self.assertIn('error', response.data)
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_release_holds(self):
+        hold_seats(self.user, self.event.pk, self.schema.pk, self.seats[:2])
+        self.assertEqual(release_holds(self.other, self.schema.pk), 0)
+        self.assertEqual(release_holds(self.user, self.schema.pk), 2)
+        self.assertFalse(Seat.objects.filter(status='reserved').exists())
+        self.assertFalse(Ticket.objects.exists())
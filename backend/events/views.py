@@ -2,9 +2,36 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, IsAdminUser, AllowAny
-from django.db import transaction
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from django.core.exceptions import ValidationError
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, Concat
+from django.http import StreamingHttpResponse
 from .models import Event, Seat, Ticket, SeatSchema
-from .serializers import EventSerializer, SeatSerializer, TicketSerializer
+from .serializers import (
+    EventSerializer, EventListSerializer, EventOrderSerializer, SeatClaimSerializer, SeatOrderSerializer,
+    SeatSerializer, TicketSerializer,
+)
+from .seatmap import encode_seat_map, encode_seat_rows, encode_seat_changes, stream_seat_changes
+from .live import subscription
+from .layouts import LayoutError, assign_layout, count_seats, ensure_seats, validate_layout
+from .imports import SeatImporter
+from .purchases import SeatsUnavailable, claim_seat, confirm_holds, hold_seats, purchase_seats, release_holds
+from . import tasks
+from core.cache import cache_response
+from core.exports import filter_export, stream_export
+from core.pagination import KeysetPagination
+from core.views import enqueue_rows, import_response, job_response
+
+SEAT_IMPORTER = 'events.imports.SeatImporter'
+
+class EventStreamRenderer(BaseRenderer):
+    """Позволяет согласовать Accept: text/event-stream для SSE-потока"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
 
 class EventViewSet(viewsets.ModelViewSet):
     queryset = Event.objects.filter(is_active=True)
@@ -18,15 +45,99 @@ class EventViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.is_staff:
-            return Event.objects.all()
-        return Event.objects.filter(is_active=True)
+            queryset = Event.objects.all()
+        else:
+            queryset = Event.objects.filter(is_active=True)
+        if self.action == 'list':
+            return queryset.with_seat_stats()
+        if self.action == 'retrieve':
+            return queryset.select_related('seat_schema').prefetch_related('seat_schema__seats')
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return EventListSerializer
+        return EventSerializer
+    
+    def _get_schema(self, event):
+        """Схема зала события или None; неразвернутый шаблон ставится в очередь на создание мест"""
+        try:
+            schema = SeatSchema.objects.select_related('event').get(event=event)
+        except SeatSchema.DoesNotExist:
+            return None
+        ensure_seats(schema)
+        return schema
+    
+    @cache_response('events')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response('events', 'seats')
+    def retrieve(self, request, *args, **kwargs):
+        # Детальное представление включает места - ставим их создание в очередь, если схема еще не развернута
+        self._get_schema(self.get_object())
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
+    @cache_response('seats')
     def seats(self, request, pk=None):
-        event = self.get_object()
-        seats = Seat.objects.filter(schema__event=event)
+        schema = self._get_schema(self.get_object())
+        # ?compact=1 - колоночная схема зала без сериализации каждого места
+        if request.query_params.get('compact'):
+            return Response(encode_seat_map(schema) if schema else encode_seat_rows([]))
+        seats = Seat.objects.filter(schema=schema)
         serializer = SeatSerializer(seats, many=True)
         return Response(serializer.data)
+    
+    def _get_seat_cursor(self, request, name='since'):
+        try:
+            return int(request.query_params.get(name) or 0)
+        except ValueError:
+            return None
+    
+    @action(detail=True, methods=['get'])
+    def seat_changes(self, request, pk=None):
+        """Изменения статусов мест после версии ?since=
+        
+        ?wait=N - long-poll: если изменений нет, ждать их до N секунд (не более 30).
+        """
+        event = self.get_object()
+        since = self._get_seat_cursor(request, 'since')
+        wait = self._get_seat_cursor(request, 'wait')
+        if since is None or wait is None:
+            return Response({'error': 'Параметры since и wait должны быть числами'}, status=status.HTTP_400_BAD_REQUEST)
+        if wait < 0:
+            return Response({'error': 'Параметр wait не может быть отрицательным'}, status=status.HTTP_400_BAD_REQUEST)
+        schema = self._get_schema(event)
+        if schema is None:
+            return Response({'error': 'Схема зала не создана'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not wait:
+            return Response(encode_seat_changes(schema, since))
+        with subscription(schema.id) as subscriber:
+            data = encode_seat_changes(schema, since)
+            if not data['resync'] and not data['changes'] and subscriber.get(timeout=min(wait, 30)) is not None:
+                schema.refresh_from_db(fields=['version', 'layout_version'])
+                data = encode_seat_changes(schema, since)
+        return Response(data)
+    
+    @action(detail=True, methods=['get'], renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def seat_stream(self, request, pk=None):
+        """SSE-поток изменений мест (курсор - ?since= или заголовок Last-Event-ID)"""
+        event = self.get_object()
+        since = request.headers.get('Last-Event-ID') or request.query_params.get('since') or 0
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({'error': 'Параметр since должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        schema = self._get_schema(event)
+        if schema is None:
+            return Response({'error': 'Схема зала не создана'}, status=status.HTTP_404_NOT_FOUND)
+        
+        response = StreamingHttpResponse(stream_seat_changes(schema, since), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 class SeatSchemaViewSet(viewsets.ModelViewSet):
     queryset = SeatSchema.objects.all()
@@ -40,64 +151,59 @@ class SeatSchemaViewSet(viewsets.ModelViewSet):
                 fields = ['id', 'event', 'schema_data']
         return SeatSchemaSerializer
     
+    def _generate(self, layout, message):
+        """Проверяет описание зала и ставит создание мест в очередь (events.tasks.generate_layout)"""
+        schema = self.get_object()
+        try:
+            count = count_seats(validate_layout(layout, schema.event))
+        except LayoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        result = tasks.generate_layout.delay(schema.pk, layout)
+        return job_response(result, message=message.format(count=count), count=count)
+    
     @action(detail=True, methods=['post'])
     def generate_small_hall(self, request, pk=None):
-        schema = self.get_object()
-        Seat.objects.filter(schema=schema).delete()
-        
-        sectors = ['A', 'B']
-        for sector in sectors:
-            for row in range(1, 6):
-                for number in range(1, 11):
-                    price = schema.event.price_max if row <= 2 else schema.event.price_min
-                    Seat.objects.create(schema=schema, sector=sector, row=row, number=number, price=price)
-        
-        return Response({'message': 'Малый зал создан (100 мест)'})
+        return self._generate('small', 'Малый зал создается ({count} мест)')
     
     @action(detail=True, methods=['post'])
     def generate_medium_hall(self, request, pk=None):
-        schema = self.get_object()
-        Seat.objects.filter(schema=schema).delete()
-        
-        sectors = ['A', 'B', 'C']
-        for sector in sectors:
-            for row in range(1, 11):
-                for number in range(1, 16):
-                    if row <= 3:
-                        price = schema.event.price_max
-                    elif row <= 7:
-                        price = (schema.event.price_min + schema.event.price_max) / 2
-                    else:
-                        price = schema.event.price_min
-                    Seat.objects.create(schema=schema, sector=sector, row=row, number=number, price=price)
-        
-        return Response({'message': 'Средний зал создан (450 мест)'})
+        return self._generate('medium', 'Средний зал создается ({count} мест)')
     
     @action(detail=True, methods=['post'])
     def generate_large_hall(self, request, pk=None):
-        schema = self.get_object()
-        Seat.objects.filter(schema=schema).delete()
-        
-        sectors = ['A', 'B', 'C', 'D']
-        for sector in sectors:
-            for row in range(1, 16):
-                for number in range(1, 21):
-                    if row <= 5:
-                        price = schema.event.price_max
-                    elif row <= 10:
-                        price = (schema.event.price_min + schema.event.price_max) / 2
-                    else:
-                        price = schema.event.price_min
-                    Seat.objects.create(schema=schema, sector=sector, row=row, number=number, price=price)
+        return self._generate('large', 'Большой зал создается ({count} мест)')
+    
+    @action(detail=True, methods=['post'])
+    def generate(self, request, pk=None):
+        """Места по описанию зала: {"layout": "large"} или {"layout": {...}} (см. events.layouts)"""
+        return self._generate(request.data.get('layout'), 'Зал создается ({count} мест)')
+    
+    @action(detail=True, methods=['post'])
+    def apply_layout(self, request, pk=None):
+        """Назначает описание зала без создания мест: {"layout": ...} или {"from_schema": id}
         
-        return Response({'message': 'Большой зал создан (1200 мест)'})
+        Места создаются фоновой задачей при первом обращении к схеме.
+        """
+        schema = self.get_object()
+        layout = request.data.get('layout')
+        from_schema = request.data.get('from_schema')
+        if from_schema:
+            source = SeatSchema.objects.filter(pk=from_schema).values_list('schema_data', flat=True).first()
+            layout = (source or {}).get('layout')
+            if not layout:
+                return Response({'error': 'У схемы-источника нет описания зала'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            count = assign_layout(schema, layout)
+        except LayoutError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'message': f'Схема назначена ({count} мест)', 'count': count})
 
 class SeatViewSet(viewsets.ModelViewSet):
     queryset = Seat.objects.all()
     serializer_class = SeatSerializer
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_delete', 'bulk_create']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_delete', 'bulk_create', 'import_file']:
             return [IsAdminUser()]
         # Разрешить всем видеть места (публичный доступ)
         return [AllowAny()]
@@ -112,57 +218,212 @@ class SeatViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         # Если фильтр по schema - возвращаем все без пагинации
         if request.query_params.get('schema'):
+            schema = SeatSchema.objects.select_related('event').filter(pk=request.query_params['schema']).first()
+            if schema:
+                ensure_seats(schema)
             queryset = self.filter_queryset(self.get_queryset())
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
         return super().list(request, *args, **kwargs)
     
+    def perform_create(self, serializer):
+        seat = serializer.save()
+        seat.schema.reset_layout()
+    
+    def perform_update(self, serializer):
+        # Смена статуса идет через set_status, чтобы попасть в seat_changes,
+        # любые другие правки места требуют полной синхронизации клиентов
+        new_status = serializer.validated_data.pop('status', None)
+        layout_changed = bool(serializer.validated_data)
+        seat = serializer.save()
+        if new_status and new_status != seat.status:
+            Seat.objects.filter(pk=seat.pk).set_status(new_status, schema_id=seat.schema_id)
+            seat.status = new_status
+        if layout_changed:
+            seat.schema.reset_layout()
+    
+    def perform_destroy(self, instance):
+        schema = instance.schema
+        instance.delete()
+        schema.reset_layout()
+    
     @action(detail=False, methods=['post'])
     def bulk_delete(self, request):
         schema_id = request.data.get('schema_id')
         if schema_id:
             Seat.objects.filter(schema_id=schema_id).delete()
+            SeatSchema(pk=schema_id).reset_layout()
             return Response({'status': 'deleted'})
         return Response({'error': 'schema_id required'}, status=400)
     
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
-        seats_data = request.data.get('seats', [])
-        schema_id = seats_data[0]['schema'] if seats_data else None
-        
-        if not schema_id:
+        """Места из JSON {seats: [...]}: проверка и загрузка пачками с отчетом по строкам"""
+        seats_data = request.data.get('seats')
+        if not seats_data or not isinstance(seats_data, list):
             return Response({'error': 'No seats data'}, status=400)
         
-        schema = SeatSchema.objects.get(id=schema_id)
-        seats = []
-        for seat_data in seats_data:
-            seat_data['schema'] = schema
-            seats.append(Seat(**seat_data))
-        
-        Seat.objects.bulk_create(seats)
-        return Response({'status': 'created', 'count': len(seats)})
+        if request.data.get('async'):
+            # Большой импорт - в фоне, состояние по GET /api/jobs/<job>/
+            return enqueue_rows(SEAT_IMPORTER, seats_data, count=len(seats_data))
+        report = SeatImporter().run(seats_data)
+        if report['error_count'] and not report['imported']:
+            return Response({'error': 'Ни одно место не загружено', **report}, status=400)
+        return Response({'status': 'created', 'count': report['imported'], **report})
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """Импорт мест из CSV/JSON/NDJSON в фоне; ?schema= - схема для строк без колонки schema"""
+        defaults = {}
+        schema_id = request.query_params.get('schema')
+        if schema_id:
+            if not schema_id.isdigit() or not SeatSchema.objects.filter(pk=schema_id).exists():
+                return Response({'error': 'Схема зала не найдена'}, status=status.HTTP_404_NOT_FOUND)
+            defaults['schema'] = int(schema_id)
+        return import_response(request, SEAT_IMPORTER, **defaults)
 
 class TicketViewSet(viewsets.ModelViewSet):
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
+        queryset = Ticket.objects.select_related('event', 'seat', 'user')
         if self.request.user.is_staff:
-            return Ticket.objects.all()
-        return Ticket.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
+    
+    def _validated(self, serializer_class):
+        """Данные запроса, проверенные serializer_class, или Response 400 с первой ошибкой"""
+        serializer = serializer_class(data=self.request.data)
+        if serializer.is_valid():
+            return serializer.validated_data
+        field, error = next(iter(serializer.errors.items()))
+        # У списка ошибки вложены по индексам элементов
+        while isinstance(error, (dict, list)):
+            error = next(iter(error.values())) if isinstance(error, dict) else error[0]
+        return Response({'error': f'{field}: {error}', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+    
+    def _get_schema_id(self, event_id):
+        schema = SeatSchema.objects.filter(event_id=event_id).only('id', 'schema_data').first()
+        if schema is None:
+            return None
+        # Заказ раньше чтения схемы тоже запускает создание мест из шаблона
+        ensure_seats(schema)
+        return schema.id
+    
+    def _parse_order(self, serializer_class):
+        """Проверяет заказ до открытия транзакции: (данные, schema_id) или Response с ошибкой"""
+        data = self._validated(serializer_class)
+        if isinstance(data, Response):
+            return data
+        schema_id = self._get_schema_id(data['event'])
+        if schema_id is None:
+            return Response({'error': 'Схема зала не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        return data, schema_id
+    
+    def _tickets_response(self, event_id, seat_ids, response_status=status.HTTP_200_OK, **extra):
+        tickets = Ticket.objects.filter(event_id=event_id, seat_id__in=seat_ids).select_related('event', 'seat', 'user')
+        serializer = self.get_serializer(tickets, many=True)
+        if extra:
+            return Response({**extra, 'tickets': serializer.data}, status=response_status)
+        return Response(serializer.data, status=response_status)
     
-    @transaction.atomic
     def create(self, request):
-        seat_id = request.data.get('seat')
-        event_id = request.data.get('event')
+        order = self._parse_order(SeatClaimSerializer)
+        if isinstance(order, Response):
+            return order
+        data, schema_id = order
         
-        seat = Seat.objects.select_for_update().get(id=seat_id)
-        if seat.status != 'available':
+        ticket = claim_seat(request.user, data['event'], schema_id, data['seat'])
+        if ticket is None:
             return Response({'error': 'Место недоступно'}, status=status.HTTP_400_BAD_REQUEST)
         
-        seat.status = 'sold'
-        seat.save()
-        
-        ticket = Ticket.objects.create(event_id=event_id, seat=seat, user=request.user, status='paid')
+        ticket = Ticket.objects.select_related('event', 'seat', 'user').get(pk=ticket.pk)
         serializer = self.get_serializer(ticket)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def purchase(self, request):
+        """Покупка нескольких мест одной транзакцией: все или ничего"""
+        order = self._parse_order(SeatOrderSerializer)
+        if isinstance(order, Response):
+            return order
+        data, schema_id = order
+        try:
+            purchase_seats(request.user, data['event'], schema_id, data['seats'])
+        except SeatsUnavailable as e:
+            return Response(
+                {'error': 'Часть мест недоступна, заказ не оформлен', 'seats': e.failures},
+                status=status.HTTP_409_CONFLICT
+            )
+        return self._tickets_response(data['event'], data['seats'], status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def hold(self, request):
+        """Бронь мест на время оплаты (SEAT_HOLD_TTL): все или ничего"""
+        order = self._parse_order(SeatOrderSerializer)
+        if isinstance(order, Response):
+            return order
+        data, schema_id = order
+        try:
+            expires_at = hold_seats(request.user, data['event'], schema_id, data['seats'])
+        except SeatsUnavailable as e:
+            return Response(
+                {'error': 'Часть мест недоступна, бронь не оформлена', 'seats': e.failures},
+                status=status.HTTP_409_CONFLICT
+            )
+        return self._tickets_response(data['event'], data['seats'], status.HTTP_201_CREATED, expires_at=expires_at)
+    
+    @action(detail=False, methods=['post'])
+    def confirm(self, request):
+        """Оплата действующих броней пользователя на событие; истекшие освобождаются и перечисляются в expired"""
+        order = self._parse_order(EventOrderSerializer)
+        if isinstance(order, Response):
+            return order
+        data, schema_id = order
+        seat_ids, expired = confirm_holds(request.user, data['event'], schema_id)
+        if not seat_ids and expired:
+            return Response({'error': 'Бронь истекла, выберите места заново', 'seats': expired}, status=status.HTTP_409_CONFLICT)
+        if not seat_ids:
+            return Response({'error': 'Нет действующих броней'}, status=status.HTTP_400_BAD_REQUEST)
+        # Истекшие брони освобождены, остальные оплачены
+        if expired:
+            return self._tickets_response(data['event'], seat_ids, expired=expired)
+        return self._tickets_response(data['event'], seat_ids)
+    
+    @action(detail=False, methods=['post'])
+    def release(self, request):
+        """Отмена всех броней пользователя на событие"""
+        order = self._parse_order(EventOrderSerializer)
+        if isinstance(order, Response):
+            return order
+        _, schema_id = order
+        return Response({'released': release_holds(request.user, schema_id)})
+    
+    # Колонки выгрузки: (заголовок, поле или аннотация)
+    EXPORT_COLUMNS = [
+        ('id', 'id'), ('created_at', 'created_at'), ('status', 'status'),
+        ('event_id', 'event_id'), ('event', 'event__title'), ('event_date', 'event__date'),
+        ('seat', 'seat_label'), ('price', 'seat__price'), ('user_email', 'user__email'),
+    ]
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Потоковая выгрузка: ?output=csv|ndjson&date_from=&date_to= (по дате покупки)&status=&event="""
+        queryset = Ticket.objects.annotate(
+            seat_label=Concat(
+                'seat__sector', Value(', ряд '), Cast('seat__row', CharField()),
+                Value(', место '), Cast('seat__number', CharField()), output_field=CharField(),
+            )
+        ).order_by('created_at', 'id')
+        event_id = request.query_params.get('event')
+        if event_id:
+            if not event_id.isdigit():
+                return Response({'error': 'event должен быть id события'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(event_id=event_id)
+        try:
+            queryset = filter_export(queryset, request.query_params, 'created_at', Ticket.TICKET_STATUS)
+            return stream_export(queryset, self.EXPORT_COLUMNS, request.query_params.get('output', 'csv'), 'tickets')
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,22 @@
+"""Настройки gunicorn для production: ``gunicorn -c gunicorn.conf.py``.
+
+SSE-поток схемы зала (events.live) держит соединение до 5 минут, поэтому
+воркеры gevent: один процесс обслуживает до worker_connections клиентов,
+а не одного, как синхронный воркер.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'core.wsgi:application'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+# Для gevent это проверка живости воркера, а не ограничение длины запроса
+timeout = 30
+
+
+def post_fork(server, worker):
+    # Без патча psycopg2 блокирует весь процесс на время запроса к БД
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
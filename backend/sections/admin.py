@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Section, Group, Schedule, GroupMembership, SectionRequest
+from .enrollment import decide_requests
+from .models import Section, Group, Schedule, GroupMembership, GroupWaitlist, SectionRequest
 
 @admin.register(Section)
 class SectionAdmin(admin.ModelAdmin):
@@ -8,8 +9,9 @@ class SectionAdmin(admin.ModelAdmin):
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ['name', 'section', 'max_members']
+    list_display = ['name', 'section', 'member_count', 'max_members']
     list_filter = ['section']
+    readonly_fields = ['member_count']
 
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
@@ -21,6 +23,12 @@ class GroupMembershipAdmin(admin.ModelAdmin):
     list_display = ['user', 'group', 'joined_at']
     search_fields = ['user__email']
 
+@admin.register(GroupWaitlist)
+class GroupWaitlistAdmin(admin.ModelAdmin):
+    list_display = ['user', 'group', 'section_request', 'created_at']
+    list_filter = ['group']
+    search_fields = ['user__email']
+
 @admin.register(SectionRequest)
 class SectionRequestAdmin(admin.ModelAdmin):
     list_display = ['name', 'section', 'status', 'created_at']
@@ -28,7 +36,11 @@ class SectionRequestAdmin(admin.ModelAdmin):
     actions = ['approve_requests', 'reject_requests']
     
     def approve_requests(self, request, queryset):
-        queryset.update(status='approved')
+        results = decide_requests(list(queryset.values_list('pk', flat=True)), [])
+        approved = sum(result['status'] == 'approved' for result in results)
+        self.message_user(request, f"{approved} заявок одобрено")
     
     def reject_requests(self, request, queryset):
-        queryset.update(status='rejected')
+        results = decide_requests([], list(queryset.values_list('pk', flat=True)))
+        rejected = sum(result['status'] == 'rejected' for result in results)
+        self.message_user(request, f"{rejected} заявок отклонено")
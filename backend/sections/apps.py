@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class SectionsConfig(AppConfig):
     name = 'sections'
+
+    def ready(self):
+        from core.cache import invalidate_on_change
+        from . import signals  # noqa: F401
+        from .models import Group, GroupMembership, GroupWaitlist, Schedule, Section
+
+        # Секции включают группы, группы - расписание и число участников
+        for model in (Section, Group, Schedule, GroupMembership, GroupWaitlist):
+            invalidate_on_change(model, 'sections')
@@ -0,0 +1,209 @@
+"""Запись в группы с учетом вместимости.
+
+Место в группе занимается одним условным UPDATE
+``member_count = member_count + 1 WHERE member_count < max_members``:
+параллельные записи не превысят max_members и не требуют COUNT.
+Если мест нет, пользователь встает в лист ожидания (GroupWaitlist).
+
+Уменьшение member_count при удалении участника делает сигнал
+post_delete (sections/signals.py), поэтому счетчик верен и при
+каскадном удалении пользователя или группы.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from core.cache import bump
+from core.notifications import notify
+from users.authentication import invalidate_users
+from .models import Group, GroupMembership, GroupWaitlist, SectionRequest
+
+ENROLLED = 'enrolled'
+ALREADY = 'already'
+WAITLISTED = 'waitlisted'
+
+
+def _take_place(group_id, count=1):
+    return Group.objects.filter(
+        pk=group_id, member_count__lte=F('max_members') - count
+    ).update(member_count=F('member_count') + count)
+
+
+def _create_membership(user, group_id):
+    membership = GroupMembership(user=user, group_id=group_id)
+    # Место уже учтено условным UPDATE, сигнал post_save не должен увеличить счетчик
+    membership._counted = True
+    membership.save()
+    return membership
+
+
+def enroll(user, group_id, section_request=None):
+    """Записывает пользователя в группу или ставит в лист ожидания.
+
+    Возвращает (ENROLLED | ALREADY | WAITLISTED, membership или None).
+    Group.DoesNotExist - если группы нет.
+    """
+    membership = GroupMembership.objects.filter(user=user, group_id=group_id).first()
+    if membership is not None:
+        return ALREADY, membership
+    try:
+        with transaction.atomic():
+            if _take_place(group_id):
+                GroupWaitlist.objects.filter(user=user, group_id=group_id).delete()
+                return ENROLLED, _create_membership(user, group_id)
+    except IntegrityError:
+        # Параллельный запрос уже записал пользователя, увеличение счетчика откатилось
+        return ALREADY, GroupMembership.objects.get(user=user, group_id=group_id)
+
+    if not Group.objects.filter(pk=group_id).exists():
+        raise Group.DoesNotExist
+    GroupWaitlist.objects.get_or_create(
+        user=user, group_id=group_id, defaults={'section_request': section_request}
+    )
+    return WAITLISTED, None
+
+
+def promote_waitlist(group_id):
+    """Переводит первых из листа ожидания на освободившиеся места; возвращает число переведенных"""
+    promoted = 0
+    with transaction.atomic():
+        for entry in GroupWaitlist.objects.select_for_update().filter(group_id=group_id).select_related('user'):
+            if not _take_place(group_id):
+                break
+            entry.delete()
+            try:
+                with transaction.atomic():
+                    _create_membership(entry.user, group_id)
+            except IntegrityError:
+                # Уже участник: возвращаем место
+                Group.objects.filter(pk=group_id).update(member_count=F('member_count') - 1)
+                continue
+            promoted += 1
+    return promoted
+
+
+def unenroll(membership):
+    """Удаляет участника и отдает место первому из листа ожидания"""
+    group_id = membership.group_id
+    with transaction.atomic():
+        membership.delete()
+        promote_waitlist(group_id)
+
+
+def enroll_requests(group_id, section_requests):
+    """Записывает в группу пользователей одобренных заявок одной транзакцией.
+
+    Строка группы блокируется один раз, участники и лист ожидания
+    создаются bulk_create - число запросов не зависит от размера пачки.
+    Возвращает {'enrolled': [...], 'waitlisted': [...], 'skipped': [{'request', 'error'}]}
+    (в enrolled и waitlisted - id заявок).
+    """
+    result = {'enrolled': [], 'waitlisted': [], 'skipped': []}
+    with transaction.atomic():
+        group = Group.objects.select_for_update().get(pk=group_id)
+        members = set(GroupMembership.objects.filter(group=group).values_list('user_id', flat=True))
+
+        candidates, seen = [], set()
+        for section_request in section_requests:
+            if section_request.status != 'approved':
+                error = 'Заявка не одобрена'
+            elif section_request.section_id != group.section_id:
+                error = 'Заявка в другую секцию'
+            elif section_request.user_id is None:
+                error = 'Заявка без пользователя'
+            elif section_request.user_id in members or section_request.user_id in seen:
+                error = 'Пользователь уже в группе'
+            else:
+                seen.add(section_request.user_id)
+                candidates.append(section_request)
+                continue
+            result['skipped'].append({'request': section_request.id, 'error': error})
+
+        free = max(group.max_members - group.member_count, 0)
+        admitted, waiting = candidates[:free], candidates[free:]
+        if admitted:
+            GroupMembership.objects.bulk_create([
+                GroupMembership(user_id=section_request.user_id, group=group) for section_request in admitted
+            ])
+            Group.objects.filter(pk=group.pk).update(member_count=F('member_count') + len(admitted))
+            GroupWaitlist.objects.filter(
+                group=group, user_id__in=[section_request.user_id for section_request in admitted]
+            ).delete()
+        if waiting:
+            GroupWaitlist.objects.bulk_create([
+                GroupWaitlist(user_id=section_request.user_id, group=group, section_request=section_request)
+                for section_request in waiting
+            ], ignore_conflicts=True)
+        # bulk_create не отправляет сигналы
+        bump('sections')
+        invalidate_users(section_request.user_id for section_request in admitted)
+
+    result['enrolled'] = [section_request.id for section_request in admitted]
+    result['waitlisted'] = [section_request.id for section_request in waiting]
+    return result
+
+
+REQUEST_MESSAGES = {
+    'approved': 'одобрена',
+    'rejected': 'отклонена',
+}
+
+
+def _request_notification(section_request, status):
+    return {
+        'email': section_request.user.email if section_request.user_id else None,
+        'subject': f'Заявка в секцию {REQUEST_MESSAGES[status]}',
+        'message': (
+            f'{section_request.name}, ваша заявка в секцию '
+            f'«{section_request.section.name}» {REQUEST_MESSAGES[status]}.'
+        ),
+    }
+
+
+def decide_requests(approve_ids, reject_ids, group_id=None):
+    """Применяет решения по пачке заявок в секции одной транзакцией.
+
+    Статусы меняются двумя UPDATE. Если передан group_id, пользователи
+    одобренных заявок записываются в группу через enroll_requests.
+    Возвращает результат по каждому id: {'id', 'status': 'approved' |
+    'rejected' | 'not_found', 'enrollment'?: 'enrolled' | 'waitlisted' | 'skipped', 'error'?}.
+    Group.DoesNotExist - если группы нет.
+    """
+    with transaction.atomic():
+        requests = {
+            section_request.pk: section_request
+            for section_request in SectionRequest.objects.filter(pk__in=approve_ids + reject_ids)
+            .select_related('user', 'section').select_for_update(of=('self',))
+        }
+        changed = {'approved': [], 'rejected': []}
+        for status, ids in (('approved', approve_ids), ('rejected', reject_ids)):
+            found = [pk for pk in ids if pk in requests]
+            SectionRequest.objects.filter(pk__in=found).exclude(status=status).update(status=status)
+            for pk in found:
+                if requests[pk].status != status:
+                    changed[status].append(requests[pk])
+                requests[pk].status = status
+
+        enrollment = {}
+        if group_id is not None:
+            approved = [requests[pk] for pk in approve_ids if pk in requests]
+            outcome = enroll_requests(group_id, approved)
+            for key in (ENROLLED, WAITLISTED):
+                for pk in outcome[key]:
+                    enrollment[pk] = {'enrollment': key}
+            for skipped in outcome['skipped']:
+                enrollment[skipped['request']] = {'enrollment': 'skipped', 'error': skipped['error']}
+
+        notify(
+            _request_notification(section_request, status)
+            for status, section_requests in changed.items()
+            for section_request in section_requests
+        )
+
+    results = []
+    for status, ids in (('approved', approve_ids), ('rejected', reject_ids)):
+        for pk in ids:
+            if pk not in requests:
+                results.append({'id': pk, 'status': 'not_found'})
+            else:
+                results.append({'id': pk, 'status': status, **enrollment.get(pk, {})})
+    return results
@@ -0,0 +1,31 @@
+"""Импорт расписания групп из файла (core.imports)"""
+from bookings.availability import mark_dirty
+from core.cache import bump
+from core.imports import Importer
+from .models import Schedule
+
+
+class ScheduleImporter(Importer):
+    """Занятия по ключу (группа, день недели, начало); обновляется время окончания"""
+    model = Schedule
+    fields = ('group', 'day_of_week', 'time_start', 'time_end')
+    key = ('group', 'day_of_week', 'time_start')
+    update_fields = ('time_end',)
+
+    def __init__(self, **defaults):
+        super().__init__(**defaults)
+        self.weekdays = set()
+
+    def check(self, values):
+        if values['time_start'] == values['time_end']:
+            return {'time_end': 'Конец занятия совпадает с началом'}
+        return {}
+
+    def touch(self, rows):
+        self.weekdays.update(row['day_of_week'] for row in rows)
+
+    def finish(self):
+        if self.weekdays:
+            # Занятие до полуночи и позже захватывает следующий день (как в bookings.signals)
+            mark_dirty(weekdays=self.weekdays | {(day + 1) % 7 for day in self.weekdays})
+            bump('sections')
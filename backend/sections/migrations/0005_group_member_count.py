@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_member_count(apps, schema_editor):
+    Group = apps.get_model('sections', 'Group')
+    GroupMembership = apps.get_model('sections', 'GroupMembership')
+    counts = (
+        GroupMembership.objects.filter(group=OuterRef('pk'))
+        .order_by().values('group').annotate(n=Count('id')).values('n')
+    )
+    Group.objects.update(member_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sections', '0004_alter_sectionrequest_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='member_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='GroupWaitlist',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='sections.group')),
+                ('section_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entries', to='sections.sectionrequest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_waitlist', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'unique_together': {('user', 'group')},
+            },
+        ),
+        migrations.RunPython(fill_member_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sections', '0005_group_member_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['joined_at', 'id'], name='membership_joined_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectionrequest',
+            index=models.Index(fields=['created_at', 'id'], name='sectionrequest_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sections', '0006_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['day_of_week', 'time_start'], name='schedule_day_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectionrequest',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='sectionrequest_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sectionrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='sectionrequest_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:15
+
+from django.db import migrations, models
+
+
+def delete_duplicate_schedules(apps, schema_editor):
+    """Оставляет одно занятие группы с одним днем и временем начала"""
+    Schedule = apps.get_model('sections', 'Schedule')
+    schedules = Schedule.objects.using(schema_editor.connection.alias)
+    seen, duplicates = set(), []
+    for pk, *key in schedules.order_by('id').values_list('id', 'group_id', 'day_of_week', 'time_start'):
+        if tuple(key) in seen:
+            duplicates.append(pk)
+        seen.add(tuple(key))
+    schedules.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sections', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_schedules, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.UniqueConstraint(fields=('group', 'day_of_week', 'time_start'), name='schedule_unique_start'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sections', '0008_import_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupwaitlist',
+            index=models.Index(fields=['created_at', 'id'], name='waitlist_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupwaitlist',
+            index=models.Index(fields=['group', 'created_at', 'id'], name='waitlist_group_created_idx'),
+        ),
+    ]
@@ -19,10 +19,27 @@ class Section(models.Model):
     def __str__(self):
         return self.name
 
+class GroupQuerySet(models.QuerySet):
+    def for_display(self):
+        """Группы для GroupSerializer: секция и расписание за фиксированное число запросов"""
+        return self.select_related('section').prefetch_related(
+            models.Prefetch('schedules', queryset=Schedule.objects.order_by('day_of_week', 'time_start'))
+        )
+
 class Group(models.Model):
     section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='groups')
     name = models.CharField(max_length=100)
     max_members = models.IntegerField(default=20)
+    # Число участников: растет условным UPDATE при записи (sections/enrollment.py)
+    member_count = models.IntegerField(default=0)
+    
+    objects = GroupQuerySet.as_manager()
+    
+    def recount_members(self):
+        """Пересчитывает member_count по таблице участников"""
+        self.member_count = self.memberships.count()
+        Group.objects.filter(pk=self.pk).update(member_count=self.member_count)
+        return self.member_count
     
     def __str__(self):
         return f"{self.section.name} - {self.name}"
@@ -45,6 +62,14 @@ class Schedule(models.Model):
     
     class Meta:
         ordering = ['day_of_week', 'time_start']
+        indexes = [
+            # Занятость льда по дням недели (bookings/occupancy.py)
+            models.Index(fields=['day_of_week', 'time_start'], name='schedule_day_start_idx'),
+        ]
+        constraints = [
+            # Ключ импорта расписания (sections/imports.py)
+            models.UniqueConstraint(fields=['group', 'day_of_week', 'time_start'], name='schedule_unique_start'),
+        ]
     
     def __str__(self):
         return f"{self.group.name} - {self.get_day_of_week_display()} {self.time_start}"
@@ -56,10 +81,35 @@ class GroupMembership(models.Model):
     
     class Meta:
         unique_together = ['user', 'group']
+        indexes = [
+            # Пагинация по ключу (core/pagination.py)
+            models.Index(fields=['joined_at', 'id'], name='membership_joined_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.group.name}"
 
+class GroupWaitlist(models.Model):
+    """Очередь в заполненную группу: освободившееся место получает первый в очереди"""
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='waitlist')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='group_waitlist')
+    section_request = models.ForeignKey(
+        'SectionRequest', on_delete=models.SET_NULL, related_name='waitlist_entries', null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        unique_together = ['user', 'group']
+        indexes = [
+            # Пагинация по ключу (core/pagination.py) и очередь группы
+            models.Index(fields=['created_at', 'id'], name='waitlist_created_id_idx'),
+            models.Index(fields=['group', 'created_at', 'id'], name='waitlist_group_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email} - {self.group.name} (ожидание)"
+
 class SectionRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Ожидает'),
@@ -77,6 +127,14 @@ class SectionRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Пагинация по ключу (core/pagination.py)
+            models.Index(fields=['created_at', 'id'], name='sectionrequest_created_id_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='sectionrequest_user_idx'),
+            models.Index(
+                fields=['created_at', 'id'], condition=models.Q(status='pending'), name='sectionrequest_pending_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.section.name}"
@@ -20,7 +20,7 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = ['id', 'section', 'section_name', 'name', 'max_members', 'members_count', 'schedules']
     
     def get_members_count(self, obj):
-        return obj.memberships.count()
+        return obj.member_count
 
 class SectionSerializer(serializers.ModelSerializer):
     groups = GroupSerializer(many=True, read_only=True)
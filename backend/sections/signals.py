@@ -0,0 +1,18 @@
+"""Поддержка Group.member_count при изменениях участников в обход sections.enrollment"""
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Group, GroupMembership
+
+
+@receiver(post_save, sender=GroupMembership)
+def membership_created(sender, instance, created, **kwargs):
+    # enrollment уже занял место условным UPDATE и пометил участника
+    if created and not getattr(instance, '_counted', False):
+        Group.objects.filter(pk=instance.group_id).update(member_count=F('member_count') + 1)
+
+
+@receiver(post_delete, sender=GroupMembership)
+def membership_deleted(sender, instance, **kwargs):
+    Group.objects.filter(pk=instance.group_id).update(member_count=F('member_count') - 1)
@@ -1,3 +1,236 @@
-from django.test import TestCase
+import threading
+import unittest
+from datetime import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from . import enrollment
+from .enrollment import (
+    ALREADY, ENROLLED, WAITLISTED, decide_requests, enroll, enroll_requests, promote_waitlist, unenroll,
+)
+from .models import Group, GroupMembership, GroupWaitlist, Schedule, Section, SectionRequest
+
+User = get_user_model()
+
+
+class SectionListQueriesTest(TestCase):
+    """Список секций и групп не должен делать запросы на каждую группу"""
+
+    # COUNT для пагинации, секции, группы с числом участников, расписание
+    SECTION_LIST_QUERIES = 4
+
+    def setUp(self):
+        # Ответы публичных списков кэшируются (core/cache.py)
+        cache.clear()
+        self.client = APIClient()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+            for i in range(3)
+        ]
+
+    def create_sections(self, sections, groups, schedules):
+        for s in range(sections):
+            section = Section.objects.create(
+                name=f'Секция {s}', section_type='hockey', description='Описание', price=1000
+            )
+            for g in range(groups):
+                group = Group.objects.create(section=section, name=f'Группа {g}')
+                for day in range(schedules):
+                    Schedule.objects.create(group=group, day_of_week=day, time_start=time(10), time_end=time(11))
+                for user in self.users[:g + 1]:
+                    GroupMembership.objects.create(user=user, group=group)
+
+    def test_section_list_query_count_is_constant(self):
+        self.create_sections(sections=1, groups=1, schedules=1)
+        with self.assertNumQueries(self.SECTION_LIST_QUERIES):
+            response = self.client.get('/api/sections/sections/')
+        self.assertEqual(response.status_code, 200)
+
+        cache.clear()
+        self.create_sections(sections=5, groups=3, schedules=4)
+        with self.assertNumQueries(self.SECTION_LIST_QUERIES):
+            response = self.client.get('/api/sections/sections/')
+        self.assertEqual(response.status_code, 200)
+
+        groups = [group for section in response.json()['results'] for group in section['groups']]
+        self.assertEqual(len(groups), 16)
+        self.assertEqual(
+            sorted(group['members_count'] for group in groups),
+            sorted([1] + [1, 2, 3] * 5),
+        )
+        self.assertTrue(all(len(group['schedules']) in (1, 4) for group in groups))
+
+    def test_group_list_query_count_is_constant(self):
+        self.create_sections(sections=2, groups=3, schedules=2)
+        # COUNT для пагинации, группы с секцией и числом участников, расписание
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/sections/groups/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 6)
+
+
+class DecideRequestsTest(TestCase):
+    """Пачка решений по заявкам в секции с записью одобренных в группу"""
+
+    def setUp(self):
+        self.section = Section.objects.create(name='Хоккей', section_type='hockey', description='Описание', price=1000)
+        self.group = Group.objects.create(section=self.section, name='Группа', max_members=1)
+        self.requests = [
+            SectionRequest.objects.create(
+                section=self.section, name=f'Заявитель {i}', phone='1',
+                user=User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x'),
+            )
+            for i in range(3)
+        ]
+
+    def test_decide_with_enrollment(self):
+        first, second, third = (section_request.pk for section_request in self.requests)
+        results = decide_requests([first, second, 0], [third], group_id=self.group.pk)
+        self.assertEqual(results, [
+            {'id': first, 'status': 'approved', 'enrollment': 'enrolled'},
+            {'id': second, 'status': 'approved', 'enrollment': 'waitlisted'},
+            {'id': 0, 'status': 'not_found'},
+            {'id': third, 'status': 'rejected'},
+        ])
+        self.assertEqual(
+            dict(SectionRequest.objects.values_list('pk', 'status')),
+            {first: 'approved', second: 'approved', third: 'rejected'},
+        )
+        self.assertEqual(Group.objects.get(pk=self.group.pk).member_count, 1)
+        self.assertTrue(GroupMembership.objects.filter(group=self.group, user=self.requests[0].user).exists())
+        self.assertTrue(GroupWaitlist.objects.filter(group=self.group, user=self.requests[1].user).exists())
+
+    def test_repeated_decision_is_idempotent(self):
+        pk = self.requests[0].pk
+        decide_requests([pk], [], group_id=self.group.pk)
+        results = decide_requests([pk], [], group_id=self.group.pk)
+        self.assertEqual(results[0]['enrollment'], 'skipped')
+        self.assertEqual(GroupMembership.objects.filter(group=self.group).count(), 1)
+
+    def test_missing_group(self):
+        with self.assertRaises(Group.DoesNotExist):
+            decide_requests([self.requests[0].pk], [], group_id=0)
+        self.assertEqual(SectionRequest.objects.get(pk=self.requests[0].pk).status, 'pending')
+
+
+class EnrollmentTest(TestCase):
+    """Запись не превышает max_members, лишние встают в лист ожидания"""
+
+    def setUp(self):
+        section = Section.objects.create(name='Хоккей', section_type='hockey', description='Описание', price=1000)
+        self.group = Group.objects.create(section=section, name='Группа', max_members=2)
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+            for i in range(4)
+        ]
+
+    def member_count(self):
+        return Group.objects.get(pk=self.group.pk).member_count
+
+    def test_enroll_until_full(self):
+        results = [enroll(user, self.group.pk)[0] for user in self.users[:3]]
+        self.assertEqual(results, [ENROLLED, ENROLLED, WAITLISTED])
+        self.assertEqual(enroll(self.users[0], self.group.pk)[0], ALREADY)
+        self.assertEqual(self.member_count(), 2)
+        self.assertEqual(list(GroupWaitlist.objects.values_list('user', flat=True)), [self.users[2].pk])
+        with self.assertRaises(Group.DoesNotExist):
+            enroll(self.users[3], 0)
+
+    def test_capacity_race(self):
+        """Место, занятое параллельной записью между чтением и UPDATE, не выдается второй раз"""
+        enroll(self.users[0], self.group.pk)
+        take_place = enrollment._take_place
+
+        def concurrent_take_place(group_id, count=1):
+            # Другой процесс успел занять последнее место
+            Group.objects.filter(pk=group_id).update(member_count=F('member_count') + 1)
+            return take_place(group_id, count)
+
+        with mock.patch.object(enrollment, '_take_place', concurrent_take_place):
+            self.assertEqual(enroll(self.users[1], self.group.pk)[0], WAITLISTED)
+        self.assertEqual(self.member_count(), 2)
+        self.assertEqual(GroupMembership.objects.filter(group=self.group).count(), 1)
+
+    def test_unenroll_promotes_waitlist(self):
+        for user in self.users:
+            enroll(user, self.group.pk)
+        unenroll(GroupMembership.objects.get(user=self.users[0], group=self.group))
+        self.assertTrue(GroupMembership.objects.filter(user=self.users[2], group=self.group).exists())
+        self.assertEqual(list(GroupWaitlist.objects.values_list('user', flat=True)), [self.users[3].pk])
+        self.assertEqual(self.member_count(), 2)
+
+    def test_promote_waitlist_skips_members(self):
+        for user in self.users[:3]:
+            enroll(user, self.group.pk)
+        # Участник, попавший в очередь в обход enroll, не занимает второе место
+        GroupWaitlist.objects.create(user=self.users[0], group=self.group)
+        Group.objects.filter(pk=self.group.pk).update(max_members=4)
+        self.assertEqual(promote_waitlist(self.group.pk), 1)
+        self.assertEqual(self.member_count(), 3)
+        self.assertFalse(GroupWaitlist.objects.exists())
+
+    def test_enroll_requests(self):
+        other_section = Section.objects.create(
+            name='Фигурное катание', section_type='figure_skating', description='Описание', price=1000
+        )
+
+        def create(section, user, status='approved'):
+            return SectionRequest.objects.create(section=section, user=user, name='Заявитель', phone='1', status=status)
+
+        requests = [create(self.group.section, user) for user in self.users[:3]] + [
+            # Повторная заявка, неодобренная и заявка в другую секцию пропускаются
+            create(self.group.section, self.users[0]),
+            create(self.group.section, self.users[3], status='pending'),
+            create(other_section, self.users[3]),
+        ]
+        result = enroll_requests(self.group.pk, requests)
+        self.assertEqual(result['enrolled'], [requests[0].pk, requests[1].pk])
+        self.assertEqual(result['waitlisted'], [requests[2].pk])
+        self.assertEqual([item['request'] for item in result['skipped']], [requests[3].pk, requests[4].pk, requests[5].pk])
+        self.assertEqual(self.member_count(), 2)
+
+    def test_enroll_requests_after_concurrent_enroll(self):
+        enroll(self.users[0], self.group.pk)
+        enroll(self.users[1], self.group.pk)
+        section_request = SectionRequest.objects.create(
+            section=self.group.section, user=self.users[2], name='Заявитель', phone='1', status='approved'
+        )
+        result = enroll_requests(self.group.pk, [section_request])
+        self.assertEqual(result['waitlisted'], [section_request.pk])
+        self.assertEqual(self.member_count(), 2)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Параллельные транзакции проверяются на PostgreSQL')
+class EnrollmentRaceTest(TransactionTestCase):
+    """Параллельные записи в группу с одним свободным местом"""
+
+    def test_parallel_enroll(self):
+        section = Section.objects.create(name='Хоккей', section_type='hockey', description='Описание', price=1000)
+        group = Group.objects.create(section=section, name='Группа', max_members=1)
+        users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x') for i in range(8)
+        ]
+        barrier = threading.Barrier(len(users))
+        results = []
+
+        def run(user):
+            barrier.wait()
+            try:
+                results.append(enroll(user, group.pk)[0])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(ENROLLED), 1)
+        self.assertEqual(Group.objects.get(pk=group.pk).member_count, 1)
+        self.assertEqual(GroupWaitlist.objects.filter(group=group).count(), len(users) - 1)
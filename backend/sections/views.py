@@ -2,8 +2,16 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, IsAdminUser, AllowAny
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch
 from .models import Section, Group, Schedule, SectionRequest
 from .serializers import SectionSerializer, GroupSerializer, ScheduleSerializer, SectionRequestSerializer
+from core.cache import cache_response
+from core.exports import filter_export, stream_export
+from core.pagination import KeysetPagination
+from core.validators import validate_decisions
+from core.views import import_response
+from .enrollment import decide_requests
 
 class SectionViewSet(viewsets.ModelViewSet):
     queryset = Section.objects.all()
@@ -11,17 +19,28 @@ class SectionViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.is_staff:
-            return Section.objects.all()
-        return Section.objects.filter(is_active=True)
+            queryset = Section.objects.all()
+        else:
+            queryset = Section.objects.filter(is_active=True)
+        # Группы с числом участников и расписанием: три запроса на любой список секций
+        return queryset.order_by('id').prefetch_related(Prefetch('groups', queryset=Group.objects.for_display()))
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAdminUser()]
         # Разрешить всем видеть секции (публичный доступ)
         return [AllowAny()]
+    
+    @cache_response('sections')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response('sections')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 class GroupViewSet(viewsets.ModelViewSet):
-    queryset = Group.objects.all()
+    queryset = Group.objects.for_display().order_by('id')
     serializer_class = GroupSerializer
     
     def get_permissions(self):
@@ -29,13 +48,21 @@ class GroupViewSet(viewsets.ModelViewSet):
             return [IsAdminUser()]
         # Разрешить всем видеть группы (публичный доступ)
         return [AllowAny()]
+    
+    @cache_response('sections')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cache_response('sections')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 class ScheduleViewSet(viewsets.ModelViewSet):
     serializer_class = ScheduleSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = Schedule.objects.all()
+        queryset = Schedule.objects.select_related('group')
         
         # Фильтр по группе из параметра (только для админов)
         group_id = self.request.query_params.get('group')
@@ -43,7 +70,8 @@ class ScheduleViewSet(viewsets.ModelViewSet):
             return queryset.filter(group_id=group_id)
         
         # Для всех пользователей (включая админов) - только их группы
-        group_ids = list(self.request.user.group_memberships.values_list('group_id', flat=True))
+        # Из claims токена (users/authentication.py), без запроса
+        group_ids = self.request.user.group_ids
         if group_ids:
             queryset = queryset.filter(group_id__in=group_ids)
         else:
@@ -52,26 +80,46 @@ class ScheduleViewSet(viewsets.ModelViewSet):
         return queryset
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'import_file']:
             return [IsAdminUser()]
         return [IsAuthenticated()]
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """Импорт расписания групп из CSV/JSON/NDJSON в фоне; ?group= - группа для строк без колонки group"""
+        defaults = {}
+        group_id = request.query_params.get('group')
+        if group_id:
+            if not group_id.isdigit() or not Group.objects.filter(pk=group_id).exists():
+                return Response({'error': 'Группа не найдена'}, status=status.HTTP_404_NOT_FOUND)
+            defaults['group'] = int(group_id)
+        return import_response(request, 'sections.imports.ScheduleImporter', **defaults)
 
 class SectionRequestViewSet(viewsets.ModelViewSet):
     serializer_class = SectionRequestSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         if self.request.user.is_staff:
-            return SectionRequest.objects.all()
-        if self.request.user.is_authenticated:
-            return SectionRequest.objects.filter(user=self.request.user)
-        return SectionRequest.objects.none()
+            queryset = SectionRequest.objects.all()
+        elif self.request.user.is_authenticated:
+            queryset = SectionRequest.objects.filter(user=self.request.user)
+        else:
+            return SectionRequest.objects.none()
+        statuses = self.request.query_params.get('status')
+        if self.action == 'list' and statuses:
+            # Очередь ?status=pending читается по частичному индексу sectionrequest_pending_idx
+            queryset = queryset.filter(status__in=statuses.split(','))
+        return queryset
     
     def get_permissions(self):
         # Разрешить создание заявок для всех (анонимных и авторизованных)
         if self.action == 'create':
             from rest_framework.permissions import AllowAny
             return [AllowAny()]
+        if self.action in ['decide', 'export']:
+            return [IsAdminUser()]
         # Для остальных действий требуется авторизация
         return [IsAuthenticated()]
     
@@ -92,3 +140,38 @@ class SectionRequestViewSet(viewsets.ModelViewSet):
         if not request.user.is_staff:
             return Response({'error': 'Только администратор может изменять статус'}, status=status.HTTP_403_FORBIDDEN)
         return super().partial_update(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post'])
+    def decide(self, request):
+        """Одобрение и отклонение пачки заявок: {"approve": [id], "reject": [id], "group_id": id?}"""
+        try:
+            approve, reject = validate_decisions(request.data)
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        group_id = request.data.get('group_id')
+        if group_id is not None and not str(group_id).isdigit():
+            return Response({'error': 'group_id должен быть целым id'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = decide_requests(approve, reject, group_id=int(group_id) if group_id is not None else None)
+        except Group.DoesNotExist:
+            return Response({'error': 'Группа не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'results': results})
+    
+    # Колонки выгрузки: (заголовок, поле)
+    EXPORT_COLUMNS = [
+        ('id', 'id'), ('created_at', 'created_at'), ('section', 'section__name'),
+        ('name', 'name'), ('phone', 'phone'), ('message', 'message'),
+        ('status', 'status'), ('user_email', 'user__email'),
+    ]
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка: ?output=csv|ndjson&date_from=&date_to= (по дате заявки)&status="""
+        try:
+            queryset = filter_export(
+                SectionRequest.objects.order_by('created_at', 'id'),
+                request.query_params, 'created_at', SectionRequest.STATUS_CHOICES,
+            )
+            return stream_export(queryset, self.EXPORT_COLUMNS, request.query_params.get('output', 'csv'), 'section_requests')
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
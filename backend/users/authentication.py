@@ -0,0 +1,89 @@
+"""JWT-аутентификация по claims токена без запроса пользователя из БД.
+
+Access-токен несет id, email, is_staff, id групп и auth_version
+пользователя (users/tokens.py). Если версия в токене совпадает с текущей
+версией из кэша, request.user собирается из claims (ClaimsUser) - без
+обращения к БД. Иначе (данные в токене устарели или версии нет в кэше)
+берется полный User из кэша с коротким TTL или из БД.
+
+invalidate_users() вызывается при смене профиля, прав и групп
+(users/signals.py): увеличивает auth_version в БД и удаляет записи кэша.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Prefetch
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from core.cache import KEY_PREFIX
+from sections.models import GroupMembership
+from .models import ClaimsUser
+
+User = get_user_model()
+
+CLAIMS = ('email', 'is_staff', 'groups', 'auth_version')
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:auth:version:{user_id}'
+
+
+def _user_key(user_id):
+    return f'{KEY_PREFIX}:auth:user:{user_id}'
+
+
+def load_user(user_id):
+    """User с группами из БД; заодно обновляет кэш. None - если пользователя нет"""
+    user = User.objects.prefetch_related(
+        Prefetch('group_memberships', queryset=GroupMembership.objects.select_related('group__section'))
+    ).filter(pk=user_id).first()
+    if user is not None:
+        timeout = settings.AUTH_USER_CACHE_TIMEOUT
+        cache.set_many({_user_key(user_id): user, _version_key(user_id): user.auth_version}, timeout)
+    return user
+
+
+def get_cached_user(user_id):
+    """Полный User из кэша (TTL AUTH_USER_CACHE_TIMEOUT) или из БД"""
+    return cache.get(_user_key(user_id)) or load_user(user_id)
+
+
+def _forget(user_ids):
+    cache.delete_many([key for user_id in user_ids for key in (_version_key(user_id), _user_key(user_id))])
+
+
+def invalidate_users(user_ids, claims=True):
+    """Сбрасывает кэш пользователей после коммита; claims=True - еще и claims выданных токенов"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    if claims:
+        User.objects.filter(pk__in=user_ids).update(auth_version=F('auth_version') + 1)
+    transaction.on_commit(partial(_forget, user_ids))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, которая собирает пользователя из claims токена"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token['user_id']
+        except KeyError:
+            raise InvalidToken('Токен не содержит id пользователя')
+
+        values = cache.get_many([_version_key(user_id), _user_key(user_id)])
+        version = values.get(_version_key(user_id))
+        if version is not None and all(claim in validated_token for claim in CLAIMS) \
+                and validated_token['auth_version'] == version:
+            return ClaimsUser.from_claims(validated_token)
+
+        user = values.get(_user_key(user_id)) or load_user(user_id)
+        if user is None:
+            raise AuthenticationFailed('Пользователь не найден', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('Пользователь неактивен', code='user_inactive')
+        return user
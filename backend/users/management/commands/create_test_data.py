@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from events.models import Event, SeatSchema, Seat
+from events.models import Event, SeatSchema
+from events.layouts import generate_layout
 from sections.models import Section, Group, Schedule
 from datetime import datetime, timedelta, time
 
@@ -25,16 +26,16 @@ class Command(BaseCommand):
         )
         
         schema1 = SeatSchema.objects.create(event=event1, schema_data={})
-        for sector in ['A', 'B', 'C']:
-            for row in range(1, 6):
-                for num in range(1, 11):
-                    Seat.objects.create(
-                        schema=schema1,
-                        sector=sector,
-                        row=row,
-                        number=num,
-                        price=500 if sector == 'C' else 1000 if sector == 'B' else 2000
-                    )
+        generate_layout(schema1, {
+            'sectors': ['A', 'B', 'C'],
+            'rows': 5,
+            'seats_per_row': 10,
+            'prices': [
+                {'sectors': ['C'], 'price': 500},
+                {'sectors': ['B'], 'price': 1000},
+                {'price': 2000},
+            ],
+        })
         
         event2 = Event.objects.create(
             title='Ледовое шоу "Щелкунчик"',
@@ -1,13 +1,42 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils.functional import cached_property
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Растет при смене email, прав или групп: claims старых токенов перестают приниматься
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
     def __str__(self):
         return self.email
+    
+    @cached_property
+    def group_ids(self):
+        """id групп пользователя (использует prefetch group_memberships, если он есть)"""
+        return [membership.group_id for membership in self.group_memberships.all()]
+
+class ClaimsUser(User):
+    """Пользователь из claims access-токена (users/authentication.py) без запроса к БД.
+    
+    Заполнены только id, email, is_staff и group_ids; сохранять нельзя.
+    """
+    class Meta:
+        proxy = True
+    
+    @classmethod
+    def from_claims(cls, token):
+        user = cls(id=token['user_id'], email=token['email'], is_staff=token['is_staff'], is_active=True)
+        user.auth_version = token['auth_version']
+        user.group_ids = list(token['groups'])
+        return user
+    
+    def save(self, *args, **kwargs):
+        raise TypeError('ClaimsUser собран из токена и не сохраняется, загрузите User')
+    
+    def delete(self, *args, **kwargs):
+        raise TypeError('ClaimsUser собран из токена и не удаляется, загрузите User')
@@ -29,7 +29,11 @@ class UserSerializer(serializers.ModelSerializer):
         return value
     
     def get_groups_info(self, obj):
-        memberships = GroupMembership.objects.filter(user=obj).select_related('group__section')
+        if 'group_memberships' in getattr(obj, '_prefetched_objects_cache', {}):
+            # Пользователь из users.authentication.load_user: группы уже загружены
+            memberships = obj.group_memberships.all()
+        else:
+            memberships = GroupMembership.objects.filter(user=obj).select_related('group__section')
         return [{'group_id': m.group.id, 'group_name': m.group.name, 'section': m.group.section.name} for m in memberships]
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -0,0 +1,52 @@
+"""Сброс кэша аутентификации (users/authentication.py) при смене пользователя и его групп"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from sections.models import GroupMembership
+from .authentication import invalidate_users
+
+User = get_user_model()
+
+# Поля, которые попадают в claims токена или влияют на доступ
+CLAIM_FIELDS = ['email', 'is_staff', 'is_active', 'password']
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._claims_changed = False
+    if not instance.pk or (update_fields is not None and not set(update_fields) & set(CLAIM_FIELDS)):
+        return
+    old = sender.objects.filter(pk=instance.pk).values(*CLAIM_FIELDS).first()
+    if old and any(old[field] != getattr(instance, field) for field in CLAIM_FIELDS):
+        if update_fields is None:
+            # Новая версия пишется этим же save
+            instance.auth_version += 1
+        else:
+            instance._claims_changed = True
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # save(update_fields=...) не запишет auth_version: увеличиваем отдельным UPDATE
+    claims = getattr(instance, '_claims_changed', False)
+    if claims:
+        instance.auth_version += 1
+    # Кэшированный профиль (/api/users/me/) устарел при любом изменении
+    invalidate_users([instance.pk], claims=claims)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_users([instance.pk], claims=False)
+
+
+@receiver(post_save, sender=GroupMembership)
+def membership_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_users([instance.user_id])
+
+
+@receiver(post_delete, sender=GroupMembership)
+def membership_deleted(sender, instance, **kwargs):
+    invalidate_users([instance.user_id])
@@ -1,3 +1,93 @@
+from datetime import time
+
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from sections.models import Group, GroupMembership, GroupWaitlist, Schedule, Section
+from .models import User
+
+
+class ClaimsAuthenticationTest(TestCase):
+    """Пользователь собирается из claims токена, пока они не устарели"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user', email='user@example.com', password='secret')
+        section = Section.objects.create(name='Секция', section_type='hockey', description='Описание', price=1000)
+        self.group = Group.objects.create(section=section, name='Группа')
+        Schedule.objects.create(group=self.group, day_of_week=0, time_start=time(10), time_end=time(11))
+        self.client = APIClient()
+
+    def login(self):
+        tokens = self.client.post('/api/token/', {'email': 'user@example.com', 'password': 'secret'}).data
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        return tokens
+
+    def test_hot_endpoints_skip_user_queries(self):
+        GroupMembership.objects.create(user=self.user, group=self.group)
+        self.login()
+        self.client.get('/api/users/me/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['groups_info'][0]['group_id'], self.group.pk)
+        # COUNT для пагинации и само расписание
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/sections/schedules/')
+        self.assertEqual(response.data['count'], 1)
+
+    def test_membership_change_invalidates_claims(self):
+        tokens = self.login()
+        self.assertEqual(self.client.get('/api/sections/schedules/').data['count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupMembership.objects.create(user=self.user, group=self.group)
+        # Старый токен: claims устарели, пользователь загружается из БД
+        self.assertEqual(self.client.get('/api/sections/schedules/').data['count'], 1)
+
+        access = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.client.get('/api/users/me/')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/sections/schedules/').data['count'], 1)
+
+    def test_staff_revocation_applies_to_issued_tokens(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.login()
+        self.assertEqual(self.client.get('/api/users/admin/memberships/').status_code, 200)
+
+        self.user.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get('/api/users/admin/memberships/').status_code, 403)
+
+
+class WaitlistTest(TestCase):
+    """Лист ожидания в админке листается курсором в порядке очереди"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username='admin', email='admin@example.com', password='x', is_staff=True)
+        )
+        section = Section.objects.create(name='Секция', section_type='hockey', description='Описание', price=1000)
+        self.groups = [Group.objects.create(section=section, name=f'Группа {i}') for i in range(2)]
+        for i in range(5):
+            user = User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='x')
+            GroupWaitlist.objects.create(user=user, group=self.groups[i % 2])
+
+    def test_pages_in_queue_order(self):
+        ids, url = [], f'/api/users/admin/waitlist/?group={self.groups[0].pk}&page_size=2'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [entry['id'] for entry in response.data['results']]
+            url = response.data['next']
+        expected = GroupWaitlist.objects.filter(group=self.groups[0]).order_by('created_at', 'id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
 
-# Create your tests here.
+    def test_invalid_group(self):
+        self.assertEqual(self.client.get('/api/users/admin/waitlist/?group=abc').status_code, 400)
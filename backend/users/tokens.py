@@ -0,0 +1,38 @@
+"""Токены с claims пользователя для ClaimsJWTAuthentication (users/authentication.py)."""
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import get_cached_user
+
+
+def set_user_claims(token, user):
+    token['email'] = user.email
+    token['is_staff'] = user.is_staff
+    token['groups'] = user.group_ids
+    token['auth_version'] = user.auth_version
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_user_claims(token, user)
+        return token
+
+    @property
+    def access_token(self):
+        # Claims нового access-токена берутся у пользователя, а не из refresh:
+        # права и группы могли измениться после входа
+        access = super().access_token
+        user = get_cached_user(self['user_id'])
+        if user is not None:
+            set_user_claims(access, user)
+        return access
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import get_user_model
+from .authentication import get_cached_user
 from .serializers import UserSerializer, UserRegisterSerializer
 
 User = get_user_model()
@@ -23,12 +24,15 @@ class UserViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def me(self, request):
-        serializer = self.get_serializer(request.user)
+        # request.user может быть собран из claims токена: профиль берется из кэша
+        serializer = self.get_serializer(get_cached_user(request.user.pk))
         return Response(serializer.data)
     
     @action(detail=False, methods=['patch'])
     def update_profile(self, request):
-        serializer = self.get_serializer(request.user, data=request.data, partial=True)
+        # Кэш профиля и claims токенов сбрасывает users/signals.py
+        user = User.objects.get(pk=request.user.pk)
+        serializer = self.get_serializer(user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
@@ -3,9 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
 from django.contrib.auth import get_user_model
-from sections.models import GroupMembership, Group, Section, Schedule
-from events.models import Event, SeatSchema, Seat
+from sections.models import GroupMembership, GroupWaitlist, Group, Section, SectionRequest, Schedule
+from sections import enrollment
+from events.models import Event, SeatSchema
+from events.layouts import LayoutError, assign_layout
+from django.db import transaction
 from rest_framework import serializers
+from core.pagination import JoinedAtPagination, WaitlistPagination
 
 User = get_user_model()
 
@@ -28,12 +32,17 @@ class AdminViewSet(viewsets.ViewSet):
         
         try:
             user = User.objects.get(id=user_id)
-            group = Group.objects.get(id=group_id)
-            membership, created = GroupMembership.objects.get_or_create(user=user, group=group)
+            result, membership = enrollment.enroll(user, group_id)
             
+            messages = {
+                enrollment.ENROLLED: 'Пользователь добавлен в группу',
+                enrollment.ALREADY: 'Пользователь уже в группе',
+                enrollment.WAITLISTED: 'Группа заполнена, пользователь добавлен в лист ожидания',
+            }
             return Response({
-                'message': 'Пользователь добавлен в группу' if created else 'Пользователь уже в группе',
-                'membership_id': membership.id
+                'message': messages[result],
+                'membership_id': membership.id if membership else None,
+                'waitlisted': result == enrollment.WAITLISTED
             })
         except User.DoesNotExist:
             return Response({'error': 'Пользователь не найден'}, status=status.HTTP_404_NOT_FOUND)
@@ -42,36 +51,94 @@ class AdminViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'], url_path='memberships')
     def list_memberships(self, request):
-        memberships = GroupMembership.objects.all().select_related('user', 'group')
-        serializer = GroupMembershipSerializer(memberships, many=True)
-        return Response(serializer.data)
+        memberships = GroupMembership.objects.select_related('user', 'group')
+        group_id = request.query_params.get('group')
+        if group_id:
+            memberships = memberships.filter(group_id=group_id)
+        paginator = JoinedAtPagination()
+        page = paginator.paginate_queryset(memberships, request, view=self)
+        serializer = GroupMembershipSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['delete'], url_path='remove-from-group/(?P<membership_id>[^/.]+)')
     def remove_from_group(self, request, membership_id=None):
         try:
             membership = GroupMembership.objects.get(id=membership_id)
-            membership.delete()
+            # Освободившееся место получает первый из листа ожидания
+            enrollment.unenroll(membership)
             return Response({'message': 'Пользователь удалён из группы'})
         except GroupMembership.DoesNotExist:
             return Response({'error': 'Членство не найдено'}, status=status.HTTP_404_NOT_FOUND)
     
+    @action(detail=False, methods=['post'], url_path='enroll-requests')
+    def enroll_requests(self, request):
+        """Записывает в группу пользователей одобренных заявок одной транзакцией"""
+        group_id = request.data.get('group_id')
+        request_ids = request.data.get('request_ids')
+        if not isinstance(request_ids, list) or not request_ids:
+            return Response({'error': 'request_ids должен быть непустым списком'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            request_ids = [int(request_id) for request_id in request_ids]
+            section_requests = list(SectionRequest.objects.filter(id__in=request_ids).order_by('created_at', 'id'))
+            result = enrollment.enroll_requests(group_id, section_requests)
+        except (ValueError, TypeError):
+            return Response({'error': 'Некорректные идентификаторы'}, status=status.HTTP_400_BAD_REQUEST)
+        except Group.DoesNotExist:
+            return Response({'error': 'Группа не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        found = {section_request.id for section_request in section_requests}
+        result['skipped'] += [
+            {'request': request_id, 'error': 'Заявка не найдена'} for request_id in request_ids if request_id not in found
+        ]
+        return Response(result)
+    
+    @action(detail=False, methods=['get'], url_path='waitlist')
+    def waitlist(self, request):
+        """Лист ожидания в порядке очереди, ?group= - одной группы"""
+        entries = GroupWaitlist.objects.select_related('user', 'group')
+        group_id = request.query_params.get('group')
+        if group_id:
+            if not group_id.isdigit():
+                return Response({'error': 'group должен быть целым id'}, status=status.HTTP_400_BAD_REQUEST)
+            entries = entries.filter(group_id=group_id)
+        paginator = WaitlistPagination()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        return paginator.get_paginated_response([
+            {
+                'id': entry.id,
+                'user': entry.user_id,
+                'user_email': entry.user.email,
+                'group': entry.group_id,
+                'group_name': entry.group.name,
+                'section_request': entry.section_request_id,
+                'created_at': entry.created_at,
+            }
+            for entry in page
+        ])
+    
     @action(detail=False, methods=['post'], url_path='create-event')
     def create_event(self, request):
         from events.serializers import EventSerializer
         serializer = EventSerializer(data=request.data)
         if serializer.is_valid():
-            event = serializer.save()
-            
-            sectors = request.data.get('sectors', ['A', 'B', 'C'])
-            rows = request.data.get('rows', 5)
-            seats_per_row = request.data.get('seats_per_row', 10)
-            
-            schema = SeatSchema.objects.create(event=event, schema_data={})
-            for sector in sectors:
-                for row in range(1, rows + 1):
-                    for num in range(1, seats_per_row + 1):
-                        price = request.data.get(f'price_{sector}', 1000)
-                        Seat.objects.create(schema=schema, sector=sector, row=row, number=num, price=price)
+            # template - имя шаблона или описание зала (events.layouts),
+            # иначе зал собирается из sectors / rows / seats_per_row / price_<сектор>
+            layout = request.data.get('template')
+            if not layout:
+                sectors = request.data.get('sectors', ['A', 'B', 'C'])
+                layout = {
+                    'sectors': sectors,
+                    'rows': request.data.get('rows', 5),
+                    'seats_per_row': request.data.get('seats_per_row', 10),
+                    'prices': [{'sectors': [sector], 'price': request.data.get(f'price_{sector}', 1000)} for sector in sectors],
+                }
+            try:
+                with transaction.atomic():
+                    event = serializer.save()
+                    schema = SeatSchema.objects.create(event=event, schema_data={})
+                    # Места не создаются сразу: их развернет первое обращение к схеме
+                    assign_layout(schema, layout)
+            except LayoutError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
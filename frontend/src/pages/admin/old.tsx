@@ -1,5 +1,5 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
-import { api } from '../../shared/api/client'
+import { api, fetchAllPages } from '../../shared/api/client'
 import { Button, Card, CardContent, CardHeader, CardTitle, Input, Label, Textarea, Modal } from '../../shared/ui'
 import { useToastStore } from '@/shared/lib/toast'
 import { useState } from 'react'
@@ -26,7 +26,7 @@ export const AdminPage = () => {
 
   const { data: memberships } = useQuery({
     queryKey: ['admin-memberships'],
-    queryFn: async () => (await api.get('/users/admin/memberships/')).data,
+    queryFn: () => fetchAllPages('/users/admin/memberships/'),
   })
 
   const { data: sectionRequests } = useQuery({
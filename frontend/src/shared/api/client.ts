@@ -56,3 +56,18 @@ api.interceptors.response.use(
     return Promise.reject(error)
   }
 )
+
+// Загружает все страницы курсорной пагинации, следуя по ссылке next
+export const fetchAllPages = async <T = any>(url: string): Promise<T[]> => {
+  const items: T[] = []
+  let next: string | null = url
+  while (next) {
+    const { data }: { data: any } = await api.get(next)
+    if (Array.isArray(data)) {
+      return [...items, ...data]
+    }
+    items.push(...(data.results || []))
+    next = data.next || null
+  }
+  return items
+}